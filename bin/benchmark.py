@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for decoding and extraction, e.g.:
+
+bin/benchmark.py decode --resources 2000
+bin/benchmark.py decode --workspace tests/integration/workspace
+bin/benchmark.py decode --lazy
+bin/benchmark.py memory --documents 30
+bin/benchmark.py json --megabytes 1
+bin/benchmark.py wide --values 10000
+bin/benchmark.py yaml --megabytes 1 --workspace tests/integration/workspace
+bin/benchmark.py unfinished --megabytes 1
+bin/benchmark.py nested --depth 6
+bin/benchmark.py lookup --spans 100000
+bin/benchmark.py context --depth 3
+bin/benchmark.py artifact --depth 1
+bin/benchmark.py compiled
+bin/benchmark.py startup --cold
+"""
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+
+import click
+import yaml
+from importlib_resources import as_file, files
+from lsprotocol.types import Position
+
+from cfn_lsp_extra.aws_data import AWSContext, AWSName, AWSRefName, AWSResourceName
+from cfn_lsp_extra.context import (
+    load_cfn_context,
+    load_context,
+    load_spec,
+    spec_context,
+)
+from cfn_lsp_extra.decode import decode, decode_unfinished, interning
+from cfn_lsp_extra.decode.extraction import extract_all
+from cfn_lsp_extra.decode.extractors import (
+    AllowedValuesExtractor,
+    GetAttExtractor,
+    LogicalIdExtractor,
+    ParameterExtractor,
+    ResourceExtractor,
+    ResourcePropertyExtractor,
+)
+from cfn_lsp_extra.decode.json_decoding import CfnJSONDecoder, decode_json
+from cfn_lsp_extra.decode.position import PositionLookup, Spanning, SpanTable
+from cfn_lsp_extra.decode.yaml_decoding import SafePositionLoader
+from cfn_lsp_extra.ref import REF_EXTRACTOR
+from cfn_lsp_extra.source_text import SourceText
+from cfn_lsp_extra.spec_artifact import artifact_path, write_artifact
+
+EXTRACTORS = [
+    ResourceExtractor(),
+    ResourcePropertyExtractor(),
+    AllowedValuesExtractor(),
+    GetAttExtractor(),
+    LogicalIdExtractor(),
+    ParameterExtractor(),
+    REF_EXTRACTOR,
+]
+
+
+def yaml_resource(idx: int) -> str:
+    return f"""  Bucket{idx}:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: !Sub "${{AWS::StackName}}-bucket-{idx}"
+      AccessControl: Private
+      VersioningConfiguration:
+        Status: Enabled
+      Tags:
+        - Key: Name
+          Value: !Ref BucketPrefix
+        - Key: Index
+          Value: "{idx}"
+  Policy{idx}:
+    Type: AWS::S3::BucketPolicy
+    Properties:
+      Bucket: !Ref Bucket{idx}
+      PolicyDocument:
+        Version: "2012-10-17"
+        Statement:
+          - Effect: Allow
+            Action:
+              - s3:GetObject
+              - s3:PutObject
+            Resource: !GetAtt Bucket{idx}.Arn
+            Principal:
+              AWS: !Ref AccountId
+"""
+
+
+def json_resources(idx: int) -> dict:
+    return {
+        f"Bucket{idx}": {
+            "Type": "AWS::S3::Bucket",
+            "Properties": {
+                "BucketName": {"Fn::Sub": f"${{AWS::StackName}}-bucket-{idx}"},
+                "AccessControl": "Private",
+                "VersioningConfiguration": {"Status": "Enabled"},
+                "Tags": [
+                    {"Key": "Name", "Value": {"Ref": "BucketPrefix"}},
+                    {"Key": "Index", "Value": str(idx)},
+                ],
+            },
+        },
+        f"Policy{idx}": {
+            "Type": "AWS::S3::BucketPolicy",
+            "Properties": {
+                "Bucket": {"Ref": f"Bucket{idx}"},
+                "PolicyDocument": {
+                    "Version": "2012-10-17",
+                    "Statement": [
+                        {
+                            "Effect": "Allow",
+                            "Action": ["s3:GetObject", "s3:PutObject"],
+                            "Resource": {"Fn::GetAtt": [f"Bucket{idx}", "Arn"]},
+                            "Principal": {"AWS": {"Ref": "AccountId"}},
+                        }
+                    ],
+                },
+            },
+        },
+    }
+
+
+def synthetic_yaml(resources: int) -> str:
+    header = """AWSTemplateFormatVersion: "2010-09-09"
+Description: Synthetic benchmark template
+Parameters:
+  BucketPrefix:
+    Type: String
+    Default: bench
+  AccountId:
+    Type: String
+Resources:
+"""
+    return header + "".join(yaml_resource(i) for i in range(resources // 2))
+
+
+def synthetic_json(resources: int, indent: Optional[int] = 4) -> str:
+    template: dict = {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Description": "Synthetic benchmark template",
+        "Parameters": {
+            "BucketPrefix": {"Type": "String", "Default": "bench"},
+            "AccountId": {"Type": "String"},
+        },
+        "Resources": {},
+    }
+    for i in range(resources // 2):
+        template["Resources"].update(json_resources(i))
+    return json.dumps(template, indent=indent)
+
+
+def state_machine(depth: int, idx: int) -> dict:
+    """Return a step functions definition with Parallel states depth deep."""
+    task = {
+        "Type": "Task",
+        "Resource": {"Fn::GetAtt": [f"Function{idx}", "Arn"]},
+        "Parameters": {"Payload.$": "$", "FunctionName": {"Ref": f"Function{idx}"}},
+        "Retry": [{"ErrorEquals": ["States.ALL"], "MaxAttempts": 3}],
+        "End": True,
+    }
+    if depth == 0:
+        return {"StartAt": "Task", "States": {"Task": task}}
+    return {
+        "StartAt": "Parallel",
+        "States": {
+            "Parallel": {
+                "Type": "Parallel",
+                "Branches": [state_machine(depth - 1, idx) for _ in range(2)],
+                "Next": "Task",
+            },
+            "Task": task,
+        },
+    }
+
+
+def nested_template(resources: int, depth: int) -> dict:
+    return {
+        "AWSTemplateFormatVersion": "2010-09-09",
+        "Resources": {
+            f"StateMachine{i}": {
+                "Type": "AWS::StepFunctions::StateMachine",
+                "Properties": {
+                    "RoleArn": {"Fn::GetAtt": [f"Role{i}", "Arn"]},
+                    "Definition": state_machine(depth, i),
+                },
+            }
+            for i in range(resources)
+        },
+    }
+
+
+def timed(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """Return the median and min time in ms of repeat calls of fn."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()  # Don't charge fn for collecting earlier garbage
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), min(times)
+
+
+def allocated(fn: Callable[[], object]) -> int:
+    """Return the number of bytes retained by the result of fn."""
+    tracemalloc.start()
+    result = fn()  # noqa: F841
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size
+
+
+def sources(
+    resources: int, workspace: Optional[str]
+) -> List[Tuple[str, str]]:
+    if workspace:
+        return [(p.name, p.read_text()) for p in sorted(Path(workspace).iterdir())]
+    return [
+        (f"synthetic-{resources}.yaml", synthetic_yaml(resources)),
+        (f"synthetic-{resources}.json", synthetic_json(resources)),
+    ]
+
+
+@click.group()
+def cli() -> None:
+    """Run cfn-lsp-extra benchmarks."""
+
+
+@cli.command("decode")
+@click.option("-r", "--resources", default=2000, help="Resources in synthetic templates.")
+@click.option("-w", "--workspace", type=click.Path(exists=True), default=None)
+@click.option("-n", "--repeat", default=5)
+@click.option("--lazy", is_flag=True, help="Decode yaml templates lazily.")
+def decode_benchmark(
+    resources: int, workspace: Optional[str], repeat: int, lazy: bool
+) -> None:
+    """Time decoding and extraction, and the memory used by decoded templates.
+
+    Extraction is timed both with a walk of the template per extractor and
+    with a single walk for all extractors (as extracting from a decoded
+    template does).  With --lazy, the first extraction decodes the rest of
+    the template, which is timed separately."""
+    for name, source in sources(resources, workspace):
+        median, best = timed(lambda: decode(source, name, lazy), repeat)  # noqa: B023
+        memory = allocated(lambda: decode(source, name, lazy))  # noqa: B023
+        tree = decode(source, name, lazy)
+        first_extract, _ = timed(
+            lambda: [e._extract(tree) for e in EXTRACTORS], 1  # noqa: B023
+        )
+        extract_median, extract_best = timed(
+            lambda: [e._extract(tree) for e in EXTRACTORS],  # noqa: B023
+            repeat,
+        )
+        fused_median, fused_best = timed(
+            lambda: extract_all(tree, EXTRACTORS), repeat  # noqa: B023
+        )
+        click.echo(
+            f"{name} ({len(source) / 1024:.0f} KiB): "
+            f"decode {median:.1f}ms (min {best:.1f}ms), "
+            f"{memory / 1024:.0f} KiB retained, "
+            f"first extraction {first_extract:.1f}ms, "
+            f"extraction {extract_median:.1f}ms (min {extract_best:.1f}ms), "
+            f"single walk {fused_median:.1f}ms (min {fused_best:.1f}ms)"
+        )
+
+
+@cli.command("memory")
+@click.option("-r", "--resources", default=2000, help="Resources in synthetic templates.")
+@click.option("-w", "--workspace", type=click.Path(exists=True), default=None)
+@click.option("-d", "--documents", default=30, help="Copies of each template decoded.")
+def memory_benchmark(resources: int, workspace: Optional[str], documents: int) -> None:
+    """Report the memory retained per decoded resource, with and without interning.
+
+    Each template is decoded documents times, as if that many similar
+    templates were open."""
+    limit = interning.MAX_INTERNED_LENGTH
+    for name, source in sources(resources, workspace):
+        tree = decode(source, name)
+        count = len(tree.get("Resources") or {}) if isinstance(tree, dict) else 0
+        if not count:
+            continue
+        sizes = []
+        for max_length in (-1, limit):
+            interning.MAX_INTERNED_LENGTH = max_length
+            try:
+                sizes.append(
+                    allocated(
+                        lambda: [decode(source, name) for _ in range(documents)]  # noqa: B023
+                    )
+                )
+            finally:
+                interning.MAX_INTERNED_LENGTH = limit
+        before, after = (size / (count * documents) for size in sizes)
+        click.echo(
+            f"{name} ({count} resources): {before:.0f} bytes per resource "
+            f"without interning, {after:.0f} with ({1 - after / before:.0%} less)"
+        )
+
+
+@cli.command("json")
+@click.option("-m", "--megabytes", default=1.0, help="Size of synthetic templates.")
+@click.option("-n", "--repeat", default=5)
+def json_benchmark(megabytes: float, repeat: int) -> None:
+    """Compare the positional json decoders on large templates."""
+    for indent in (4, None):
+        per_resource = len(synthetic_json(100, indent)) / 100
+        source = synthetic_json(int(megabytes * 2**20 / per_resource), indent)
+        click.echo(
+            f"{len(source) / 2**20:.1f} MiB {'indented' if indent else 'compact'}:"
+        )
+        for name, fn in [
+            ("json.loads (no positions)", lambda: json.loads(source)),  # noqa: B023
+            ("CfnJSONDecoder", lambda: json.loads(source, cls=CfnJSONDecoder)),  # noqa: B023
+            ("decode_json", lambda: decode_json(source)),  # noqa: B023
+        ]:
+            median, best = timed(fn, repeat)
+            click.echo(f"  {name}: {median:.1f}ms (min {best:.1f}ms)")
+
+
+def wide_json(values: int) -> str:
+    mapping = {f"Key{i}": {"Value": f"value-{i}"} for i in range(values // 10)}
+    tags = [{"Key": f"Tag{i}", "Value": f"tag-{i}"} for i in range(values // 10)]
+    return json.dumps(
+        {
+            "Mappings": {"Wide": {f"Key{i}": f"value-{i}" for i in range(values)}},
+            "Resources": {"Bucket": {"Properties": {"Tags": tags}}},
+            "Outputs": mapping,
+        },
+        indent=2,
+    )
+
+
+@cli.command("wide")
+@click.option("-v", "--values", default=10000, help="String values in the object.")
+@click.option("-n", "--repeat", default=5)
+def wide_benchmark(values: int, repeat: int) -> None:
+    """Time decoding json objects with many string values.
+
+    Decoding should scale linearly, so doubling values should roughly
+    double the time taken."""
+    for count in (values // 2, values):
+        source = wide_json(count)
+        click.echo(f"{count} string values:")
+        for name, fn in [
+            ("CfnJSONDecoder", lambda: json.loads(source, cls=CfnJSONDecoder)),  # noqa: B023
+            ("decode_json", lambda: decode_json(source)),  # noqa: B023
+        ]:
+            median, best = timed(fn, repeat)
+            click.echo(f"  {name}: {median:.1f}ms (min {best:.1f}ms)")
+
+
+@cli.command("yaml")
+@click.option("-m", "--megabytes", default=1.0, help="Size of the synthetic template.")
+@click.option("-w", "--workspace", type=click.Path(exists=True), default=None)
+@click.option("-n", "--repeat", default=5)
+def yaml_benchmark(megabytes: float, workspace: Optional[str], repeat: int) -> None:
+    """Time loading yaml templates with positions."""
+    per_resource = len(synthetic_yaml(100)) / 100
+    resources = int(megabytes * 2**20 / per_resource)
+    templates = [(f"synthetic ({megabytes} MiB)", synthetic_yaml(resources))]
+    if workspace:
+        templates += [
+            (p.name, p.read_text())
+            for p in sorted(Path(workspace).iterdir())
+            if p.suffix in (".yaml", ".yml")
+        ]
+    for name, source in templates:
+        median, best = timed(
+            lambda: yaml.load(source, Loader=SafePositionLoader),  # noqa: B023
+            repeat,
+        )
+        click.echo(
+            f"{name} ({len(source) / 1024:.0f} KiB): "
+            f"{median:.1f}ms (min {best:.1f}ms)"
+        )
+
+
+@cli.command("unfinished")
+@click.option("-m", "--megabytes", default=1.0, help="Size of the synthetic template.")
+@click.option("-n", "--repeat", default=5)
+def unfinished_benchmark(megabytes: float, repeat: int) -> None:
+    """Time decoding a yaml template for completions in its middle."""
+    per_resource = len(synthetic_yaml(100)) / 100
+    source = SourceText(synthetic_yaml(int(megabytes * 2**20 / per_resource)))
+    position = Position(line=source.line_count // 2, character=8)
+    click.echo(f"synthetic ({len(source.text) / 1024:.0f} KiB):")
+    for windowed in (False, True):
+        median, best = timed(
+            lambda: decode_unfinished(source, "t.yaml", position, windowed),  # noqa: B023
+            repeat,
+        )
+        click.echo(f"  windowed={windowed}: {median:.1f}ms (min {best:.1f}ms)")
+
+
+@cli.command("nested")
+@click.option("-r", "--resources", default=20, help="State machines in the template.")
+@click.option("-d", "--depth", default=6, help="Depth of nested Parallel states.")
+@click.option("-n", "--repeat", default=5)
+def nested_benchmark(resources: int, depth: int, repeat: int) -> None:
+    """Time extraction from templates with deeply nested state machines.
+
+    The peak memory allocated while extracting (beyond the lookups
+    extracted) is also reported."""
+    template = nested_template(resources, depth)
+    for name, source in [
+        ("nested.yaml", yaml.safe_dump(template, sort_keys=False)),
+        ("nested.json", json.dumps(template, indent=2)),
+    ]:
+        tree = decode(source, name)
+        median, best = timed(lambda: extract_all(tree, EXTRACTORS), repeat)  # noqa: B023
+        tracemalloc.start()
+        lookups = extract_all(tree, EXTRACTORS)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        spans = sum(len(p) for lookup in lookups.values() for p in lookup.values())
+        click.echo(
+            f"{name} ({len(source) / 1024:.0f} KiB, {spans} spans): "
+            f"extraction {median:.1f}ms (min {best:.1f}ms), "
+            f"{retained / 1024:.0f} KiB retained, "
+            f"{peak / 1024:.0f} KiB peak"
+        )
+
+
+@cli.command("lookup")
+@click.option("-s", "--spans", default=100000, help="Spans in the lookups.")
+@click.option("-q", "--queries", default=10000, help="Positions looked up.")
+@click.option("-n", "--repeat", default=5)
+def lookup_benchmark(spans: int, queries: int, repeat: int) -> None:
+    """Compare PositionLookup and SpanTable holding the same spans.
+
+    The spans are like those of refs, a few on each line, to one of a tenth
+    as many items.  Memory is that retained by a lookup after a query, so
+    includes its index."""
+    rng = random.Random(0)
+    lines = spans // 3
+    items = [AWSRefName(value=f"Logical{i}") for i in range(max(spans // 10, 1))]
+    spanning = [
+        Spanning(
+            value=rng.choice(items),
+            line=rng.randrange(lines),
+            char=rng.randrange(80),
+            span=rng.randrange(4, 30),
+        )
+        for _ in range(spans)
+    ]
+    positions = [(rng.randrange(lines), rng.randrange(100)) for _ in range(queries)]
+
+    def built(cls: Any) -> Any:
+        lookup = cls.from_iterable(spanning)
+        lookup.at(0, 0)  # Builds its index
+        return lookup
+
+    for cls in (PositionLookup, SpanTable):
+        build, _ = timed(lambda: built(cls), repeat)  # noqa: B023
+        memory = allocated(lambda: built(cls))  # noqa: B023
+        lookup = built(cls)
+        query, _ = timed(
+            lambda: [lookup.at(*position) for position in positions],  # noqa: B023
+            repeat,
+        )
+        click.echo(
+            f"{cls.__name__}: build and index {build:.1f}ms, "
+            f"{memory / spans:.0f} bytes per span, "
+            f"{query / queries * 1000:.2f}us per query"
+        )
+
+
+def spec_names(context: AWSContext, depth: int) -> List[AWSName]:
+    """Return the resources of context and their properties up to depth."""
+    names: List[AWSName] = []
+    level: List[AWSName] = [AWSResourceName(value=r) for r in context.resource_map]
+    for _ in range(depth + 1):
+        names.extend(level)
+        level = [
+            name / prop
+            for name in level
+            if name in context
+            for prop in context[name].get("Properties", {}) or {}
+        ]
+    return names
+
+
+@cli.command("context")
+@click.option("-d", "--depth", default=3, help="Depth of properties looked up.")
+@click.option("-n", "--repeat", default=5)
+def context_benchmark(depth: int, repeat: int) -> None:
+    """Time looking up the descriptions of the names of the bundled spec.
+
+    Cold lookups are made with a fresh context, warm lookups repeat them."""
+    loaded = load_cfn_context()
+    names = spec_names(loaded, depth)
+
+    def fresh() -> AWSContext:
+        return AWSContext(loaded.resource_map, loaded.property_map)
+
+    def describe(context: AWSContext) -> None:
+        for name in names:
+            if name in context:
+                context.description(name)
+
+    cold, _ = timed(lambda: describe(fresh()), repeat)
+    context = fresh()
+    describe(context)
+    warm, _ = timed(lambda: describe(context), repeat)
+    click.echo(
+        f"{len(names)} names: cold {cold / len(names) * 1000:.2f}us, "
+        f"warm {warm / len(names) * 1000:.2f}us per contains and description"
+    )
+
+
+@cli.command("artifact")
+@click.option("-d", "--depth", default=1, help="Depth of properties looked up.")
+@click.option("-n", "--repeat", default=3)
+def artifact_benchmark(depth: int, repeat: int) -> None:
+    """Compare loading the bundled spec from json and from its artifact.
+
+    Also times describing the names of the spec afterwards, which for the
+    artifact includes decoding the types they belong to and reading their
+    documentation."""
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        spec_path = Path(tmp_directory) / "context.json"
+        with as_file(files("cfn_lsp_extra.resources") / "context.json") as bundled:
+            shutil.copy(bundled, spec_path)
+        json_load, _ = timed(lambda: spec_context(load_spec(spec_path)), repeat)
+        json_memory = allocated(lambda: spec_context(load_spec(spec_path)))
+        spec = json.loads(spec_path.read_bytes())
+        write_artifact(spec, artifact_path(spec_path), source=spec_path)
+        del spec
+        click.echo(
+            f"json {spec_path.stat().st_size / 2**20:.1f}MB, artifact "
+            f"{artifact_path(spec_path).stat().st_size / 2**20:.1f}MB"
+        )
+        artifact_load, _ = timed(
+            lambda: spec_context(load_spec(spec_path)), repeat
+        )
+        artifact_memory = allocated(lambda: spec_context(load_spec(spec_path)))
+        click.echo(
+            f"load: json {json_load:.1f}ms {json_memory / 2**20:.1f}MB, "
+            f"artifact {artifact_load:.1f}ms {artifact_memory / 2**20:.1f}MB"
+        )
+        names = spec_names(spec_context(load_spec(spec_path)), depth)
+
+        def described() -> AWSContext:
+            context = spec_context(load_spec(spec_path))
+            for name in names:
+                if name in context:
+                    context.description(name)
+            return context
+
+        describe, _ = timed(described, 1)
+        click.echo(
+            f"load and describe {len(names)} names from the artifact: "
+            f"{describe:.1f}ms {allocated(described) / 2**20:.1f}MB"
+        )
+
+        def decoded() -> AWSContext:
+            context = spec_context(load_spec(spec_path))
+            dict(context.resource_map)
+            dict(context.property_map)
+            return context
+
+        click.echo(
+            "load and decode every type from the artifact: "
+            f"{allocated(decoded) / 2**20:.1f}MB, documentation excluded"
+        )
+
+
+@cli.command("compiled")
+@click.option("-n", "--repeat", default=5)
+def compiled_benchmark(repeat: int) -> None:
+    """Time loading the bundled spec without and with a compiled spec cached."""
+    with tempfile.TemporaryDirectory() as tmp_directory:
+        tmp = Path(tmp_directory)
+
+        def load(cache_dir: Path) -> AWSContext:
+            return load_context(
+                "context.json", tmp / "override.json", tmp / "custom.json", cache_dir
+            )
+
+        cold, _ = timed(lambda: load(Path(tempfile.mkdtemp(dir=tmp))), repeat)
+        warm_dir = tmp / "warm"
+        load(warm_dir)
+        warm, _ = timed(lambda: load(warm_dir), repeat)
+        click.echo(f"load_context: cold {cold:.1f}ms, warm {warm:.1f}ms")
+
+
+def send(stdin: IO[bytes], message: Dict[str, Any]) -> None:
+    body = json.dumps({"jsonrpc": "2.0", **message}).encode()
+    stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    stdin.flush()
+
+
+def receive(stdout: IO[bytes], request_id: int) -> Any:
+    """Return the result of the response to request_id, skipping other messages."""
+    while True:
+        length = 0
+        while (line := stdout.readline().strip()) != b"":
+            name, _, value = line.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        message = json.loads(stdout.read(length))
+        if message.get("id") == request_id and "method" not in message:
+            return message.get("result")
+
+
+@cli.command("startup")
+@click.option("--cold", is_flag=True, help="Start without compiled contexts cached.")
+@click.option("-n", "--repeat", default=3)
+def startup_benchmark(cold: bool, repeat: int) -> None:
+    """Time a server process answering initialize, then its first useful hover."""
+    uri = "file:///tmp/template.yaml"
+    text = "Resources:\n  Bucket:\n    Type: AWS::S3::Bucket\n"
+    initialize_times, hover_times = [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_directory:
+            env = dict(os.environ)
+            if cold:
+                env["XDG_CACHE_HOME"] = tmp_directory
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, "-m", "cfn_lsp_extra"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                env=env,
+            )
+            assert process.stdin and process.stdout
+            send(
+                process.stdin,
+                {"id": 0, "method": "initialize", "params": {"capabilities": {}}},
+            )
+            receive(process.stdout, 0)
+            initialize_times.append((time.perf_counter() - start) * 1000)
+            send(process.stdin, {"method": "initialized", "params": {}})
+            send(
+                process.stdin,
+                {
+                    "method": "textDocument/didOpen",
+                    "params": {
+                        "textDocument": {
+                            "uri": uri,
+                            "languageId": "yaml",
+                            "version": 0,
+                            "text": text,
+                        }
+                    },
+                },
+            )
+            request_id = 1
+            while True:
+                send(
+                    process.stdin,
+                    {
+                        "id": request_id,
+                        "method": "textDocument/hover",
+                        "params": {
+                            "textDocument": {"uri": uri},
+                            "position": {"line": 2, "character": 15},
+                        },
+                    },
+                )
+                if receive(process.stdout, request_id):
+                    break
+                request_id += 1
+            hover_times.append((time.perf_counter() - start) * 1000)
+            send(process.stdin, {"id": -1, "method": "shutdown"})
+            receive(process.stdout, -1)
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    click.echo(
+        f"{'cold' if cold else 'warm'} start: initialize response "
+        f"{statistics.median(initialize_times):.0f}ms, first hover "
+        f"{statistics.median(hover_times):.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    cli()
@@ -7,7 +7,7 @@ from typing import Optional
 import click
 from click import Context
 
-from .context import load_cfn_context, load_sam_context
+from .context import load_contexts_in_background
 from .server import server
 
 logger = logging.getLogger(__name__)
@@ -23,8 +23,8 @@ def cli(ctx: Context, verbose: int) -> None:
     level = [logging.ERROR, logging.INFO, logging.DEBUG][min(verbose, 2)]
     logging.basicConfig(level=level, force=True)
     if ctx.invoked_subcommand is None:
-        cfn_aws_context = load_cfn_context()
-        sam_aws_context = load_sam_context(cfn_aws_context)
+        # Requests needing the contexts wait on them, see server.aws_context_of
+        cfn_aws_context, sam_aws_context = load_contexts_in_background()
         logger.info("Starting cfn-lsp-extra server")
         server(cfn_aws_context, sam_aws_context).start_io()
 
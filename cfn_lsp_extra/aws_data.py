@@ -8,11 +8,23 @@ of 899 resources.  The most properties for a resource is 52 for
 
 from __future__ import annotations
 
+import functools
+import re
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Any, Dict, List, Optional, Union
-
-from attrs import frozen
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
+
+from attrs import define, frozen
 
 from .scrape.markdown_textwrapper import TEXT_WRAPPER
 
@@ -21,6 +33,9 @@ from .scrape.markdown_textwrapper import TEXT_WRAPPER
 # Tree = Dict[str, Union[str, "Tree"]]
 Tree = Any
 
+# How many documentation entries an AWSContext keeps decoded
+DOCUMENTATION_CACHE_SIZE = 256
+
 
 class AWSRoot(Enum):
     """Represents the root of the heirarchy.
@@ -54,7 +69,7 @@ class AWSResourceName:
         return self.value
 
 
-@frozen
+@frozen(cache_hash=True)  # Hashes of nested properties hash all their parents
 class AWSPropertyName:
     """Property of an AWS resource or AWS resource property."""
 
@@ -104,81 +119,172 @@ class AWSSpecification:
     ALLOWED_VALUES = "AllowedValues"
     REF_RETURN_VALUE = "RefReturnValue"
 
+    # Fields which may instead be given by the id of a documentation entry,
+    # under the field name suffixed with ID_SUFFIX
+    DOCUMENTATION_FIELDS = (MARKDOWN_DOCUMENTATION, REF_RETURN_VALUE, DOCUMENTATION)
+    ID_SUFFIX = "Id"
+
+
+@define(slots=True)
+class _SpecPath:
+    """The spec node of a name, see AWSContext.
+
+    Attributes
+    ----------
+    resource : str
+        The resource type the name is part of.
+    raw : Optional[Tree]
+        The node found following the name as given, if any.
+    enriched : Optional[Tree]
+        The node found following the name with the ItemTypes of its
+        properties applied, if any.
+    enrichable : bool
+        Whether the ItemTypes of all the properties of the name could be
+        found."""
+
+    resource: str
+    raw: Optional[Tree]
+    enriched: Optional[Tree]
+    enrichable: bool
+
+    @property
+    def tree(self) -> Optional[Tree]:
+        if self.enrichable and self.enriched is not None:
+            return self.enriched
+        # Sometimes ItemType is something like 'String' or 'Tag', which
+        # results in an invalid name
+        return self.raw
+
+
+_UNKNOWN = _SpecPath(resource="", raw=None, enriched=None, enrichable=False)
 
-class AWSContext:
-    """A handle on AWS resource data for the lsp server."""
 
-    def __init__(self, resource_map: Tree, property_map: Tree):
+class AWSContext:
+    """A handle on AWS resource data for the lsp server.
+
+    The spec node of each name looked up is memoized, and derived from the
+    node of its parent, so lookups of names are hash lookups after the
+    first, and the first costs a lookup per property of the name rather
+    than a search of the spec per property.
+
+    Nodes may give their documentation by the id of an entry of
+    documentation rather than inline, see spec_artifact, entries are read
+    on demand and the most recently used kept."""
+
+    def __init__(
+        self,
+        resource_map: Tree,
+        property_map: Tree,
+        documentation: Optional[Mapping[int, str]] = None,
+    ):
         self.resource_map = resource_map
         """For resources that have properties within a property (also known as subproperties), a list of subproperty specifications"""
         self.property_map = property_map
         self.property_map_lc = {k.lower(): k for k in property_map}
+        self.documentation = documentation
+        self._paths: Dict[Union[AWSName, str], _SpecPath] = {}
+        self._documentation_entry: Optional[Callable[[int], str]] = (
+            None
+            if documentation is None
+            else functools.lru_cache(maxsize=DOCUMENTATION_CACHE_SIZE)(
+                documentation.__getitem__
+            )
+        )
 
-    def __enrich_name(self, name: AWSName) -> AWSName:
-        resource, *props = name.split()
-        name = AWSResourceName(resource)
-        for prop in props:
-            name = name / prop
-            tree = self.__raw_getitem(name)
-            if AWSSpecification.ITEM_TYPE in tree:
-                name = name / tree[AWSSpecification.ITEM_TYPE]
-        return name
-
-    def __raw_getitem(self, name: AWSName) -> Tree:
-        try:
-            resource, *props = name.split()
-            tree = self.resource_map[resource]
-            if props:  # Is NOT a resource
-                idx = -1
-                for idx, prop in list(enumerate(props))[::-1]:  # noqa: B007
-                    property_key = f"{resource}.{prop}"
-                    if property_key in self.property_map:
-                        tree = self.property_map[property_key]
-                        break
-                    if property_key.lower() in self.property_map_lc:
-                        tree = self.property_map[
-                            self.property_map_lc[property_key.lower()]
-                        ]
-                        break
-                else:
-                    idx = -1
-
-                for nested_prop in props[idx + 1 :]:
-                    tree = tree[AWSSpecification.PROPERTIES][nested_prop]
-
-            return tree
-        except KeyError as e:
-            raise KeyError(f"'{name}' is not a recognised resource or property") from e
+    def _path(self, name: Union[AWSName, str]) -> _SpecPath:
+        path = self._paths.get(name)
+        if path is None:
+            if isinstance(name, AWSResourceName):
+                tree = self.resource_map.get(name.value)
+                path = (
+                    _UNKNOWN
+                    if tree is None
+                    else _SpecPath(
+                        resource=name.value, raw=tree, enriched=tree, enrichable=True
+                    )
+                )
+            elif isinstance(name, AWSPropertyName):
+                path = self._child(self._path(name.parent), name.property_)
+            else:  # Looked up as the path of names it splits to
+                resource, *props = name.split()
+                path = self._path(AWSResourceName(value=resource))
+                for prop in props:
+                    path = self._child(path, prop)
+            self._paths[name] = path
+        return path
+
+    def _child(self, parent: _SpecPath, prop: str) -> _SpecPath:
+        if parent is _UNKNOWN:
+            return _UNKNOWN
+        resource = parent.resource
+        enrichable, enriched = False, None
+        if parent.enrichable:
+            tree = self._property(resource, parent.enriched, prop)
+            if tree is not None:
+                enrichable, enriched = True, tree
+                if AWSSpecification.ITEM_TYPE in tree:
+                    item_type = tree[AWSSpecification.ITEM_TYPE]
+                    enriched = self._property(resource, tree, item_type)
+        return _SpecPath(
+            resource=resource,
+            raw=self._property(resource, parent.raw, prop),
+            enriched=enriched,
+            enrichable=enrichable,
+        )
 
-    def __getitem__(self, name: AWSName) -> Tree:
+    def _property(self, resource: str, parent: Optional[Tree], prop: str) -> Optional[Tree]:
+        """Return the node of the property prop of the node parent.
+
+        Properties with their own property type, e.g. "AWS::EC2::Instance.Ebs",
+        take precedence over the properties of parent."""
+        property_key = f"{resource}.{prop}"
+        if property_key in self.property_map:
+            return self.property_map[property_key]
+        property_key_lc = property_key.lower()
+        if property_key_lc in self.property_map_lc:
+            return self.property_map[self.property_map_lc[property_key_lc]]
+        if parent is None:
+            return None
         try:
-            return self.__raw_getitem(self.__enrich_name(name))
+            return parent[AWSSpecification.PROPERTIES][prop]
         except KeyError:
-            # Sometimes ItemType is something like 'String' or 'Tag', which results in an invalid name
-            return self.__raw_getitem(name)
+            return None
+
+    def __getitem__(self, name: AWSName) -> Tree:
+        tree = self._path(name).tree
+        if tree is None:
+            raise KeyError(f"'{name}' is not a recognised resource or property")
+        return tree
 
     def __contains__(self, name: AWSName) -> bool:
+        return self._path(name).tree is not None
+
+    def _text(self, tree: Tree, field: str, default: str = "") -> str:
+        """Return the documentation field of the node tree."""
+        # Be a bit forgiving here a la SAM specification
+        if field in tree:
+            return tree[field]  # type: ignore[no-any-return]
+        doc_id = tree.get(field + AWSSpecification.ID_SUFFIX)
+        if doc_id is None or self._documentation_entry is None:
+            return default
         try:
-            self[name]
+            return self._documentation_entry(doc_id)
         except KeyError:
-            return False
-        else:
-            return True
+            return default
 
     def description(self, name: AWSName) -> str:
         """Get the description of obj."""
-        # Be a bit forgiving here a la SAM specification
-        return self[name].get(AWSSpecification.MARKDOWN_DOCUMENTATION, "")  # type: ignore[no-any-return]
+        return self._text(self[name], AWSSpecification.MARKDOWN_DOCUMENTATION)
 
     def return_values(self, resource: AWSResourceName) -> Dict[str, str]:
         dcts = self[resource].get(AWSSpecification.ATTRIBUTES, {})
         return {
-            k: v.get(AWSSpecification.MARKDOWN_DOCUMENTATION, "")
+            k: self._text(v, AWSSpecification.MARKDOWN_DOCUMENTATION)
             for k, v in dcts.items()
         }
 
     def ref_return_value(self, resource: AWSResourceName) -> str:
-        return self[resource].get(AWSSpecification.REF_RETURN_VALUE, "unknown")  # type: ignore[no-any-return]
+        return self._text(self[resource], AWSSpecification.REF_RETURN_VALUE, "unknown")
 
     def allowed_values(self, property_: AWSPropertyName) -> List[str]:
         return self[property_].get(AWSSpecification.ALLOWED_VALUES, [])  # type: ignore[no-any-return]
@@ -253,3 +359,95 @@ class AWSLogicalId(AWSRefSource):
         for line in full_str.splitlines():
             content += "\n".join(TEXT_WRAPPER.wrap(line)) + "\n"
         return content
+
+
+@frozen
+class AWSSymbol:
+    """A name defined in a section of a template, e.g. a resource.
+
+    Attributes
+    ----------
+    section : str
+        The section of the template defining the name, e.g. Resources.
+    logical_name : str
+        The name defined.
+    source : Optional[AWSRefSource]
+        What a Ref of the name refers to, for resources and parameters."""
+
+    section: str
+    logical_name: str
+    source: Optional[AWSRefSource] = None
+
+
+@frozen
+class AWSReference:
+    """A use of a name defined by a template, e.g. a Ref of a resource.
+
+    Attributes
+    ----------
+    kind : str
+        The key making the use, e.g. Ref, Fn::GetAtt, DependsOn, Condition or
+        Fn::Sub.
+    logical_name : str
+        The name used.
+    sections : Tuple[str, ...]
+        The sections of the template the name may be defined in, earlier
+        sections taking precedence."""
+
+    kind: str
+    logical_name: str
+    sections: Tuple[str, ...]
+
+
+@frozen
+class AWSExport:
+    """An output of a template exported for other stacks to import.
+
+    Attributes
+    ----------
+    name : str
+        The name of the export, if is_sub the string substituted to give it.
+    output : str
+        The logical name of the output making the export.
+    uri : str
+        The uri of the template making the export.
+    is_sub : bool
+        Whether the name is given by Fn::Sub, so name only gives a pattern of
+        the names exported, e.g. "${AWS::StackName}-VpcId".
+    description : Optional[str]
+        The description of the output.
+    resource : Optional[AWSLogicalId]
+        The resource the value of the output refers to, if any."""
+
+    name: str
+    output: str
+    uri: str
+    is_sub: bool = False
+    description: Optional[str] = None
+    resource: Optional[AWSLogicalId] = None
+
+    def matches(self, name: str) -> bool:
+        """Return whether name is a name exported."""
+        if self.is_sub:
+            return _sub_pattern(self.name).fullmatch(name) is not None
+        return name == self.name
+
+    def as_documentation(self) -> str:
+        description_str = "\n" + self.description if self.description else ""
+        resource_str = ""
+        if self.resource:
+            type_str = f" (`{self.resource.type_}`)" if self.resource.type_ else ""
+            resource_str = (
+                f"  \n*Resource*: `{self.resource.logical_name}`{type_str}"
+            )
+        return (
+            f"### Export: `{self.name}`{description_str}  \n"
+            f"*Output*: `{self.output}` of {self.uri}{resource_str}"
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _sub_pattern(name: str) -> Pattern[str]:
+    """Return a pattern matching the strings name substitutes to."""
+    parts = re.split(r"\$\{[^!}][^}]*\}", name)
+    return re.compile(".+".join(re.escape(part.replace("${!", "${")) for part in parts))
@@ -2,6 +2,8 @@
 Completion logic.
 """
 
+from typing import Optional
+
 from lsprotocol.types import CompletionItem, CompletionList, Position
 from pygls.workspace import TextDocument
 
@@ -12,9 +14,11 @@ from ..decode.extractors import (
     ResourceExtractor,
     ResourcePropertyExtractor,
 )
+from ..workspace_index import WorkspaceIndex
 from .allowed_values import allowed_values_completions
 from .attributes import attribute_completions
 from .functions import intrinsic_function_completions
+from .imports import import_value_completions
 from .ref import ref_completions
 from .resources import resource_completions
 from .static import static_completions
@@ -26,12 +30,17 @@ TRIGGER_CHARACTERS = [
     "Ref: ",
     "!GetAtt ",
     "GetAtt: ",
+    "!ImportValue ",
+    "ImportValue: ",
     "!",
     '"Type": "',
     '"Ref": "',
     '"GetAtt": "',
+    '"Fn::ImportValue": "',
     '"',
 ]
+RESOURCE_EXTRACTOR = ResourceExtractor()
+RESOURCE_PROPERTY_EXTRACTOR = ResourcePropertyExtractor()
 
 
 def completions_for(
@@ -41,10 +50,11 @@ def completions_for(
     position: Position,
     allowed_values_extractor: AllowedValuesExtractor,
     use_sam: bool,
+    workspace_index: Optional[WorkspaceIndex] = None,
 ) -> CompletionList:
     """Return a list of completion items for the user's position in document."""
     line, char = position.line, position.character
-    resource_lookup = ResourceExtractor().extract(template_data)
+    resource_lookup = RESOURCE_EXTRACTOR.extract(template_data, (line, char))
     res_span = resource_lookup.at(line, char)
     if res_span:
         return resource_completions(res_span.value, aws_context, document, position)
@@ -55,7 +65,7 @@ def completions_for(
     if allowed_values_completions_result:
         return allowed_values_completions_result
 
-    prop_lookup = ResourcePropertyExtractor().extract(template_data)
+    prop_lookup = RESOURCE_PROPERTY_EXTRACTOR.extract(template_data, (line, char))
     prop_span = prop_lookup.at(line, char)
     if prop_span:
         return property_completions(prop_span.value, aws_context, document, position)
@@ -66,6 +76,13 @@ def completions_for(
     if ref_completions_result:
         return ref_completions_result
 
+    if workspace_index is not None:
+        import_completions_result = import_value_completions(
+            template_data, document, position, workspace_index
+        )
+        if import_completions_result:
+            return import_completions_result
+
     att_completions_result = attribute_completions(
         template_data, aws_context, document, position
     )
@@ -18,7 +18,9 @@ def allowed_values_completions(
     position: Position,
     allowed_values_extractor: AllowedValuesExtractor,
 ) -> Optional[CompletionList]:
-    lookup = allowed_values_extractor.extract(template_data)
+    lookup = allowed_values_extractor.extract(
+        template_data, (position.line, position.character)
+    )
     span = lookup.at(position.line, position.character)
     if span and span.value in aws_context:
         allowed_values = aws_context.allowed_values(span.value)
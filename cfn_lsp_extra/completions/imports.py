@@ -0,0 +1,39 @@
+"""
+Completions for !ImportValues
+"""
+import re
+from typing import Optional
+
+from lsprotocol.types import CompletionItem, CompletionList, Position
+from pygls.workspace import TextDocument
+
+from ..aws_data import Tree
+from ..cursor import text_edit, word_before_after_position
+from ..workspace_index import WorkspaceIndex, import_at
+
+# Export names may also contain hyphens
+RE_END_EXPORT = re.compile("^[A-Za-z_0-9:-]*")
+RE_START_EXPORT = re.compile("[A-Za-z_0-9:-]*$")
+
+
+def import_value_completions(
+    template_data: Tree,
+    document: TextDocument,
+    position: Position,
+    workspace_index: WorkspaceIndex,
+) -> Optional[CompletionList]:
+    import_span = import_at(template_data, position)
+    if import_span:
+        before, after = word_before_after_position(
+            document, position, RE_START_EXPORT, RE_END_EXPORT
+        )
+        items = [
+            CompletionItem(
+                label=export.name,
+                documentation=export.as_documentation(),
+                text_edit=text_edit(position, before, after, export.name),
+            )
+            for export in workspace_index.exports(excluding=document.uri)
+        ]
+        return CompletionList(is_incomplete=False, items=items)
+    return None
@@ -17,6 +17,7 @@ from pygls.workspace import TextDocument
 
 from ..aws_data import AWSContext, AWSResourceName, AWSSpecification
 from ..cursor import text_edit, word_before_after_position
+from ..source_text import SourceText
 
 
 def resource_completions(
@@ -26,11 +27,12 @@ def resource_completions(
     position: Position,
 ) -> CompletionList:
     """Return a list of all resources, without documentation."""
+    text = SourceText.of(document)
     use_snippet = (
         not document.filename or not document.filename.endswith("json")
     ) and (
-        position.line == len(document.lines) - 1
-        or not document.lines[position.line + 1].strip()
+        position.line >= text.line_count - 1
+        or not text.line(position.line + 1).strip()
     )
     before, after = word_before_after_position(document, position)
     items = []
@@ -94,7 +94,9 @@ def static_completions(
     use_sam: bool
 ) -> Optional[CompletionList]:
     lookup, extractor = (SAM_STATIC_LOOKUP, SAM_EXTRACTOR) if use_sam else (CFN_STATIC_LOOKUP, CFN_EXTRACTOR)
-    position_lookup = extractor.extract(template_data)
+    position_lookup = extractor.extract(
+        template_data, (position.line, position.character)
+    )
     span = position_lookup.at(position.line, position.character)
     if span and span.value in lookup:
         before, after = word_before_after_position(document, position)
@@ -1,55 +1,210 @@
 """
 Utilities for loading the aws cloudformation doc content.
+
+The bundled specification, the bundled and user custom files, or else a
+user override of the specification, are merged into a single spec which
+is compiled to an artifact (see spec_artifact) in the user cache
+directory. The artifact is keyed by the package version and the hashes of
+the files merged, so later starts open it rather than parsing and merging
+json again.
 """
+import hashlib
 import json
 import logging
-from collections import ChainMap
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from importlib.metadata import PackageNotFoundError, version
 from pathlib import Path
+from typing import Mapping, Optional, Tuple
 
 from importlib_resources import as_file, files
 from platformdirs import PlatformDirs
 
 from .aws_data import AWSContext, AWSSpecification, Tree
+from .spec_artifact import ARTIFACT_SUFFIX, SpecArtifact, open_artifact, write_artifact
 
 logger = logging.getLogger(__name__)
 dirs = PlatformDirs("cfn-lsp-extra", "cfn-lsp-extra")
 CFN_OVERRIDE_CTX_PATH = Path(dirs.user_config_dir) / "context.json"
 SAM_OVERRIDE_CTX_PATH = Path(dirs.user_config_dir) / "sam_context.json"
 custom_ctx_path = Path(dirs.user_config_dir) / "custom.json"
+COMPILED_CTX_DIR = Path(dirs.user_cache_dir) / "context"
+# Compiled specs kept per resource, e.g. for environments of other versions
+MAX_COMPILED_CONTEXTS = 3
 
 
-def with_custom(context_map: Tree, custom_path: Path = custom_ctx_path) -> AWSContext:
-    """Overwrite part of context with custom content."""
+def package_version() -> str:
+    try:
+        return version("cfn-lsp-extra")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def deep_merge(base: Tree, overlay: Tree) -> Tree:
+    """Return base with the content of overlay merged in.
+
+    Mappings are merged key by key, other values of overlay replace those
+    of base. Neither base nor overlay are modified."""
+    if not (isinstance(base, Mapping) and isinstance(overlay, Mapping)):
+        return overlay
+    merged = dict(base)
+    for key, value in overlay.items():
+        merged[key] = deep_merge(merged[key], value) if key in merged else value
+    return merged
+
+
+def merge_custom(context_map: Tree, custom_path: Path = custom_ctx_path) -> Tree:
+    """Return context_map with the bundled and user custom content merged in."""
     logger.info("Updating context using custom file %s", custom_path)
     source = files("cfn_lsp_extra.resources").joinpath("custom.json")
     with as_file(source) as path, open(path, "r") as f:
-        context_map = ChainMap(json.load(f), context_map)
+        context_map = deep_merge(context_map, json.load(f))
     if custom_path.exists():
         logger.info("Updating context using user custom file %s", custom_path)
         with custom_path.open("r") as f:
-            context_map = ChainMap(json.load(f), context_map)
+            context_map = deep_merge(context_map, json.load(f))
+    return context_map
+
+
+def with_custom(context_map: Tree, custom_path: Path = custom_ctx_path) -> AWSContext:
+    """Overwrite part of context with custom content."""
+    documentation = spec_documentation(context_map)
+    merged = merge_custom(context_map, custom_path)
     return AWSContext(
-        resource_map=context_map[AWSSpecification.RESOURCE_TYPES],
-        property_map=context_map[AWSSpecification.PROPERTY_TYPES],
+        resource_map=merged[AWSSpecification.RESOURCE_TYPES],
+        property_map=merged[AWSSpecification.PROPERTY_TYPES],
+        documentation=documentation,
     )
 
 
-def load_context(
-    resource: str, override_path: Path = CFN_OVERRIDE_CTX_PATH
-) -> AWSContext:
-    """Load AWS context from a cache."""
+def load_spec(path: Path) -> Tree:
+    """Load the specification at path, from its artifact if it has one."""
+    artifact = open_artifact(path)
+    if artifact is not None:
+        logger.info("Loading context from artifact %s", artifact.path)
+        return artifact
+    with path.open("r") as f:
+        return json.load(f)
+
+
+def spec_documentation(spec: Tree) -> Optional[Mapping[int, str]]:
+    """Return the documentation store of spec, if it has one."""
+    return spec.documentation if isinstance(spec, SpecArtifact) else None
+
+
+def spec_context(spec: Tree) -> AWSContext:
+    """Return the context of the specification spec."""
+    return AWSContext(
+        spec[AWSSpecification.RESOURCE_TYPES],
+        spec[AWSSpecification.PROPERTY_TYPES],
+        spec_documentation(spec),
+    )
+
+
+def _file_digest(path: Path) -> str:
+    if not path.exists():
+        return "-"
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def compiled_key(source: Path, override_path: Path, custom_path: Path) -> str:
+    """Return the key of the spec compiled from source and the user files.
+
+    The bundled source is identified by the package version plus its size
+    and modification time, the user files, which may change at any time,
+    by their content."""
+    stat = source.stat()
+    key = hashlib.sha256()
+    for part in (
+        package_version(),
+        f"{stat.st_size}:{stat.st_mtime_ns}",
+        _file_digest(override_path),
+        _file_digest(custom_path),
+    ):
+        key.update(part.encode())
+        key.update(b"\0")
+    return key.hexdigest()[:32]
+
+
+def _compile(
+    source: Path, override_path: Path, custom_path: Path
+) -> Tuple[Tree, Optional[Mapping[int, str]]]:
+    """Return the merged spec and the documentation its ids refer to."""
     if override_path.exists():
         logger.info("Loading custom context from %s", override_path)
-        with override_path.open("r") as f:
-            d = json.load(f)
-            return AWSContext(
-                d[AWSSpecification.RESOURCE_TYPES], d[AWSSpecification.PROPERTY_TYPES]
-            )
-    else:
+        spec = load_spec(override_path)
+        return spec, spec_documentation(spec)
+    spec = load_spec(source)
+    return merge_custom(spec, custom_path), spec_documentation(spec)
+
+
+def _open_compiled(path: Path) -> Optional[SpecArtifact]:
+    if not path.exists():
+        return None
+    try:
+        artifact = SpecArtifact(path)
+        os.utime(path)  # Keep recently used compiled specs when pruning
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Failed to read compiled context %s: %s", path, e)
+        return None
+    return artifact
+
+
+def _prune_compiled(cache_dir: Path, stem: str) -> None:
+    compiled = sorted(
+        cache_dir.glob(f"{stem}-*{ARTIFACT_SUFFIX}"),
+        key=lambda p: p.stat().st_mtime_ns,
+        reverse=True,
+    )
+    for path in compiled[MAX_COMPILED_CONTEXTS:]:
+        logger.info("Removing compiled context %s", path)
+        path.unlink(missing_ok=True)
+
+
+def load_context(
+    resource: str,
+    override_path: Path = CFN_OVERRIDE_CTX_PATH,
+    custom_path: Path = custom_ctx_path,
+    cache_dir: Path = COMPILED_CTX_DIR,
+) -> AWSContext:
+    """Load AWS context from a cache.
+
+    Parameters
+    ----------
+    resource : str
+        The name of the bundled specification.
+    override_path : Path
+        A specification to use instead of the bundled specification, and
+        without custom content, if it exists.
+    custom_path : Path
+        Custom content to merge into the bundled specification.
+    cache_dir : Path
+        The directory compiled specifications are kept in."""
+    source = files("cfn_lsp_extra.resources").joinpath(resource)
+    with as_file(source) as source_path:
+        stem = Path(resource).stem
+        key = compiled_key(source_path, override_path, custom_path)
+        path = cache_dir / f"{stem}-{key}{ARTIFACT_SUFFIX}"
+        artifact = _open_compiled(path)
+        if artifact is not None:
+            logger.info("Loading compiled context from %s", path)
+            return spec_context(artifact)
         logger.info("Loading context...")
-        source = files("cfn_lsp_extra.resources").joinpath(resource)
-        with as_file(source) as path, open(path, "r") as f:
-            return with_custom(json.load(f))
+        spec, documentation = _compile(source_path, override_path, custom_path)
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        write_artifact(spec, path, documentation=documentation)
+        _prune_compiled(cache_dir, stem)
+        artifact = SpecArtifact(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Failed to compile context to %s: %s", path, e)
+        return AWSContext(
+            spec[AWSSpecification.RESOURCE_TYPES],
+            spec[AWSSpecification.PROPERTY_TYPES],
+            documentation,
+        )
+    logger.info("Compiled context to %s", path)
+    return spec_context(artifact)
 
 
 def load_cfn_context() -> AWSContext:
@@ -58,3 +213,22 @@ def load_cfn_context() -> AWSContext:
 
 def load_sam_context(cfn_context: AWSContext) -> AWSContext:
     return load_context("sam_context.json", SAM_OVERRIDE_CTX_PATH)
+
+
+def load_contexts_in_background() -> Tuple["Future[AWSContext]", "Future[AWSContext]"]:
+    """Start loading the cfn and sam contexts, in that order, in a thread.
+
+    The sam context doesn't depend on the cfn context, so it's loaded
+    even if loading the cfn context fails.
+
+    Returns
+    -------
+    Tuple[Future[AWSContext], Future[AWSContext]]
+        The futures of the cfn and sam contexts."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cfn-lsp-context")
+    cfn_context = executor.submit(load_cfn_context)
+    sam_context = executor.submit(
+        load_context, "sam_context.json", SAM_OVERRIDE_CTX_PATH
+    )
+    executor.shutdown(wait=False)
+    return cfn_context, sam_context
@@ -4,6 +4,8 @@ from typing import Pattern, Tuple
 from lsprotocol.types import Position, Range, TextEdit
 from pygls.workspace import TextDocument
 
+from .source_text import SourceText
+
 RE_END_WORD = re.compile("^[A-Za-z_0-9!:]*")
 RE_START_WORD = re.compile("[A-Za-z_0-9!:]*$")
 
@@ -20,14 +22,15 @@ def word_before_after_position(
     re_start_word: Pattern[str] = RE_START_WORD,
     re_end_word: Pattern[str] = RE_END_WORD,
 ) -> Tuple[str, str]:
-    lines = document.lines
-    if position.line >= len(lines):
+    text = SourceText.of(document)
+    if position.line >= text.line_count:
         return "", ""
 
-    pos = document.position_codec.position_from_client_units(lines, position)
-    row, col = pos.line, pos.character
+    line = text.line(position.line)
+    col = document.position_codec.position_from_client_units(
+        [line], Position(line=0, character=position.character)
+    ).character
 
-    line = lines[row]
     # Split word in two
     start = line[:col]
     end = line[col:]
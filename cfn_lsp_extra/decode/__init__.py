@@ -1,11 +1,19 @@
+from __future__ import annotations
+
 import json
+from typing import Any, Dict, Union
 
 import yaml
 from lsprotocol.types import Position
 
 from ..aws_data import Tree
-from .json_decoding import CfnJSONDecoder  # type: ignore[attr-defined]
+from ..source_text import SourceText, as_source_text
+from .json_decoding import decode_json  # type: ignore[attr-defined]
+from .lazy_yaml import decode_lazy_yaml
+from .nodes import PositionedDict
+from .tolerant_yaml import decode_tolerant_yaml
 from .yaml_decoding import SafePositionLoader
+from .yaml_window import window
 
 DEBUG_CHAR = "."
 
@@ -14,16 +22,38 @@ class CfnDecodingError(Exception):
     pass
 
 
-def decode(source: str, filename: str) -> Tree:
+class Template(PositionedDict):
+    """The root mapping of a decoded template.
+
+    Behaves exactly like a PositionedDict, but also holds the lookups
+    extractors have produced from it, so features working on the same
+    decoded template don't have to re-extract them."""
+
+    __slots__ = ("lookups",)
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.lookups: Dict[Any, Any] = {}
+
+    @classmethod
+    def from_node(cls, node: PositionedDict) -> Template:
+        return cls(node).with_spans_of(node)
+
+
+def decode(source: Union[str, SourceText], filename: str, lazy: bool = False) -> Tree:
     """Deserialise the cloudformation template source into a dictionary.
 
     Parameters
     ----------
-    source : str
+    source : Union[str, SourceText]
         template content, expected to be either json or yaml.
     filename: str
         name of the template file, determined whether source is taken to
         be json or yaml.
+    lazy: bool
+        Whether to leave large nested mappings of yaml templates undecoded
+        until they are used, see decode_lazy_yaml.  Errors within these are
+        then raised when they are used rather than by decode.
 
     Returns
     -------
@@ -35,32 +65,45 @@ def decode(source: str, filename: str) -> Tree:
     ------
     CfnDecodingError
         If json or yaml parsing fails."""
+    text = as_source_text(source)
     try:
         if filename.endswith("json"):
-            data = json.loads(source, cls=CfnJSONDecoder)
+            data = decode_json(text.text, text.line_starts)
+        elif lazy:
+            data = decode_lazy_yaml(text)
         else:
-            data = yaml.load(source, Loader=SafePositionLoader)  # noqa
+            data = yaml.load(text.text, Loader=SafePositionLoader)  # noqa
     except (json.JSONDecodeError, yaml.YAMLError) as e:
         raise CfnDecodingError(f"Error decoding {filename}") from e
-    return data
+    return Template.from_node(data) if isinstance(data, PositionedDict) else data
 
 
-def decode_unfinished(source: str, filename: str, position: Position) -> Tree:
+def decode_unfinished(
+    source: Union[str, SourceText],
+    filename: str,
+    position: Position,
+    windowed: bool = False,
+) -> Tree:
     """Deserialise the cloudformation template source into a dictionary.
 
-    If decoding fails, attempt to 'fix' source by making edits to the
-    current line.  If position is on an empty line, the character at
-    position will be set to an '.' (to aid completions).
+    If position is on an empty line, the character at position will be set
+    to an '.' (to aid completions).  yaml documents are decoded by an error
+    tolerant decoder, so errors only cost the entries they're in.  If
+    decoding a json document fails, attempt to 'fix' source by making edits
+    to the current line.
 
     Parameters
     ----------
-    source : str
+    source : Union[str, SourceText]
         template content, expected to be either json or yaml.
     filename: str
         name of the template file, determined whether source is taken to
         be json or yaml.
     position: Position
         The position of the user's cursor in the document
+    windowed: bool
+        Whether to decode only the parts of large yaml documents used by
+        completions at position, see yaml_window.window.
 
     Returns
     -------
@@ -71,28 +114,26 @@ def decode_unfinished(source: str, filename: str, position: Position) -> Tree:
     Raises
     ------
     CfnDecodingError
-        If json or yaml parsing fails even after edits."""
-    source_lst = source.splitlines()
+        If json parsing fails even after edits."""
+    text = as_source_text(source)
     line, char = position.line, position.character
     if not filename.endswith("json"):
-        source_lst[line] = yaml_line_enricher(source_lst[line], char)
-        source = "\n".join(source_lst)
+        text = text.with_line(line, yaml_line_enricher(text.line(line), char))
+        windowed_text = window(text, line) if windowed else None
+        data = decode_tolerant_yaml(windowed_text or text)
+        return Template.from_node(data) if isinstance(data, PositionedDict) else data
     try:
-        return decode(source, filename)
+        return decode(text, filename)
     except CfnDecodingError:
-        if filename.endswith("json"):
-            source_lst[line] = source_lst[line].rstrip(":, ") + ': "",'
-        else:
-            source_lst[line] = source_lst[line].rstrip() + ":"
-        source = "\n".join(source_lst)
-        return decode(source, filename)
+        text = text.with_line(line, text.line(line).rstrip(":, ") + ': "",')
+        return decode(text, filename)
 
 
 def yaml_line_enricher(line: str, char: int) -> str:
     stripped = line.strip()
     if not stripped:  # Empty line for property
         new_line = line[:char] + DEBUG_CHAR
-    elif stripped.endswith((":", "!Ref", "!GetAtt")):  # For resource or ref
+    elif stripped.endswith((":", "!Ref", "!GetAtt", "!ImportValue")):  # Resource or ref
         new_line = line + DEBUG_CHAR
     elif stripped.startswith("-"):  # First element in a list
         new_line = line + DEBUG_CHAR + ": "
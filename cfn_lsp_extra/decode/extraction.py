@@ -0,0 +1,356 @@
+"""
+Extraction of positional information with a single walk of a template.
+
+Each NodeVisitor extracts from the mappings of a template one at a time, so
+all of the extractors features use can share one walk of a template, rather
+than each walking it separately.  Visitors say which mappings they extract
+from, so a visitor only extracting from the resources of a template (say)
+isn't called with every mapping.
+
+Features only interested in the cursor position (e.g. hovers) can also prune
+the walk to the subtrees which could contain a line.  The lines of a subtree
+are bounded by the key it is the value of and the key following it, so these
+bounds come from the key spans of its parent mapping, and in particular
+subtrees decoded lazily (see lazy_yaml) which can't contain the line are
+never decoded.  The span of a node in a yaml alias is at its anchor, outside
+of these bounds, but CloudFormation doesn't support anchors and aliases.
+"""
+from __future__ import annotations
+
+from itertools import pairwise
+from threading import Lock
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+    Union,
+)
+from weakref import WeakSet
+
+from ..aws_data import AWSPropertyName, AWSResourceName, Tree
+from . import Template
+from .nodes import PositionedDict, key_span
+from .position import Spanning, SpanTable
+
+# Matches any key in the paths of visitors
+ANY = "*"
+
+Parent = Union[AWSPropertyName, AWSResourceName]
+
+
+class NodeVisitor(Protocol):
+    """Extracts from mappings of a template one at a time.
+
+    Attributes
+    ----------
+    node_paths : Optional[AbstractSet[Tuple[str, ...]]]
+        The keys leading from the root of the template to the mappings
+        visit is called with, where ANY matches any key.  Paths only pass
+        through mappings (i.e. not lists).  If None, visit is called with
+        every mapping of the template.
+    in_properties : bool
+        Whether visit is also called with the mappings making up the
+        properties of resources (i.e. with Properties mappings and mappings
+        nested in them)."""
+
+    node_paths: Optional[AbstractSet[Tuple[str, ...]]]
+    in_properties: bool
+
+    def visit(
+        self, node: PositionedDict, path: Tuple[str, ...], parent: Optional[Parent]
+    ) -> Iterable[Spanning[Any]]:
+        """Return the spans extracted from node.
+
+        path is the keys leading to node if it was matched by node_paths, and
+        parent is the resource or property node is the value of if it's
+        part of the properties of a resource.  The spans are added to the
+        visitor's table as they are iterated over, so visit is usually a
+        generator."""
+        ...
+
+
+# The visit method of a visitor, and the method adding spans to its table
+_Visit = Tuple[
+    Callable[..., Iterable[Spanning[Any]]], Callable[[Iterable[Spanning[Any]]], None]
+]
+
+
+class _PathTrie:
+    """The paths of visitors, sharing their common prefixes."""
+
+    __slots__ = ("children", "visits", "resource")
+
+    def __init__(self) -> None:
+        self.children: Dict[Any, _PathTrie] = {}
+        self.visits: List[_Visit] = []
+        self.resource = False  # Whether mappings at this path are resources
+
+    def add(self, path: Tuple[str, ...]) -> _PathTrie:
+        trie = self
+        for key in path:
+            trie = trie.children.setdefault(key, _PathTrie())
+        return trie
+
+
+def extract_all(
+    tree: Tree, visitors: Sequence[NodeVisitor], line: Optional[int] = None
+) -> Dict[NodeVisitor, SpanTable[Any]]:
+    """Extract from tree with each of visitors, in a single walk of tree.
+
+    Parameters
+    ----------
+    tree : Tree
+        The decoded template to extract from.
+    visitors : Sequence[NodeVisitor]
+        The visitors to extract with.
+    line : Optional[int]
+        If not None, only walk the subtrees of tree which could contain
+        line.  The spans on line are then the same as those extracted from
+        all of tree, but spans on other lines may be missing.
+
+    Returns
+    -------
+    Dict[NodeVisitor, SpanTable[Any]]
+        The spans extracted by each of visitors."""
+    return _Walk(visitors, line).run(tree)
+
+
+def _bounds(
+    starts: List[Optional[int]], end: Optional[int]
+) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Return the first and last lines of consecutive subtrees.
+
+    starts are the first lines of the subtrees (None if unknown), and end is
+    the last line of the last subtree (None if unknown).  Each subtree ends
+    on the line the next subtree starts on, since they can share a line, but
+    if starts aren't in document order nothing is known about the subtrees."""
+    known = [start for start in starts if start is not None]
+    if any(a > b for a, b in pairwise(known)):
+        return [(None, end)] * len(starts)
+    bounds = []
+    for start in reversed(starts):
+        bounds.append((start, end))
+        if start is not None:
+            end = start
+    bounds.reverse()
+    return bounds
+
+
+def _contains(bounds: Tuple[Optional[int], Optional[int]], line: int) -> bool:
+    start, end = bounds
+    return (start is None or start <= line) and (end is None or line <= end)
+
+
+class _Walk:
+    """A walk of a tree, calling visitors with the mappings they visit."""
+
+    def __init__(self, visitors: Sequence[NodeVisitor], line: Optional[int] = None):
+        self.line = line
+        self.results: Dict[NodeVisitor, SpanTable[Any]] = {
+            visitor: SpanTable() for visitor in visitors
+        }
+        visits: Dict[NodeVisitor, _Visit] = {
+            v: (v.visit, table.add_spans) for v, table in self.results.items()
+        }
+        self.everywhere = [visits[v] for v in visits if v.node_paths is None]
+        self.in_properties = [visits[v] for v in visits if v.in_properties]
+        self.root = _PathTrie()
+        for visitor, visit in visits.items():
+            for path in visitor.node_paths or ():
+                self.root.add(path).visits.append(visit)
+        if self.in_properties:
+            self.root.add(("Resources", ANY)).resource = True
+
+    def run(self, tree: Tree) -> Dict[NodeVisitor, SpanTable[Any]]:
+        if isinstance(tree, dict):
+            self.mapping(tree, [self.root], (), None, None)
+        elif isinstance(tree, list):
+            self.sequence(tree, None, None)
+        return self.results
+
+    def mapping(
+        self,
+        node: Dict[Any, Any],
+        tries: List[_PathTrie],
+        path: Tuple[str, ...],
+        parent: Optional[Parent],
+        end: Optional[int],
+    ) -> None:
+        """Visit node and its descendants.
+
+        tries are the nodes of the path trie matching path, the keys leading
+        to node, and parent is the resource or property node is part of.
+        end is the last line node could be on, if known."""
+        visits = self.everywhere
+        resource = False
+        if tries:
+            visits = visits + [visit for trie in tries for visit in trie.visits]
+            if len(tries) > 1:  # Paths with wildcards may match a path twice
+                visits = list({id(add): (v, add) for v, add in visits}.values())
+            resource = any(trie.resource for trie in tries)
+        if parent is not None:
+            visits = visits + self.in_properties
+        # Spans go straight into the tables, without intermediate lookups
+        for visit, add_spans in visits:
+            add_spans(visit(node, path, parent))
+        ends: Optional[Dict[Any, Optional[int]]] = None
+        if self.line is None:
+            entries: Iterable[Tuple[Any, Any]] = node.items()
+        else:
+            ends = self.containing(node, end)
+            entries = [(key, node[key]) for key in ends]
+        for key, value in entries:
+            if not isinstance(value, (dict, list)):
+                continue
+            child_end = None if ends is None else ends[key]
+            child_parent: Optional[Parent] = None
+            if parent is not None:
+                # Properties without a position aren't extracted from
+                if key_span(node, key) is not None:
+                    child_parent = parent / key
+            elif (
+                resource
+                and key == "Properties"
+                and isinstance(value, dict)
+                and "Type" in node
+            ):
+                child_parent = AWSResourceName(value=node["Type"] or "")
+            if isinstance(value, list):
+                self.sequence(value, child_parent, child_end)
+                continue
+            if tries:
+                child_tries = [
+                    child
+                    for trie in tries
+                    for child in (trie.children.get(key), trie.children.get(ANY))
+                    if child is not None
+                ]
+                child_path = path + (key,) if child_tries else ()
+                self.mapping(value, child_tries, child_path, child_parent, child_end)
+            else:
+                self.mapping(value, tries, path, child_parent, child_end)
+
+    def sequence(
+        self, items: List[Any], parent: Optional[Parent], end: Optional[int]
+    ) -> None:
+        """Visit the mappings in items, which are part of parent if not None.
+
+        end is the last line items could be on, if known."""
+        if self.line is None:
+            for item in items:
+                if isinstance(item, dict):
+                    self.mapping(item, [], (), parent, None)
+                elif isinstance(item, list):
+                    self.sequence(item, None, None)
+            return
+        line = self.line
+        # A mapping starts on or before the line of its first key
+        starts = [
+            min((span.line for span in item.key_spans.values()), default=None)
+            if isinstance(item, PositionedDict)
+            else None
+            for item in items
+        ]
+        for item, bounds in zip(items, _bounds(starts, end), strict=True):
+            if not _contains(bounds, line):
+                continue
+            if isinstance(item, dict):
+                self.mapping(item, [], (), parent, bounds[1])
+            elif isinstance(item, list):
+                self.sequence(item, None, bounds[1])
+
+    def containing(
+        self, node: Dict[Any, Any], end: Optional[int]
+    ) -> Dict[Any, Optional[int]]:
+        """Return the keys of node whose values could contain the line.
+
+        Each key is mapped to the last line its value could be on, the line
+        of the next key of node, or end for the last key."""
+        line = self.line
+        assert line is not None
+        key_spans = node.key_spans if isinstance(node, PositionedDict) else {}
+        starts = [
+            span.line if (span := key_spans.get(key)) is not None else None
+            for key in node
+        ]
+        return {
+            key: bounds[1]
+            for key, bounds in zip(node, _bounds(starts, end), strict=True)
+            if _contains(bounds, line)
+        }
+
+
+# Key of the lookups of templates holding the spans extracted by a pruned walk
+_PRUNED = "pruned"
+
+
+class ExtractionEngine:
+    """Extracts from templates with all the visitors in use, in one walk.
+
+    Visitors are registered the first time they extract from a template,
+    and from then on the first extraction from a template extracts with all
+    registered visitors, saving the results on the template.  Later
+    extractions from the template, by any visitor, are then lookups.
+
+    Extractions for a line are saved separately, and only for the last line
+    extracted for, since the cursor moving invalidates them.  These only
+    extract with the visitors which have extracted for a line before, as
+    other visitors (e.g. for the logical ids of a template) need all of a
+    template."""
+
+    def __init__(self) -> None:
+        self._visitors: WeakSet[NodeVisitor] = WeakSet()
+        self._line_visitors: WeakSet[NodeVisitor] = WeakSet()
+        self._lock = Lock()
+
+    def extract(
+        self, template: Template, visitor: NodeVisitor, line: Optional[int] = None
+    ) -> SpanTable[Any]:
+        """Return the spans extracted from template by visitor.
+
+        If line is not None, only the spans on line are guaranteed to be
+        extracted, see extract_all."""
+        lookups = template.lookups
+        if visitor in lookups:  # Also holds the spans on any line
+            return lookups[visitor]  # type: ignore[no-any-return]
+        with self._lock:
+            self._visitors.add(visitor)
+            registered = list(self._visitors)
+            if line is not None:
+                self._line_visitors.add(visitor)
+                registered = list(self._line_visitors)
+        if line is None:
+            pending = [v for v in registered if v not in lookups]
+            lookups.update(self._extract_all(template, pending, visitor, None))
+            return lookups[visitor]  # type: ignore[no-any-return]
+        pruned_line, pruned = lookups.get(_PRUNED, (None, {}))
+        if pruned_line != line:
+            pruned = {}
+        if visitor not in pruned:
+            pending = [v for v in registered if v not in lookups and v not in pruned]
+            pruned = {**pruned, **self._extract_all(template, pending, visitor, line)}
+            lookups[_PRUNED] = (line, pruned)
+        return pruned[visitor]  # type: ignore[no-any-return]
+
+    @staticmethod
+    def _extract_all(
+        template: Template,
+        visitors: Sequence[NodeVisitor],
+        visitor: NodeVisitor,
+        line: Optional[int],
+    ) -> Dict[NodeVisitor, SpanTable[Any]]:
+        try:
+            return extract_all(template, visitors, line)
+        except Exception:
+            # Don't fail visitor because another visitor fails
+            return extract_all(template, [visitor], line)
+
+
+ENGINE = ExtractionEngine()
@@ -5,76 +5,160 @@ For example extracting the positions of resource parameters.
 """
 from __future__ import annotations
 
+import re
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, List, Optional, Set, Tuple, TypeVar, Union
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 from attrs import frozen
 
-from .. import remove_prefix
 from ..aws_data import (
     AWSLogicalId,
     AWSParameter,
     AWSPropertyName,
+    AWSReference,
+    AWSRefSource,
     AWSResourceName,
+    AWSSymbol,
     Tree,
 )
-from . import DEBUG_CHAR
-from .position import PositionLookup, Spanning
-from .yaml_decoding import POSITION_PREFIX, VALUES_POSITION_PREFIX
+from . import DEBUG_CHAR, Template
+from .extraction import ANY, ENGINE, extract_all
+from .nodes import (
+    PositionedDict,
+    Span,
+    as_positioned,
+    element_span,
+    key_span,
+    value_span,
+)
+from .position import Spanning, SpanTable
 
 E = TypeVar("E", covariant=True)
 
 
 class Extractor(ABC, Generic[E]):
-    @abstractmethod
-    def extract(self, node: Tree) -> PositionLookup[E]:
+    def extract(
+        self, node: Tree, target: Optional[Tuple[int, int]] = None
+    ) -> SpanTable[E]:
         """Call extract contents from node.
 
+        If node is a decoded Template, the result is memoized on it.
+
         Parameters
         ----------
         node : Tree
             The root node to extract from.
+        target : Optional[Tuple[int, int]]
+            A (line, character) position, if not None only the items at this
+            position need to be extracted, so parts of node which can't
+            contain it may be skipped.
 
         Returns
         -------
-        PositionLookup[T]
-            A PositionLookup object containing items from source."""
+        SpanTable[T]
+            A SpanTable object containing items from source."""
+        if isinstance(node, Template):
+            if self not in node.lookups:
+                node.lookups[self] = self._extract(node)
+            return node.lookups[self]  # type: ignore[no-any-return]
+        return self._extract(as_positioned(node))
+
+    @abstractmethod
+    def _extract(self, node: Tree) -> SpanTable[E]:
         ...
 
 
-class RecursiveExtractor(Extractor[E]):
-    def extract(self, node: Tree) -> PositionLookup[E]:
-        """Call extract_node at each of the inner nodes of node.
+class NodeExtractor(Extractor[E]):
+    """An extractor extracting from the mappings of a template one at a time.
+
+    Extracting from a decoded Template shares a single walk of the template
+    with all other NodeExtractors in use, see extraction.ExtractionEngine.
+    Extractors of the same class and with equal attributes are equal, so
+    share their results.  Extracting for a target only walks the subtrees
+    which could contain its line, see extraction.extract_all.
+
+    Attributes
+    ----------
+    node_paths : Optional[AbstractSet[Tuple[str, ...]]]
+        The paths of the mappings visit is called with, see
+        extraction.NodeVisitor.  If None, visit is called with every mapping.
+    in_properties : bool
+        Whether visit is also called with the mappings making up the
+        properties of resources."""
+
+    node_paths: Optional[AbstractSet[Tuple[str, ...]]] = None
+    in_properties = False
+
+    def extract(
+        self, node: Tree, target: Optional[Tuple[int, int]] = None
+    ) -> SpanTable[E]:
+        line = None if target is None else target[0]
+        if isinstance(node, Template):
+            return ENGINE.extract(node, self, line)
+        if line is None:
+            return super().extract(node)
+        return extract_all(as_positioned(node), [self], line)[self]
+
+    def _extract(self, node: Tree) -> SpanTable[E]:
+        return extract_all(node, [self])[self]
+
+    @abstractmethod
+    def visit(
+        self,
+        node: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterable[Spanning[E]]:
+        """Return the spans extracted from the mapping node.
 
         Parameters
         ----------
-        node : Tree
-            node to extract from (recursively).
+        node : PositionedDict
+            The mapping to extract from, its descendants are visited
+            separately.
+        path : Tuple[str, ...]
+            The keys leading to node, if it was matched by node_paths.
+        parent : Optional[Union[AWSPropertyName, AWSResourceName]]
+            The resource or property node is the value of, if node is part of
+            the properties of a resource."""
 
-        Returns
-        -------
-        PositionLookup[T]
-            A PositionLookup object containing items from source."""
-        if isinstance(node, dict):
-            position_lookup = PositionLookup.from_iterable(self.extract_node(node))
-            iterable = node.values()
-        else:
-            position_lookup = PositionLookup[E]()
-            iterable = node
-        for child in iterable:
-            if isinstance(child, dict):
-                position_lookup.extend_with_appends(self.extract(child))
-            elif isinstance(child, list):
-                for sub_child in filter(lambda c: isinstance(c, (dict, list)), child):
-                    position_lookup.extend_with_appends(self.extract(sub_child))
-        return position_lookup
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __hash__(self) -> int:
+        return hash(type(self))
+
+
+class RecursiveExtractor(NodeExtractor[E]):
+    """Calls extract_node with each of the mappings of a template."""
+
+    def visit(
+        self,
+        node: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterable[Spanning[E]]:
+        return self.extract_node(node)
 
     @abstractmethod
-    def extract_node(self, node: Tree) -> List[Spanning[E]]:
+    def extract_node(self, node: Tree) -> Iterable[Spanning[E]]:
         ...
 
 
-class ResourcePropertyExtractor(Extractor[AWSPropertyName]):
+class ResourcePropertyExtractor(NodeExtractor[AWSPropertyName]):
     """Extractor for resource and nested properties.
 
     Methods
@@ -82,94 +166,54 @@ class ResourcePropertyExtractor(Extractor[AWSPropertyName]):
     extract(node)
         Extract resource and nested properties from node."""
 
-    def extract(self, node: Tree) -> PositionLookup[AWSPropertyName]:
-        props = []
-        if "Resources" in node and isinstance(node["Resources"], dict):
-            for resource in filter(
-                lambda r: isinstance(r, dict), node["Resources"].values()
-            ):
-                is_res_node = "Properties" in resource and "Type" in resource
-                if is_res_node and isinstance(resource["Properties"], dict):
-                    type_ = resource["Type"] or ""
-                    props.extend(
-                        self._extract_recursive(
-                            resource["Properties"],
-                            AWSResourceName(value=type_),
-                        )
-                    )
-                elif (
-                    is_res_node
-                    and isinstance(resource["Properties"], str)
-                    and VALUES_POSITION_PREFIX in resource
-                ):
-                    props.extend(
-                        self._extract_unfinished(
-                            resource,
-                            resource["Properties"],
-                            AWSResourceName(value=resource.get("Type", "")),
-                        )
-                    )
-        return PositionLookup.from_iterable(props)
+    node_paths = frozenset({("Resources", ANY)})
+    in_properties = True
 
-    def _extract_recursive(
-        self, node: Tree, parent: Union[AWSPropertyName, AWSResourceName]
-    ) -> List[Spanning[AWSPropertyName]]:
-        props = []
-        if isinstance(node, list):
-            for sub_node in node:
-                if isinstance(sub_node, (dict, list)):
-                    props.extend(self._extract_recursive(sub_node, parent))
-            return props
-        for key, value in node.items():
-            if key.startswith(POSITION_PREFIX):
-                prop = remove_prefix(key, POSITION_PREFIX)
-                aws_prop = parent / prop
-                line, char = value
-                props.append(
-                    Spanning[AWSPropertyName](
-                        value=aws_prop, line=line, char=char, span=len(prop)
-                    )
+    def visit(
+        self,
+        node: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[AWSPropertyName]]:
+        if parent is None:  # A resource
+            is_res_node = "Properties" in node and "Type" in node
+            if is_res_node and isinstance(node["Properties"], str):
+                yield from self._extract_unfinished(
+                    node, "Properties", AWSResourceName(value=node.get("Type", ""))
                 )
-
-                if isinstance(node[prop], dict):
-                    props.extend(self._extract_recursive(node[prop], aws_prop))
-                elif isinstance(node[prop], list):
-                    for sub_node in filter(lambda p: isinstance(p, dict), node[prop]):
-                        if isinstance(sub_node, dict):
-                            props.extend(self._extract_recursive(sub_node, aws_prop))
-                        elif isinstance(sub_node, list):
-                            props.extend(self._extract_recursive(sub_node, parent))
-                elif node[prop] == DEBUG_CHAR and VALUES_POSITION_PREFIX in node:
-                    props.extend(
-                        self._extract_unfinished(node, node[prop], parent / prop)
-                    )
-        return props
+            return
+        for prop, value in node.items():
+            span = key_span(node, prop)
+            if span is None:
+                continue
+            aws_prop = parent / prop
+            yield Spanning(
+                value=aws_prop, line=span.line, char=span.char, span=len(prop)
+            )
+            if not isinstance(value, (dict, list)) and value == DEBUG_CHAR:
+                yield from self._extract_unfinished(node, prop, aws_prop)
 
     def _extract_unfinished(
         self,
         node: Tree,
-        unfinished_property: Tree,
+        key: str,
         parent: Union[AWSPropertyName, AWSResourceName],
     ) -> List[Spanning[AWSPropertyName]]:
-        props = []
-        for dct in node[VALUES_POSITION_PREFIX]:
-            key = POSITION_PREFIX + unfinished_property
-            if key in dct:
-                line, char = dct[key]
-                aws_prop = parent / unfinished_property
-                props.append(
-                    Spanning[AWSPropertyName](
-                        value=aws_prop,
-                        line=line,
-                        char=char,
-                        span=len(unfinished_property),
-                    )
-                )
-                break
-        return props
-
-
-class ResourceExtractor(Extractor[AWSResourceName]):
+        span = value_span(node, key)
+        if span is None:
+            return []
+        unfinished_property = node[key]
+        return [
+            Spanning(
+                value=parent / unfinished_property,
+                line=span.line,
+                char=span.char,
+                span=len(unfinished_property),
+            )
+        ]
+
+
+class ResourceExtractor(NodeExtractor[AWSResourceName]):
     """Extractor for resources names.
 
     Methods
@@ -177,31 +221,24 @@ class ResourceExtractor(Extractor[AWSResourceName]):
     extract(node)
         Extract resource names from node."""
 
-    def extract(self, node: Tree) -> PositionLookup[AWSResourceName]:
-        props = []
-        if "Resources" in node and isinstance(node["Resources"], dict):
-            for resource_dct in node["Resources"].values():
-                if (
-                    isinstance(resource_dct, dict)
-                    and "Type" in resource_dct
-                    and VALUES_POSITION_PREFIX in resource_dct
-                ):
-                    type_ = resource_dct["Type"] or ""
-                    value_positions = resource_dct[VALUES_POSITION_PREFIX]
-                    key = POSITION_PREFIX + str(type_)  # type could be fn call
-                    for dct in value_positions:
-                        if key in dct:
-                            line, char = dct[key]
-                            props.append(
-                                Spanning[AWSResourceName](
-                                    value=AWSResourceName(value=type_),
-                                    line=line,
-                                    char=char,
-                                    span=len(type_),
-                                )
-                            )
-                            break
-        return PositionLookup.from_iterable(props)
+    node_paths = frozenset({("Resources", ANY)})
+
+    def visit(
+        self,
+        node: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[AWSResourceName]]:
+        # type could be fn call, in which case it has no value span
+        span = value_span(node, "Type")
+        if span is not None:
+            type_ = node["Type"] or ""
+            yield Spanning(
+                value=AWSResourceName(value=type_),
+                line=span.line,
+                char=span.char,
+                span=len(type_),
+            )
 
 
 @frozen
@@ -224,7 +261,7 @@ class StaticPath:
         return StaticPath(value=(key,))
 
 
-class StaticExtractor(Extractor[StaticPath]):
+class StaticExtractor(NodeExtractor[StaticPath]):
     """Extractor matching a set of 'fixed' paths.
 
     Methods
@@ -234,50 +271,50 @@ class StaticExtractor(Extractor[StaticPath]):
 
     def __init__(self, paths: Set[StaticPath]):
         self.paths = paths
-
-    def extract(self, node: Tree) -> PositionLookup[StaticPath]:
-        spans = (
-            span
-            for path in self.paths
-            for span in self._extract_recursive(node, path, path)
+        # The mappings holding the keys matched by paths
+        self.node_paths = frozenset(
+            tuple(ANY if key == StaticPath.MatchAny else key for key in path.value[:-1])
+            for path in paths
+            if path.value
         )
-        return PositionLookup.from_iterable(spans)
-
-    def _extract_recursive(
-        self, node: Tree, cur_path: StaticPath, full_path: StaticPath
-    ) -> List[Spanning[StaticPath]]:
-        spans = []
-        head, tail = cur_path.head_tail()
-        is_base_case, match_all = not tail.value, head == StaticPath.MatchAny
-        if is_base_case and match_all:
-            for key in node:
-                pos_key = POSITION_PREFIX + key
-                if pos_key in node:
-                    line, char = node[pos_key]
-                    spans.append(
-                        Spanning[StaticPath](
-                            value=full_path, line=line, char=char, span=len(key)
+
+    def visit(
+        self,
+        node: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[StaticPath]]:
+        for full_path in self.paths:
+            *prefix, head = full_path.value or (None,)
+            if head is None or len(prefix) != len(path):
+                continue
+            if any(
+                p != StaticPath.MatchAny and p != key
+                for p, key in zip(prefix, path, strict=True)
+            ):
+                continue
+            if head == StaticPath.MatchAny:
+                for key in node:
+                    span = key_span(node, key)
+                    if span is not None:
+                        yield Spanning(
+                            value=full_path,
+                            line=span.line,
+                            char=span.char,
+                            span=len(key),
                         )
+            else:
+                span = key_span(node, head)
+                if span is not None:
+                    yield Spanning(
+                        value=full_path,
+                        line=span.line,
+                        char=span.char,
+                        span=len(head),
                     )
-        elif is_base_case and head:
-            pos_key = POSITION_PREFIX + head
-            if pos_key in node:
-                line, char = node[pos_key]
-                spans.append(
-                    Spanning[StaticPath](
-                        value=full_path, line=line, char=char, span=len(head)
-                    )
-                )
-        elif match_all:
-            for sub_node in node.values():
-                if isinstance(sub_node, dict):
-                    spans.extend(self._extract_recursive(sub_node, tail, full_path))
-        elif head and head in node and isinstance(node[head], dict):
-            spans.extend(self._extract_recursive(node[head], tail, full_path))
-        return spans
 
 
-class AllowedValuesExtractor(Extractor[AWSPropertyName]):
+class AllowedValuesExtractor(NodeExtractor[AWSPropertyName]):
     """Extractor for property values.
 
     Methods
@@ -285,67 +322,30 @@ class AllowedValuesExtractor(Extractor[AWSPropertyName]):
     extract(node)
         Extract resource and nested property values from node."""
 
-    def extract(self, node: Tree) -> PositionLookup[AWSPropertyName]:
-        props = []
-        if "Resources" in node and isinstance(node["Resources"], dict):
-            for resource in filter(
-                lambda r: isinstance(r, dict), node["Resources"].values()
-            ):
-                is_res_node = "Properties" in resource and "Type" in resource
-                if is_res_node and isinstance(resource["Properties"], dict):
-                    type_ = resource["Type"] or ""
-                    props.extend(
-                        self._extract_recursive(
-                            resource["Properties"],
-                            AWSResourceName(value=type_),
-                        )
-                    )
-                # don't care if isinstance(resource["Properties"], str) since this means no values
-        return PositionLookup.from_iterable(props)
-
-    def _extract_recursive(
-        self, node: Tree, parent: Union[AWSPropertyName, AWSResourceName]
-    ) -> List[Spanning[AWSPropertyName]]:
-        props = []
-        if isinstance(node, list):
-            for sub_node in node:
-                if isinstance(sub_node, (dict, list)):
-                    props.extend(self._extract_recursive(sub_node, parent))
-            return props
-
-        values_positions = node.get(VALUES_POSITION_PREFIX, [])
-        for key in node:
-            prop = remove_prefix(key, POSITION_PREFIX)
-            aws_prop = parent / prop
-            if key.startswith(POSITION_PREFIX):
-                # Try to obtain value position from values_positions
-                value = str(node.get(prop, ""))
-                val_key = POSITION_PREFIX + value
-                for dct in values_positions:
-                    if val_key in dct:
-                        line, char = dct[val_key]
-                        props.append(
-                            Spanning[AWSPropertyName](
-                                value=aws_prop,
-                                line=line,
-                                char=char,
-                                span=len(value),
-                            )
-                        )
-                        break
+    node_paths: AbstractSet[Tuple[str, ...]] = frozenset()
+    in_properties = True
 
-            if prop in node and isinstance(node[prop], dict):
-                props.extend(self._extract_recursive(node[prop], aws_prop))
-            elif prop in node and isinstance(node[prop], list):
-                for sub_node in filter(lambda p: isinstance(p, dict), node[prop]):
-                    if isinstance(sub_node, dict):
-                        props.extend(self._extract_recursive(sub_node, aws_prop))
-                    elif isinstance(sub_node, list):
-                        props.extend(self._extract_recursive(sub_node, parent))
-        return props
+    def visit(
+        self,
+        node: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[AWSPropertyName]]:
+        for prop, value in node.items():
+            if parent is None or key_span(node, prop) is None:
+                continue
+            span = value_span(node, prop)
+            if span is not None:
+                text = str(value)
+                yield Spanning(
+                    value=parent / prop,
+                    line=span.line,
+                    char=span.char,
+                    span=len(text),
+                )
 
 
-class ParameterExtractor(Extractor[AWSParameter]):
+class ParameterExtractor(NodeExtractor[AWSParameter]):
     """Extractor for parameters.
 
     Methods
@@ -354,35 +354,35 @@ class ParameterExtractor(Extractor[AWSParameter]):
         Extract resource names from node."""
 
     SECTION = "Parameters"
+    node_paths = frozenset({(SECTION,)})
 
-    def extract(self, node: Tree) -> PositionLookup[AWSParameter]:
-        params = []
-        if self.SECTION in node and isinstance(node[self.SECTION], dict):
-            for param_name, content_dct in node[self.SECTION].items():
-                key = POSITION_PREFIX + param_name
-                add_parameter = (
-                    key in node[self.SECTION]
-                    and isinstance(content_dct, dict)
-                    and "Type" in content_dct
+    def visit(
+        self,
+        section: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[AWSParameter]]:
+        for param_name, content_dct in section.items():
+            span = key_span(section, param_name)
+            add_parameter = (
+                span is not None
+                and isinstance(content_dct, dict)
+                and "Type" in content_dct
+            )
+            if span is not None and add_parameter:
+                type_ = content_dct["Type"]
+                param = AWSParameter(
+                    logical_name=param_name,
+                    type_=type_,
+                    description=content_dct.get("Description", None),
+                    default=content_dct.get("Default", None),
+                )
+                yield Spanning(
+                    value=param,
+                    line=span.line,
+                    char=span.char,
+                    span=len(param_name),
                 )
-                if add_parameter:
-                    type_ = content_dct["Type"]
-                    line, char = node[self.SECTION][key]
-                    param = AWSParameter(
-                        logical_name=param_name,
-                        type_=type_,
-                        description=content_dct.get("Description", None),
-                        default=content_dct.get("Default", None),
-                    )
-                    params.append(
-                        Spanning[AWSParameter](
-                            value=param,
-                            line=line,
-                            char=char,
-                            span=len(param_name),
-                        )
-                    )
-        return PositionLookup.from_iterable(params)
 
 
 K = TypeVar("K", covariant=True)
@@ -400,25 +400,18 @@ class KeySetExtractor(RecursiveExtractor[K]):
         self.key_names = key_names
         self.name_fn = name_fn
 
-    def extract_node(self, node: Tree) -> List[Spanning[K]]:
-        found = []
+    def extract_node(self, node: Tree) -> Iterator[Spanning[K]]:
         for key, value in node.items():
-            if key in self.key_names and VALUES_POSITION_PREFIX in node:
+            span = value_span(node, key) if key in self.key_names else None
+            if span is not None:
                 if key == "Fn::GetAtt" and isinstance(value, list):
                     value = ".".join(map(str, value))
-                for val_pos_dct in node[VALUES_POSITION_PREFIX]:
-                    p_key = POSITION_PREFIX + str(value)
-                    if p_key in val_pos_dct:
-                        line, char = val_pos_dct[p_key]
-                        found.append(
-                            Spanning[K](
-                                value=self.name_fn(value),
-                                line=line,
-                                char=char,
-                                span=len(value),
-                            )
-                        )
-        return found
+                yield Spanning(
+                    value=self.name_fn(value),
+                    line=span.line,
+                    char=span.char,
+                    span=len(value),
+                )
 
 
 class KeyExtractor(KeySetExtractor[K]):
@@ -443,27 +436,20 @@ class GetAttExtractor(RecursiveExtractor[str]):
 
     KEY = "Fn::GetAtt"
 
-    def extract_node(self, node: Tree) -> List[Spanning[str]]:
-        found = []
-        for key, value in node.items():
-            if key == self.KEY and VALUES_POSITION_PREFIX in node:
-                expr = ".".join(value)
-                for val_pos_dct in node[VALUES_POSITION_PREFIX]:
-                    p_key = POSITION_PREFIX + expr
-                    if p_key in val_pos_dct:
-                        line, char = val_pos_dct[p_key]
-                        found.append(
-                            Spanning[str](
-                                value=expr,
-                                line=line,
-                                char=char,
-                                span=len(expr),
-                            )
-                        )
-        return found
+    def extract_node(self, node: Tree) -> Iterator[Spanning[str]]:
+        span = value_span(node, self.KEY)
+        if span is not None:
+            value = node[self.KEY]
+            expr = ".".join(value) if isinstance(value, list) else value
+            yield Spanning(
+                value=expr,
+                line=span.line,
+                char=span.char,
+                span=len(expr),
+            )
 
 
-class LogicalIdExtractor(Extractor[AWSLogicalId]):
+class LogicalIdExtractor(NodeExtractor[AWSLogicalId]):
     """Extractor for the logical ids of a template.
 
     Methods
@@ -472,28 +458,188 @@ class LogicalIdExtractor(Extractor[AWSLogicalId]):
         Extract logical ids from node."""
 
     SECTION = "Resources"
+    node_paths = frozenset({(SECTION,)})
+
+    def visit(
+        self,
+        section: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[AWSLogicalId]]:
+        for logical_id, content_dct in section.items():
+            span = key_span(section, logical_id)
+            if span is not None:
+                if isinstance(content_dct, dict) and "Type" in content_dct:
+                    type_ = content_dct.get("Type", None)
+                else:
+                    type_ = None
+                yield Spanning(
+                    value=AWSLogicalId(logical_name=logical_id, type_=type_),
+                    line=span.line,
+                    char=span.char,
+                    span=len(logical_id),
+                )
+
+
+class SymbolExtractor(NodeExtractor[AWSSymbol]):
+    """Extractor for the names defined by the sections of a template.
+
+    Methods
+    -------
+    extract(node)
+        Extract the resources, parameters, conditions, mappings and outputs
+        of node."""
 
-    def extract(self, node: Tree) -> PositionLookup[AWSLogicalId]:
-        params = []
-        if self.SECTION in node and isinstance(node[self.SECTION], dict):
-            for logical_id, content_dct in node[self.SECTION].items():
-                key = POSITION_PREFIX + logical_id
-                if key in node[self.SECTION]:
-                    if isinstance(content_dct, dict) and "Type" in content_dct:
-                        type_ = content_dct.get("Type", None)
-                    else:
-                        type_ = None
-                    line, char = node[self.SECTION][key]
-                    params.append(
-                        Spanning[AWSLogicalId](
-                            value=AWSLogicalId(logical_name=logical_id, type_=type_),
-                            line=line,
-                            char=char,
-                            span=len(logical_id),
+    SECTIONS = ("Resources", "Parameters", "Conditions", "Mappings", "Outputs")
+    node_paths = frozenset((section,) for section in SECTIONS)
+
+    def visit(
+        self,
+        section: PositionedDict,
+        path: Tuple[str, ...],
+        parent: Optional[Union[AWSPropertyName, AWSResourceName]],
+    ) -> Iterator[Spanning[AWSSymbol]]:
+        section_name = path[0]
+        for name, content in section.items():
+            span = key_span(section, name)
+            if span is None or not isinstance(name, str):
+                continue
+            yield Spanning(
+                value=AWSSymbol(
+                    section=section_name,
+                    logical_name=name,
+                    source=self._ref_source(section_name, name, content),
+                ),
+                line=span.line,
+                char=span.char,
+                span=len(name),
+            )
+
+    @staticmethod
+    def _ref_source(section: str, name: str, content: Any) -> Optional[AWSRefSource]:
+        has_type = isinstance(content, dict) and "Type" in content
+        if section == "Resources":
+            return AWSLogicalId(
+                logical_name=name, type_=content["Type"] if has_type else None
+            )
+        if section == "Parameters" and has_type:
+            return AWSParameter(
+                logical_name=name,
+                type_=content["Type"],
+                description=content.get("Description", None),
+                default=content.get("Default", None),
+            )
+        return None
+
+
+class ReferenceExtractor(RecursiveExtractor[AWSReference]):
+    """Extractor for the uses of the names a template defines.
+
+    The uses are Refs, Fn::GetAtts, DependsOns, Conditions, the conditions
+    of Fn::Ifs, the maps of Fn::FindInMaps and the variables of Fn::Subs,
+    whether given as scalars or in lists.  Positions are where the name is
+    expected to be, names in scalars quoted in the source start a character
+    or two away from it.  Uses whose scalar has no position on a single
+    line, e.g. the variables of a Fn::Sub over several lines, are extracted
+    at UNKNOWN_LINE, so that every use is known of even if it can't be
+    located.
+
+    Methods
+    -------
+    extract(node)
+        Extract the uses of names from node."""
+
+    REF_SECTIONS = ("Resources", "Parameters")
+    RESOURCES = ("Resources",)
+    CONDITIONS = ("Conditions",)
+    MAPPINGS = ("Mappings",)
+    SUB_VARIABLE = re.compile(r"\$\{([^!}][^}]*)\}")
+    UNKNOWN_LINE = -1
+
+    def extract_node(self, node: Tree) -> Iterator[Spanning[AWSReference]]:
+        for key, value in node.items():
+            if key == "Ref":
+                yield from self._name(
+                    key, value, value_span(node, key), self.REF_SECTIONS
+                )
+            elif key == "Fn::GetAtt":
+                if isinstance(value, list) and value:
+                    # The list of !GetAtt Foo.Arn has the span of its scalar
+                    span = element_span(value, 0) or value_span(node, key)
+                    yield from self._name(key, value[0], span, self.RESOURCES)
+                elif isinstance(value, str):
+                    yield from self._name(
+                        key, value.split(".")[0], value_span(node, key), self.RESOURCES
+                    )
+            elif key == "DependsOn":
+                if isinstance(value, list):
+                    for idx, name in enumerate(value):
+                        yield from self._name(
+                            key, name, element_span(value, idx), self.RESOURCES
                         )
+                else:
+                    yield from self._name(
+                        key, value, value_span(node, key), self.RESOURCES
                     )
-
-        return PositionLookup.from_iterable(params)
+            elif key == "Condition":
+                yield from self._name(
+                    key, value, value_span(node, key), self.CONDITIONS
+                )
+            elif key == "Fn::If" and isinstance(value, list) and value:
+                yield from self._name(
+                    key, value[0], element_span(value, 0), self.CONDITIONS
+                )
+            elif key == "Fn::FindInMap" and isinstance(value, list) and value:
+                yield from self._name(
+                    key, value[0], element_span(value, 0), self.MAPPINGS
+                )
+            elif key == "Fn::Sub":
+                if isinstance(value, list) and value:
+                    # Variables given by the mapping are not uses
+                    variables = value[1] if len(value) > 1 else {}
+                    yield from self._sub(
+                        key, value[0], element_span(value, 0), variables
+                    )
+                else:
+                    yield from self._sub(key, value, value_span(node, key), {})
+
+    def _name(
+        self, kind: str, name: Any, span: Optional[Span], sections: Tuple[str, ...]
+    ) -> Iterator[Spanning[AWSReference]]:
+        if isinstance(name, str):
+            reference = AWSReference(kind=kind, logical_name=name, sections=sections)
+            yield self._use(reference, span)
+
+    def _sub(
+        self, kind: str, value: Any, span: Optional[Span], variables: Any
+    ) -> Iterator[Spanning[AWSReference]]:
+        if not isinstance(value, str):
+            return
+        if "\n" in value:  # Offsets in value aren't those in the source
+            span = None
+        for match in self.SUB_VARIABLE.finditer(value):
+            name, dot, _ = match.group(1).partition(".")
+            if "::" in name or (isinstance(variables, dict) and name in variables):
+                continue
+            reference = AWSReference(
+                kind=kind,
+                logical_name=name,
+                sections=self.RESOURCES if dot else self.REF_SECTIONS,
+            )
+            yield self._use(reference, span, match.start(1))
+
+    def _use(
+        self, reference: AWSReference, span: Optional[Span], offset: int = 0
+    ) -> Spanning[AWSReference]:
+        """Return reference at offset in the scalar at span."""
+        length = len(reference.logical_name)
+        if span is None or span.line != span.end_line:
+            return Spanning(
+                value=reference, line=self.UNKNOWN_LINE, char=0, span=length
+            )
+        return Spanning(
+            value=reference, line=span.line, char=span.char + offset, span=length
+        )
 
 
 T = TypeVar("T", covariant=True)
@@ -505,8 +651,18 @@ class CompositeExtractor(Extractor[T]):
     def __init__(self, *extractors: Extractor[T]):
         self._extractors = extractors
 
-    def extract(self, node: Tree) -> PositionLookup[T]:
-        lookup = PositionLookup[T]()
+    def extract(
+        self, node: Tree, target: Optional[Tuple[int, int]] = None
+    ) -> SpanTable[T]:
+        if target is None:
+            return super().extract(node)
+        lookup: SpanTable[T] = SpanTable()
+        for extractor in self._extractors:
+            lookup.extend_with_appends(extractor.extract(node, target))
+        return lookup
+
+    def _extract(self, node: Tree) -> SpanTable[T]:
+        lookup: SpanTable[T] = SpanTable()
         for extractor in self._extractors:
             lookup.extend_with_appends(extractor.extract(node))
         return lookup
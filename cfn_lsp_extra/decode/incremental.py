@@ -0,0 +1,240 @@
+"""
+Incremental decoding of yaml templates.
+
+Most edits to a template are confined to a single entry of one of its large
+top level sections (e.g. a single resource), so rather than decoding the
+whole template again we decode just that entry and reuse the rest of the
+previously decoded template, shifting positions after the edit as necessary.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Optional, Union
+
+import yaml
+from attrs import frozen
+
+from ..aws_data import Tree
+from ..source_text import SourceText, as_source_text
+from . import Template
+from .nodes import LazyPositionedDict, PositionedDict, PositionedList, Span
+from .yaml_decoding import SafePositionLoader
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("Resources", "Outputs", "Parameters")
+
+
+@frozen
+class LineChange:
+    """Lines [start, end) of an old source replaced by [start, end + delta) of a new one.
+
+    Attributes
+    ----------
+    start : int
+        The first line affected by the change.
+    end : int
+        The (exclusive) last line affected by the change in the old source.
+    delta : int
+        The number of lines added by the change (negative if lines were removed)."""
+
+    start: int
+    end: int
+    delta: int
+
+    @classmethod
+    def from_range(cls, start_line: int, end_line: int, text: str) -> LineChange:
+        """Create a LineChange from an edit replacing start_line..end_line with text."""
+        return cls(
+            start=start_line,
+            end=end_line + 1,
+            delta=text.count("\n") - (end_line - start_line),
+        )
+
+    def then(self, change: LineChange) -> LineChange:
+        """Compose this change with change, which applies to the resulting source."""
+
+        def to_old(line: int, is_end: bool) -> int:
+            if line < self.start:
+                return line
+            if line <= self.end + self.delta:  # Within this change
+                return self.end if is_end else self.start
+            return line - self.delta
+
+        return LineChange(
+            start=min(self.start, to_old(change.start, False)),
+            end=max(self.end, to_old(change.end, True)),
+            delta=self.delta + change.delta,
+        )
+
+
+def decode_incremental(
+    tree: Tree, source: Union[str, SourceText], change: LineChange
+) -> Optional[Tree]:
+    """Decode source by re-using the template tree was decoded from.
+
+    Parameters
+    ----------
+    tree : Tree
+        The decoded template before change was applied.
+    source : Union[str, SourceText]
+        The yaml template content after change was applied.
+    change : LineChange
+        The change made to the source tree was decoded from.
+
+    Returns
+    -------
+    Optional[Tree]
+        The decoded template, or None if change is not confined to a single
+        section entry, in which case source should be decoded in full."""
+    if not isinstance(tree, PositionedDict):
+        return None
+    text = as_source_text(source)
+    old_line_count = text.line_count - change.delta
+    top_level_lines = sorted(span.line for span in tree.key_spans.values())
+    for section in SECTIONS:
+        entries = tree.get(section)
+        section_span = tree.key_spans.get(section)
+        if (
+            not isinstance(entries, PositionedDict)
+            or entries.value_spans
+            or section_span is None
+        ):
+            continue
+        if not _has_string_keys(entries):
+            return None  # Non-string or duplicate keys
+        section_end = next(
+            (line for line in top_level_lines if line > section_span.line),
+            old_line_count,
+        )
+        bounds = sorted(
+            (span.line, span.char, name) for name, span in entries.key_spans.items()
+        )
+        # Flow style mappings can't be split by line
+        if not bounds or bounds[0][0] <= section_span.line:
+            continue
+        for idx, (line, _, name) in enumerate(bounds):
+            end = bounds[idx + 1][0] if idx + 1 < len(bounds) else section_end
+            if line <= change.start and change.end <= end:
+                column = bounds[0][1]
+                if any(char != column for _, char, _ in bounds):
+                    return None
+                new_entries = _decode_entry(text, line, end + change.delta, column)
+                if new_entries is None or any(
+                    n in entries and n != name for n in new_entries
+                ):
+                    return None
+                logger.debug("Re-decoding %s/%s only", section, name)
+                return _splice(tree, section, name, new_entries, end, change.delta)
+    return None
+
+
+def _decode_entry(
+    text: SourceText, start: int, end: int, column: int
+) -> Optional[PositionedDict]:
+    entry_lines = [text.line(idx) for idx in range(start, min(end, text.line_count))]
+    for line in entry_lines:
+        stripped = line.lstrip()
+        if (
+            stripped
+            and not stripped.startswith("#")
+            and len(line) - len(stripped) < column
+        ):
+            return None  # The edit has moved content outside of the section
+    # Leading newlines ensure the positions in the entry are correct
+    entry = "\n" * start + "\n".join(entry_lines)
+    try:
+        data = yaml.load(entry, Loader=SafePositionLoader)  # noqa
+    except yaml.YAMLError:
+        return None
+    if data is None:
+        return PositionedDict()
+    if (
+        not isinstance(data, PositionedDict)
+        or data.value_spans
+        or not _has_string_keys(data)
+    ):
+        return None
+    return data
+
+
+def _splice(
+    tree: PositionedDict,
+    section: str,
+    name: str,
+    new_entries: PositionedDict,
+    end: int,
+    delta: int,
+) -> Template:
+    entries = tree[section]
+    section_dct = PositionedDict()
+    for key, value in entries.items():
+        if key == name:
+            section_dct.update(new_entries)
+            section_dct.key_spans.update(new_entries.key_spans)
+        else:
+            span = entries.key_spans[key]
+            after = span.line >= end
+            section_dct[key] = shift_positions(value, delta) if after else value
+            section_dct.key_spans[key] = _shift_span(span, end, delta)
+
+    template = Template()
+    for key, value in tree.items():
+        span = tree.key_spans.get(key)
+        if key == section:
+            template[key] = section_dct
+        elif span is not None and span.line >= end:
+            template[key] = shift_positions(value, delta)
+        else:
+            template[key] = value
+    template.key_spans = {
+        k: _shift_span(s, end, delta) for k, s in tree.key_spans.items()
+    }
+    template.value_spans = {
+        k: _shift_span(s, end, delta) for k, s in tree.value_spans.items()
+    }
+    return template
+
+
+def shift_positions(node: Tree, delta: int) -> Tree:
+    """Return a copy of node with all line positions shifted by delta."""
+    if not delta:
+        return node
+    if isinstance(node, LazyPositionedDict):
+        lazy = node.shifted(delta)
+        if lazy is not None:  # Otherwise it has been decoded since
+            return lazy
+    if isinstance(node, PositionedDict):
+        shifted = PositionedDict(
+            (k, shift_positions(v, delta) if isinstance(v, (dict, list)) else v)
+            for k, v in node.items()
+        )
+        shifted.key_spans = {k: _shift(s, delta) for k, s in node.key_spans.items()}
+        shifted.value_spans = {
+            k: _shift(s, delta) for k, s in node.value_spans.items()
+        }
+        return shifted
+    if isinstance(node, list):
+        shifted_list = PositionedList(
+            shift_positions(v, delta) if isinstance(v, (dict, list)) else v
+            for v in node
+        )
+        if isinstance(node, PositionedList):
+            shifted_list.spans = {i: _shift(s, delta) for i, s in node.spans.items()}
+        return shifted_list
+    return node
+
+
+def _shift(span: Span, delta: int) -> Span:
+    return Span(span.line + delta, span.char, span.end_line + delta, span.end_char)
+
+
+def _shift_span(span: Span, end: int, delta: int) -> Span:
+    return _shift(span, delta) if span.line >= end else span
+
+
+def _has_string_keys(node: PositionedDict) -> bool:
+    """Whether every key of node is a string with a known position."""
+    return all(isinstance(key, str) for key in node) and len(node.key_spans) == len(
+        node
+    )
@@ -0,0 +1,27 @@
+"""
+Sharing of repeated values within and between decoded templates.
+
+Templates repeat the same keys (e.g. Type, Properties, Ref) and many of the
+same values (e.g. resource types, Allow), and each decoder would otherwise
+allocate a fresh copy of each of these for every occurrence in every open
+document.  Strings are shared through the interpreter's intern table, which
+drops strings no longer used by any document, so closing or editing
+documents doesn't leave stale entries behind.
+
+Line numbers are similar: each int above 256 is a separate object, so
+decoders share one int between all the positions on a line of a document.
+"""
+import sys
+
+# Longer strings (e.g. descriptions, inline code) are rarely repeated
+MAX_INTERNED_LENGTH = 64
+
+_intern = sys.intern
+
+
+def intern_string(value: str) -> str:
+    """Return the shared copy of value, or value itself if it is too long."""
+    if len(value) <= MAX_INTERNED_LENGTH:
+        return _intern(value)
+    return value
+
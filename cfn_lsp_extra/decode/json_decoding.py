@@ -4,19 +4,36 @@
 Utilities for parsing json document strings.
 """
 import bisect
+import functools
 import json
+import re
 from json import JSONDecodeError
-from json import scanner
 from json.decoder import WHITESPACE
 from json.decoder import WHITESPACE_STR
 from json.decoder import JSONDecoder
 from json.decoder import scanstring
 from json.scanner import py_make_scanner
 from typing import Any
+from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Tuple
 
-from .yaml_decoding import POSITION_PREFIX
-from .yaml_decoding import VALUES_POSITION_PREFIX
+from ..source_text import SourceText
+from .interning import intern_string
+from .nodes import PositionedDict
+from .nodes import PositionedList
+from .nodes import Span
+
+
+def to_span(line_starts: List[int], start: int, end: int) -> Span:
+    """Convert the offsets start and end to a Span, given SourceText line starts."""
+    line = bisect.bisect_right(line_starts, start) - 1
+    if end < line_starts[line + 1]:
+        end_line = line  # The common case, share the int
+    else:
+        end_line = bisect.bisect_right(line_starts, end, lo=line) - 1
+    return Span(line, start - line_starts[line], end_line, end - line_starts[end_line])
 
 
 # This is a slightly modified version of json.decoder.JSONObject
@@ -30,11 +47,11 @@ def cfn_json_object(
     memo=None,
     _w=WHITESPACE.match,
     _ws=WHITESPACE_STR,
+    line_starts=None,  # EDIT: offsets of line starts in s
 ):  # pragma: no cover
     s, end = s_and_end
-    init = end
-    pairs = []
-    pairs_append = pairs.append
+    pairs = PositionedDict()  # EDIT: build the result directly
+    key_spans, value_spans = pairs.key_spans, pairs.value_spans
     # Backwards compatibility
     if memo is None:
         memo = {}
@@ -49,12 +66,6 @@ def cfn_json_object(
             nextchar = s[end : end + 1]
         # Trivial empty object
         if nextchar == "}":
-            if object_pairs_hook is not None:
-                result = object_pairs_hook(pairs)
-                return result, end + 1
-            pairs = {}
-            if object_hook is not None:
-                pairs = object_hook(pairs)
             return pairs, end + 1
         elif nextchar != '"':
             raise JSONDecodeError(
@@ -64,7 +75,7 @@ def cfn_json_object(
     while True:
         key_start = end  # EDIT: gets start position of key
         key, end = scanstring(s, end, strict)
-        key_end = end  # EDIT: gets end position of key
+        key_end = end - 1  # EDIT: gets end position of key
         key = memo_get(key, key)
         # To skip some function call overhead we optimize the fast paths where
         # the JSON key separator is ": " or just ":".
@@ -87,17 +98,16 @@ def cfn_json_object(
             value, end = scan_once(s, end)
         except StopIteration as err:
             raise JSONDecodeError("Expecting value", s, err.value) from None
-        pairs_append((key, value))
+        pairs[key] = value
         # EDIT: adds positional data to result
-        if isinstance(value, str):
-            if VALUES_POSITION_PREFIX not in {k for k, _ in pairs}:
-                values_lst = []
-                pairs_append((VALUES_POSITION_PREFIX, values_lst))
-            else:
-                values_lst = next(v for k, v in pairs if k == VALUES_POSITION_PREFIX)
-            values_lst.append({POSITION_PREFIX + value: [value_start + 1, end + 1]})
+        key_spans[key] = to_span(line_starts, key_start, key_end)
+        if isinstance(value, str):  # Exclude the quotes
+            value_spans[key] = to_span(line_starts, value_start + 1, end - 1)
+        elif not isinstance(value, (dict, list)):
+            value_spans[key] = to_span(line_starts, value_start, end)
+        else:
+            value_spans.pop(key, None)  # A duplicate key
         # END EDIT
-        pairs_append((POSITION_PREFIX + key, [key_start, key_end]))
         try:
             nextchar = s[end]
             if nextchar in _ws:
@@ -118,47 +128,194 @@ def cfn_json_object(
             raise JSONDecodeError(
                 "Expecting property name enclosed in double quotes", s, end - 1
             )
-    if object_pairs_hook is not None:
-        result = object_pairs_hook(pairs)
-        return result, end
-    pairs = dict(pairs)
-    if object_hook is not None:
-        pairs = object_hook(pairs)
     return pairs, end
 
 
+# This is a slightly modified version of json.decoder.JSONArray
+# added lines have comments starting with 'EDIT:'
+def cfn_json_array(
+    s_and_end,
+    scan_once,
+    _w=WHITESPACE.match,
+    _ws=WHITESPACE_STR,
+    line_starts=None,  # EDIT: offsets of line starts in s
+):  # pragma: no cover
+    s, end = s_and_end
+    values = PositionedList()  # EDIT: build the result directly
+    nextchar = s[end : end + 1]
+    if nextchar in _ws:
+        end = _w(s, end + 1).end()
+        nextchar = s[end : end + 1]
+    # Look-ahead for trivial empty array
+    if nextchar == "]":
+        return values, end + 1
+    _append = values.append
+    while True:
+        try:
+            value_start = end  # EDIT: gets start position of value
+            value, end = scan_once(s, end)
+        except StopIteration as err:
+            raise JSONDecodeError("Expecting value", s, err.value) from None
+        # EDIT: adds positional data to result
+        if isinstance(value, str):  # Exclude the quotes
+            values.spans[len(values)] = to_span(line_starts, value_start + 1, end - 1)
+        elif not isinstance(value, (dict, list)):
+            values.spans[len(values)] = to_span(line_starts, value_start, end)
+        # END EDIT
+        _append(value)
+        nextchar = s[end : end + 1]
+        if nextchar in _ws:
+            end = _w(s, end + 1).end()
+            nextchar = s[end : end + 1]
+        end += 1
+        if nextchar == "]":
+            break
+        elif nextchar != ",":
+            raise JSONDecodeError("Expecting ',' delimiter", s, end - 1)
+        try:
+            if s[end] in _ws:
+                end += 1
+                if s[end] in _ws:
+                    end = _w(s, end + 1).end()
+        except IndexError:
+            pass
+
+    return values, end
+
+
 class CfnJSONDecoder(JSONDecoder):
     """A json decoder which saves positional information of elements."""
 
     def __init__(self):
         super().__init__()
-        self.parse_object = cfn_json_object
-        self.scan_once = py_make_scanner(self)
 
     def raw_decode(self, s: str, idx: int = 0):
-        dct, end = super().raw_decode(s, idx)
-        line_starts = [0]
-        cnt = 0
-        for line in s.splitlines():
-            cnt += len(line) + 1  # + 1 for the newline character
-            line_starts.append(cnt)
-        self._convert_abs_char_to_line_char(dct, line_starts)
-        return dct, end
-
-    def _convert_abs_char_to_line_char(self, d: Any, line_starts: List[int]):
-        for key, value in d.items():
-            if key.startswith(POSITION_PREFIX):
-                c_start, _ = value
-                line = bisect.bisect_left(line_starts, c_start)
-                char = (
-                    0
-                    if c_start == line_starts[line]
-                    else c_start - line_starts[line - 1]
-                )
-                d[key] = [line - 1, char]
-            elif isinstance(value, dict):
-                self._convert_abs_char_to_line_char(value, line_starts)
-            elif isinstance(value, list):
-                for e in value:
-                    if isinstance(e, dict):
-                        self._convert_abs_char_to_line_char(e, line_starts)
+        line_starts = SourceText(s).line_starts
+        self.parse_object = functools.partial(cfn_json_object, line_starts=line_starts)
+        self.parse_array = functools.partial(cfn_json_array, line_starts=line_starts)
+        self.scan_once = py_make_scanner(self)
+        try:
+            return super().raw_decode(s, idx)
+        finally:
+            # The scanner refers back to this decoder, break the cycle so the
+            # line starts are freed as soon as decoding finishes
+            del self.scan_once, self.parse_object, self.parse_array
+
+
+# The next string or scalar of a valid json document, skipping brackets,
+# whitespace and separators.  Strings can't contain raw newlines
+ATOM = re.compile(
+    r'[\s{}\[\],:]*("[^"\\\n]*(?:\\.[^"\\\n]*)*"|[^\s{}\[\],:"]+)'
+)
+
+
+def decode_json(s: str, line_starts: Optional[List[int]] = None) -> Any:
+    """Decode the json document s, saving positional information of elements.
+
+    Values are parsed by the C accelerated json scanner, and the positions
+    of keys and scalar values are then recovered by a single pass over the
+    document.  The result is the same as decoding with CfnJSONDecoder.
+
+    Parameters
+    ----------
+    s : str
+        The json document.
+    line_starts : Optional[List[int]]
+        The line starts of s as given by SourceText, computed if not given.
+
+    Raises
+    ------
+    JSONDecodeError
+        If s is not a valid json document."""
+    duplicates = {}
+
+    def make_node(pairs):
+        # Share keys and string values with other documents
+        node = PositionedDict(
+            [
+                (intern_string(k), intern_string(v) if v.__class__ is str else v)
+                for k, v in pairs
+            ]
+        )
+        if len(node) != len(pairs):
+            # Keep all the values so positions can be attached in order
+            duplicates[id(node)] = pairs
+        return node
+
+    tree = json.loads(s, object_pairs_hook=make_node)
+    if isinstance(tree, (dict, list)):
+        if line_starts is None:
+            line_starts = SourceText(s).line_starts
+        tree = attach_spans(s, tree, duplicates, line_starts)
+    return tree
+
+
+def attach_spans(
+    s: str,
+    tree: Any,
+    duplicates: Dict[int, List[Tuple[str, Any]]],
+    line_starts: List[int],
+):
+    """Set the key and value spans of the PositionedDicts in tree decoded from s.
+
+    The strings and scalars of s appear in the same order as the keys and
+    scalar values of a pre-order walk of tree, so they are paired up as tree
+    is walked.  duplicates maps ids of objects with duplicate keys to all of
+    their pairs.  Lists are replaced by PositionedLists holding the spans of
+    their scalar elements, so tree, with its lists replaced, is returned."""
+    atoms = ATOM.finditer(s)
+    new_span = tuple.__new__  # Skips the python level Span.__new__
+    bisect_right = bisect.bisect_right
+    containers = (dict, list)
+
+    def element_span(line):
+        # The span of the next scalar, an element of a list on line or after it
+        start, end = next(atoms).span(1)
+        if line_starts[line + 1] <= start:
+            line = bisect_right(line_starts, start, lo=line) - 1
+        offset = line_starts[line]
+        if s[start] == '"':  # Exclude the quotes
+            start, end = start + 1, end - 1
+        return new_span(Span, (line, start - offset, line, end - offset))
+
+    def walk(node, line):
+        if isinstance(node, list):
+            node = PositionedList(node)
+            spans = node.spans
+            for idx, value in enumerate(node):
+                if isinstance(value, containers):
+                    node[idx] = walk(value, line)
+                else:
+                    if value.__class__ is str:
+                        node[idx] = intern_string(value)
+                    spans[idx] = span = element_span(line)
+                    line = span.line
+            return node
+        key_spans = node.key_spans = {}
+        value_spans = node.value_spans = {}
+        pairs = duplicates.get(id(node))
+        for key, value in pairs if pairs is not None else node.items():
+            start, end = next(atoms).span(1)
+            line = bisect_right(line_starts, start) - 1
+            offset = line_starts[line]
+            key_spans[key] = new_span(
+                Span, (line, start - offset + 1, line, end - offset - 1)
+            )
+            if isinstance(value, containers):
+                value_spans.pop(key, None)  # A duplicate key
+                walked = walk(value, line)
+                if walked is not value and node[key] is value:
+                    node[key] = walked
+                continue
+            start, end = next(atoms).span(1)
+            if line_starts[line + 1] <= start:  # Not on the same line as the key
+                line = bisect_right(line_starts, start, lo=line) - 1
+                offset = line_starts[line]
+            if s[start] == '"':  # Exclude the quotes
+                start, end = start + 1, end - 1
+            value_spans[key] = new_span(
+                Span, (line, start - offset, line, end - offset)
+            )
+        return node
+
+    return walk(tree, 0)
@@ -0,0 +1,165 @@
+"""
+Lazy decoding of yaml templates.
+
+Large mappings nested in a template (e.g. resources or policy documents) are
+left undecoded as LazyPositionedDicts, which decode their own lines when
+first used, so the cost of decoding a template scales with how much of it is
+used rather than with its size.  The lines making up a nested block mapping
+are found from the indentation of the template's lines, rather than by
+parsing it.
+"""
+from __future__ import annotations
+
+import re
+from itertools import pairwise
+from typing import Any, Dict, Iterator, Tuple
+
+import yaml
+from attrs import evolve, field, frozen
+
+from ..source_text import SourceText
+from .nodes import LazyPositionedDict, PositionedDict
+from .yaml_decoding import SafePositionLoader
+from .yaml_outline import (
+    LONE_CR,
+    entry_lines,
+    first_content,
+    is_key,
+    opens_mapping,
+)
+
+# Mappings spanning fewer lines are decoded along with their parent
+MIN_LAZY_LINES = 32
+# Entries of the top level sections (e.g. resources) are decoded along with
+# their section, as most features use their headers (e.g. Type)
+_EAGER_DEPTHS = (1,)
+
+_ANCHOR = re.compile(r"(?<![^\s\[{,])&\S")
+
+
+def decode_lazy_yaml(text: SourceText) -> Any:
+    """Decode the yaml document text, leaving large nested mappings undecoded.
+
+    The result is equal to decoding text with SafePositionLoader, except
+    that block mappings spanning at least MIN_LAZY_LINES lines are
+    LazyPositionedDicts.  Errors within these are only raised when they
+    are used, as CfnDecodingErrors.
+
+    Raises
+    ------
+    yaml.YAMLError
+        If the document outside of its undecoded mappings can't be decoded."""
+    source = text.text
+    first = first_content(text, 0, text.line_count)
+    if (
+        first is None
+        # Anchors may be referred to from outside of the mapping they are
+        # in, and directives apply to the whole document
+        or ("&" in source and _ANCHOR.search(source))
+        or source.startswith("%")
+        or "\n%" in source
+        # Lines are found by matching line starts, which a lone \r isn't
+        or ("\r" in source and LONE_CR.search(source))
+    ):
+        return yaml.load(source, Loader=SafePositionLoader)  # noqa
+    return _load(text, 0, text.line_count, first[1], 0, 0)
+
+
+def _load(
+    text: SourceText, start: int, stop: int, indent: int, shift: int, depth: int
+) -> Any:
+    """Decode the lines [start, stop) of text, shifting their positions by shift.
+
+    The lines are a block indented by indent, depth mappings deep in the
+    document.  Mappings nested in the block spanning enough lines are cut
+    out of the decoded lines, becoming LazyPositionedDicts of the result
+    instead."""
+    source, line_starts = text.text, text.line_starts
+    end = min(line_starts[stop], len(source))
+    pieces = []
+    offset = line_starts[start]
+    cuts = []
+    for path, child_line, next_line, child_indent in _cuts(
+        text, start, stop, indent, depth
+    ):
+        pieces.append(source[offset : line_starts[path[-1] + 1]])
+        # Blank lines keep the positions of the remaining lines
+        pieces.append("\n" * (next_line - path[-1] - 1))
+        offset = line_starts[next_line]
+        block = _Block(text, child_line, next_line, child_indent, shift, depth + len(path))
+        cuts.append((path, LazyPositionedDict(block)))
+    pieces.append(source[offset:end])
+    loader = SafePositionLoader("".join(pieces))
+    loader.line_offset = start + shift
+    try:
+        data = loader.get_single_data()
+    finally:
+        loader.dispose()
+    keys_by_line: Dict[int, Dict[int, Any]] = {}
+    for path, lazy in cuts:
+        node = data
+        for idx, line in enumerate(path):
+            if not isinstance(node, PositionedDict):
+                break
+            if id(node) not in keys_by_line:
+                keys_by_line[id(node)] = {s.line: k for k, s in node.key_spans.items()}
+            key = keys_by_line[id(node)].get(line + shift)
+            if key is None:
+                break  # The key is duplicated later on
+            if idx < len(path) - 1:
+                node = node[key]
+            else:
+                node[key] = lazy
+                node.value_spans.pop(key, None)
+    return data
+
+
+def _cuts(
+    text: SourceText, start: int, stop: int, indent: int, depth: int
+) -> Iterator[Tuple[Tuple[int, ...], int, int, int]]:
+    """Yield the mappings to cut out of the block [start, stop) of text.
+
+    Mappings are given by the lines of the keys leading to them, followed by
+    the line of their first key, the line after them and their indentation."""
+    entries = entry_lines(text, start, stop, indent)
+    for line, next_line in pairwise([*entries, stop]):
+        if next_line - line <= MIN_LAZY_LINES or not opens_mapping(text.line(line)):
+            continue
+        child = first_content(text, line + 1, next_line)
+        if child is None or child[1] <= indent or not is_key(text.line(child[0])):
+            continue
+        child_line, child_indent = child
+        if depth in _EAGER_DEPTHS:
+            for path, *cut in _cuts(text, child_line, next_line, child_indent, depth + 1):
+                yield ((line, *path), *cut)  # type: ignore[misc]
+        else:
+            yield (line,), child_line, next_line, child_indent
+
+
+@frozen
+class _Block:
+    """The lines [start, stop) of a document, making up a mapping."""
+
+    text: SourceText = field(repr=False)
+    start: int
+    stop: int
+    indent: int
+    shift: int
+    depth: int
+
+    def __call__(self) -> PositionedDict:
+        from . import CfnDecodingError  # This module is imported by decode
+
+        line = self.start + self.shift
+        try:
+            data = _load(
+                self.text, self.start, self.stop, self.indent, self.shift, self.depth
+            )
+        except yaml.YAMLError as e:
+            raise CfnDecodingError(f"Error decoding mapping at line {line}") from e
+        if not isinstance(data, PositionedDict):
+            raise CfnDecodingError(f"Expected a mapping at line {line}")
+        return data
+
+    def shifted(self, delta: int) -> _Block:
+        return evolve(self, shift=self.shift + delta)
@@ -0,0 +1,312 @@
+"""
+The positioned node model decoded templates are made up of.
+
+Mappings in a decoded template are PositionedDicts, which keep the positions
+of their keys and scalar values in tables separate from their content, and
+sequences are PositionedLists, which likewise keep the positions of their
+scalar elements.
+Mappings of a lazily decoded template may also be LazyPositionedDicts, which
+are only decoded when their content is first used.
+"""
+from __future__ import annotations
+
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Protocol,
+    TypeVar,
+)
+
+POSITION_PREFIX = "__position__"
+VALUES_POSITION_PREFIX = "__value_positions__"
+
+
+class Span(NamedTuple):
+    """The start and end position of a key or value in a document.
+
+    Attributes
+    ----------
+    line : int
+        Line of the first character.
+    char : int
+        Column of the first character.
+    end_line : int
+        Line of the end of the node.
+    end_char : int
+        Column just after the last character of the node."""
+
+    line: int
+    char: int
+    end_line: int
+    end_char: int
+
+
+P = TypeVar("P", bound="PositionedDict")
+
+
+class PositionedDict(Dict[Any, Any]):
+    """A dict which also holds the positions of its keys and scalar values.
+
+    For compatibility, the in-band position keys of older versions can still
+    be read, by `[]`, `get` and `in`, i.e. `node[POSITION_PREFIX + key]`
+    gives the position of key as a [line, char] list and
+    `node[VALUES_POSITION_PREFIX]` gives a list of
+    `{POSITION_PREFIX + value: [line, char]}` dicts.  These are computed on
+    demand and are not included when iterating over the dict.
+
+    Attributes
+    ----------
+    key_spans : Dict[Any, Span]
+        Mapping of keys to their position.
+    value_spans : Dict[Any, Span]
+        Mapping of keys to the position of their value, for scalar values."""
+
+    __slots__ = ("key_spans", "value_spans", "_loader")
+
+    key_spans: Dict[Any, Span]
+    value_spans: Dict[Any, Span]
+
+    def __getattr__(self, name: str) -> Any:
+        # The span tables are created on first use, which keeps constructing
+        # a PositionedDict as cheap as constructing a dict
+        if name == "key_spans" or name == "value_spans":
+            spans: Dict[Any, Span] = {}
+            setattr(self, name, spans)
+            return spans
+        raise AttributeError(name)
+
+    def __missing__(self, key: Any) -> Any:
+        if key == VALUES_POSITION_PREFIX and self.value_spans:
+            return [
+                {POSITION_PREFIX + value_text(self[k]): [span.line, span.char]}
+                for k, span in self.value_spans.items()
+            ]
+        if isinstance(key, str) and key.startswith(POSITION_PREFIX):
+            span = self._key_span_of(key[len(POSITION_PREFIX) :])
+            if span:
+                return [span.line, span.char]
+        raise KeyError(key)
+
+    def __contains__(self, key: Any) -> bool:
+        if dict.__contains__(self, key):
+            return True
+        if key == VALUES_POSITION_PREFIX:
+            return bool(self.value_spans)
+        if isinstance(key, str) and key.startswith(POSITION_PREFIX):
+            return self._key_span_of(key[len(POSITION_PREFIX) :]) is not None
+        return False
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        # dict.get doesn't fall back to __missing__
+        if key in self:
+            return self[key]
+        return default
+
+    def _key_span_of(self, name: str) -> Optional[Span]:
+        if name in self.key_spans:
+            return self.key_spans[name]
+        # The key may not be a string, e.g. an int
+        return next((s for k, s in self.key_spans.items() if str(k) == name), None)
+
+    def with_spans_of(self: P, other: PositionedDict) -> P:
+        """Use the spans of other as the spans of this dict, returning self."""
+        self.key_spans = other.key_spans
+        self.value_spans = other.value_spans
+        return self
+
+
+class PositionedList(List[Any]):
+    """A list which also holds the positions of its scalar elements.
+
+    Attributes
+    ----------
+    spans : Dict[int, Span]
+        Mapping of the indices of scalar elements to their position."""
+
+    __slots__ = ("spans",)
+
+    spans: Dict[int, Span]
+
+    def __getattr__(self, name: str) -> Any:
+        # Created on first use, as for the span tables of PositionedDict
+        if name == "spans":
+            spans: Dict[int, Span] = {}
+            self.spans = spans
+            return spans
+        raise AttributeError(name)
+
+
+class SubtreeLoader(Protocol):
+    """Decodes the content of a LazyPositionedDict."""
+
+    def __call__(self) -> PositionedDict:
+        ...
+
+    def shifted(self, delta: int) -> SubtreeLoader:
+        """Return a loader of the same content, with lines shifted by delta."""
+        ...
+
+
+_MATERIALIZE_LOCK = Lock()
+
+
+class LazyPositionedDict(PositionedDict):
+    """A PositionedDict decoded on first use.
+
+    Any use of its content or spans decodes it using its loader, after which
+    it becomes a PositionedDict (i.e. its class is changed), so only subtrees
+    which are actually used are ever decoded.
+
+    Raises
+    ------
+    CfnDecodingError
+        From any use of its content, if it can't be decoded."""
+
+    __slots__ = ()
+
+    _loader: SubtreeLoader
+
+    def __init__(self, loader: SubtreeLoader):
+        super().__init__()
+        self._loader = loader
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "key_spans" or name == "value_spans":
+            self._materialize()
+            return getattr(self, name)
+        raise AttributeError(name)
+
+    def shifted(self, delta: int) -> Optional[LazyPositionedDict]:
+        """Return this dict with lines shifted by delta, if not yet decoded."""
+        with _MATERIALIZE_LOCK:
+            if type(self) is not LazyPositionedDict:
+                return None
+            return LazyPositionedDict(self._loader.shifted(delta))
+
+    def _materialize(self) -> None:
+        with _MATERIALIZE_LOCK:
+            if type(self) is not LazyPositionedDict:
+                return  # Decoded by another thread
+            node = self._loader()
+            dict.update(self, node)
+            self.key_spans = node.key_spans
+            self.value_spans = node.value_spans
+            del self._loader
+            self.__class__ = PositionedDict  # type: ignore[assignment]
+
+
+def _materializing(name: str) -> Callable[..., Any]:
+    method = getattr(PositionedDict, name)
+
+    def wrapper(self: LazyPositionedDict, *args: Any, **kwargs: Any) -> Any:
+        self._materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    "__contains__",
+    "__eq__",
+    "__getitem__",
+    "__delitem__",
+    "__ior__",
+    "__iter__",
+    "__len__",
+    "__ne__",
+    "__or__",
+    "__repr__",
+    "__reversed__",
+    "__ror__",
+    "__setitem__",
+    "clear",
+    "copy",
+    "get",
+    "items",
+    "keys",
+    "pop",
+    "popitem",
+    "setdefault",
+    "update",
+    "values",
+):
+    setattr(LazyPositionedDict, _name, _materializing(_name))
+del _name
+
+
+def value_text(value: Any) -> str:
+    """Return the text of a scalar value, or of a Fn::GetAtt list."""
+    if isinstance(value, list):
+        return ".".join(map(str, value))
+    return "" if value is None else str(value)
+
+
+def key_span(node: Any, key: Any) -> Optional[Span]:
+    """Return the position of key in node, if known."""
+    if isinstance(node, PositionedDict):
+        return node.key_spans.get(key)
+    return None
+
+
+def value_span(node: Any, key: Any) -> Optional[Span]:
+    """Return the position of the scalar value of key in node, if known."""
+    if isinstance(node, PositionedDict):
+        return node.value_spans.get(key)
+    return None
+
+
+def element_span(node: Any, idx: int) -> Optional[Span]:
+    """Return the position of the scalar element idx of node, if known."""
+    if isinstance(node, PositionedList):
+        return node.spans.get(idx)
+    return None
+
+
+def as_positioned(node: Any) -> Any:
+    """Return node made up of PositionedDicts.
+
+    Trees using the in-band position keys of older versions (e.g. those
+    constructed by hand) are converted, other trees are returned as is."""
+    if isinstance(node, PositionedDict):
+        return node
+    if isinstance(node, dict):
+        return _from_in_band(node)
+    if isinstance(node, list) and any(isinstance(e, (dict, list)) for e in node):
+        return [as_positioned(e) for e in node]
+    return node
+
+
+def _from_in_band(node: Dict[Any, Any]) -> PositionedDict:
+    value_positions: Dict[str, List[int]] = {}
+    for dct in node.get(VALUES_POSITION_PREFIX, []):
+        for position_key, position in dct.items():
+            value_positions.setdefault(position_key, position)
+    result = PositionedDict()
+    for key, value in node.items():
+        if key == VALUES_POSITION_PREFIX or (
+            isinstance(key, str) and key.startswith(POSITION_PREFIX)
+        ):
+            continue
+        result[key] = as_positioned(value)
+        position = node.get(POSITION_PREFIX + str(key))
+        if position:
+            result.key_spans[key] = _span(position, str(key))
+        is_get_att_list = key == "Fn::GetAtt" and isinstance(value, list)
+        if not isinstance(value, (dict, list)) or is_get_att_list:
+            text = value_text(value)
+            position = value_positions.get(POSITION_PREFIX + text)
+            if position:
+                result.value_spans[key] = _span(position, text)
+    return result
+
+
+def _span(position: Iterable[int], text: str) -> Span:
+    line, char = position
+    return Span(line, char, line, char + len(text))
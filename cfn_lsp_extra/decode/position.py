@@ -1,6 +1,19 @@
 from __future__ import annotations
 
-from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+import bisect
+from array import array
+from itertools import accumulate
+from typing import (
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
 from attrs import frozen
 
@@ -32,25 +45,84 @@ T = TypeVar("T")
 PositionList = List[Tuple[int, int, int]]
 
 
+class _LineIntervals(Generic[T]):
+    """The spans starting on a single line, sorted by their start character."""
+
+    def __init__(self, spans: List[Tuple[int, int, int, T]]):
+        # (char, rank, span, item) where rank is the iteration order of the span
+        spans.sort(key=lambda s: (s[0], s[1]))
+        self._starts = [char for char, _, _, _ in spans]
+        self._spans = spans
+        # Furthest character reached by any of the first n spans
+        self._reach = list(accumulate((c + span for c, _, span, _ in spans), max))
+
+    def at(self, line: int, char: int) -> Optional[Spanning[T]]:
+        best: Optional[Tuple[int, int, int, T]] = None
+        idx = bisect.bisect_right(self._starts, char) - 1
+        while idx >= 0 and self._reach[idx] >= char:
+            span = self._spans[idx]
+            if span[0] + span[2] >= char and (best is None or span[1] < best[1]):
+                best = span
+            idx -= 1
+        if best is None:
+            return None
+        char_min, _, item_span, item = best
+        return Spanning[T](value=item, line=line, char=char_min, span=item_span)
+
+
 class PositionLookup(Dict[T, PositionList]):
-    """A thin wrapper around Dict[T, List[Tuple[int, int, int]]]."""
+    """A thin wrapper around Dict[T, List[Tuple[int, int, int]]].
+
+    An index of positions by line is built on the first call of at, and
+    dropped when items are added or removed.  Position lists should not be
+    mutated in place after at has been called."""
+
+    _index: Optional[Dict[int, _LineIntervals[T]]] = None
 
     def __missing__(self, key: T) -> PositionList:
         self[key] = []
         return self[key]
 
+    def __setitem__(self, key: T, value: PositionList) -> None:
+        self._index = None
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: T) -> None:
+        self._index = None
+        super().__delitem__(key)
+
     def at(self, line: int, char: int) -> Optional[Spanning[T]]:
+        """Return the first item with a position spanning line and char.
+
+        Parameters
+        ----------
+        line : int
+            The line to look up.
+        char : int
+            The character to look up, spans include both their ends.
+
+        Returns
+        -------
+        Optional[Spanning[T]]
+            The matching item and its position, or None if no item matches."""
+        if self._index is None:
+            self._index = self._build_index()
+        intervals = self._index.get(line)
+        return intervals.at(line, char) if intervals else None
+
+    def _build_index(self) -> Dict[int, _LineIntervals[T]]:
+        by_line: Dict[int, List[Tuple[int, int, int, T]]] = {}
+        rank = 0
         for item, positions in self.items():
             for item_line, char_min, item_span in positions:
-                char_max = char_min + item_span
-                within_col = char_min <= char <= char_max
-                if line == item_line and within_col:
-                    return Spanning[T](
-                        value=item, line=item_line, char=char_min, span=item_span
-                    )
-        return None
+                by_line.setdefault(item_line, []).append(
+                    (char_min, rank, item_span, item)
+                )
+                rank += 1
+        return {line: _LineIntervals(spans) for line, spans in by_line.items()}
 
     def extend_with_appends(self, other: PositionLookup[T]) -> None:
+        self._index = None
         for key, value in other.items():
             self[key].extend(value)
 
@@ -62,6 +134,148 @@ class PositionLookup(Dict[T, PositionList]):
         return lookup
 
 
+class SpanTable(Mapping[T, PositionList]):
+    """A PositionLookup storing its positions in columns.
+
+    Each position is a row of four arrays of ints: the id of its item, and
+    its line, char and span, so a position takes 16 bytes rather than a
+    tuple and its ints.  Spanning objects are only created for the results
+    of at.  Indexes by item and by position are built on first use, and
+    dropped when positions are added.
+
+    Unlike a PositionLookup, positions are only added with add (or
+    extend_with_appends), position lists being built on access."""
+
+    def __init__(self) -> None:
+        self._items: List[T] = []
+        self._ids: Dict[T, int] = {}
+        self._item_ids = array("i")
+        self._lines = array("i")
+        self._chars = array("i")
+        self._spans = array("i")
+        self._index: Optional[_ColumnIndex] = None
+
+    def add(self, item: T, line: int, char: int, span: int) -> None:
+        """Add a position of item."""
+        item_id = self._ids.get(item)
+        if item_id is None:
+            item_id = self._ids[item] = len(self._items)
+            self._items.append(item)
+        self._item_ids.append(item_id)
+        self._lines.append(line)
+        self._chars.append(char)
+        self._spans.append(span)
+        self._index = None
+
+    def add_spans(self, spans: Iterable[Spanning[T]]) -> None:
+        """Add the positions of spans."""
+        ids, items = self._ids, self._items
+        add_id, add_line = self._item_ids.append, self._lines.append
+        add_char, add_span = self._chars.append, self._spans.append
+        for span in spans:
+            item_id = ids.get(span.value)
+            if item_id is None:
+                item_id = ids[span.value] = len(items)
+                items.append(span.value)
+            add_id(item_id)
+            add_line(span.line)
+            add_char(span.char)
+            add_span(span.span)
+        self._index = None
+
+    def extend_with_appends(self, other: Mapping[T, PositionList]) -> None:
+        for item, positions in other.items():
+            for line, char, span in positions:
+                self.add(item, line, char, span)
+
+    @classmethod
+    def from_iterable(cls, iterable: Iterable[Spanning[T]]) -> SpanTable[T]:
+        table: SpanTable[T] = cls()
+        table.add_spans(iterable)
+        return table
+
+    def __getitem__(self, item: T) -> PositionList:
+        item_id = self._ids[item]
+        index = self._indexed()
+        rows = index.ranked[index.offsets[item_id] : index.offsets[item_id + 1]]
+        lines, chars, spans = self._lines, self._chars, self._spans
+        return [(lines[row], chars[row], spans[row]) for row in rows]
+
+    def __contains__(self, item: object) -> bool:
+        return item in self._ids
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def at(self, line: int, char: int) -> Optional[Spanning[T]]:
+        """Return the first item with a position spanning line and char.
+
+        Positions are ordered as they would be in a PositionLookup, by item
+        and then by when they were added."""
+        index = self._indexed()
+        lines = index.lines
+        start = bisect.bisect_left(lines, line)
+        stop = bisect.bisect_right(lines, line, start)
+        idx = bisect.bisect_right(index.chars, char, start, stop) - 1
+        best: Optional[int] = None
+        chars, spans, ranks, reach = self._chars, self._spans, index.ranks, index.reach
+        ranked = index.ranked
+        while idx >= start and reach[idx] >= char:
+            rank = ranks[idx]
+            row = ranked[rank]
+            if chars[row] + spans[row] >= char and (best is None or rank < best):
+                best = rank
+            idx -= 1
+        if best is None:
+            return None
+        row = ranked[best]
+        return Spanning(
+            value=self._items[self._item_ids[row]],
+            line=line,
+            char=chars[row],
+            span=spans[row],
+        )
+
+    def _indexed(self) -> _ColumnIndex:
+        if self._index is None:
+            self._index = _ColumnIndex(self)
+        return self._index
+
+
+class _ColumnIndex:
+    """The rows of a SpanTable ordered by item, and by position."""
+
+    __slots__ = ("ranked", "offsets", "ranks", "lines", "chars", "reach")
+
+    def __init__(self, table: SpanTable[T]):
+        item_ids, lines, chars = table._item_ids, table._lines, table._chars
+        # The rows ordered by item, a row's rank being its index here
+        self.ranked = array("i", sorted(range(len(item_ids)), key=item_ids.__getitem__))
+        counts = [0] * len(table._items)
+        for item_id in item_ids:
+            counts[item_id] += 1
+        self.offsets = array("i", accumulate(counts, initial=0))
+        # The ranks ordered by position, then by rank
+        by_position = sorted(
+            range(len(self.ranked)),
+            key=lambda rank: (lines[self.ranked[rank]], chars[self.ranked[rank]]),
+        )
+        self.ranks = array("i", by_position)
+        self.lines = array("i", (lines[self.ranked[rank]] for rank in by_position))
+        self.chars = array("i", (chars[self.ranked[rank]] for rank in by_position))
+        # Furthest character reached by the positions of a line up to each
+        self.reach = array("i")
+        line, furthest = None, 0
+        for rank, pos_line, char in zip(by_position, self.lines, self.chars, strict=True):
+            end = char + table._spans[self.ranked[rank]]
+            furthest = end if pos_line != line else max(furthest, end)
+            line = pos_line
+            self.reach.append(furthest)
+
+
 ST = TypeVar("ST")
 TT = TypeVar("TT")
 
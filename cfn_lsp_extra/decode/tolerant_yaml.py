@@ -0,0 +1,421 @@
+"""
+An error tolerant decoder for yaml templates which are being edited.
+
+PyYAML gives up at the first error in a document, and while a template is
+being edited that error is often nowhere near the cursor.  This decoder
+works on the outline of the document given by the indentation of its lines,
+so an entry which can't be decoded only costs that entry rather than the
+whole document.
+
+Simple entries (e.g. 'Key: Value' or '- !Ref Foo') are decoded directly, and
+anything more involved (flow collections, block scalars, multi-line scalars,
+tags with nested values) is handed to PyYAML, but only the lines of that
+entry.  On a valid document the result is the same as decoding it with
+SafePositionLoader, except that aliases can only refer to anchors in the same
+entry (CloudFormation doesn't support either).
+"""
+from typing import Any, List, Optional, Tuple
+
+import yaml
+from attrs import frozen
+from yaml.constructor import SafeConstructor
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+from ..source_text import SourceText
+from .nodes import PositionedDict, PositionedList, Span, element_span
+from .yaml_decoding import SafePositionLoader, function_name
+from .yaml_outline import (
+    COMPLEX_STARTS,
+    comment_start,
+    is_item,
+    outline,
+    quote_end,
+    split_key,
+    split_lines,
+)
+
+_RESOLVER = Resolver()
+_CONSTRUCTOR = SafeConstructor()
+_CONSTRUCTORS = {
+    f"tag:yaml.org,2002:{name}": SafeConstructor.yaml_constructors[
+        f"tag:yaml.org,2002:{name}"
+    ]
+    for name in ("null", "bool", "int", "float", "timestamp")
+}
+_STR_TAG = "tag:yaml.org,2002:str"
+_VALUE_TAG = "tag:yaml.org,2002:value"
+
+
+@frozen
+class _Scalar:
+    """A scalar ending on its line, e.g. 'Foo', '"a b"' or '!Ref Foo'.
+
+    Attributes
+    ----------
+    value : Any
+        The value of the scalar, None if there's no scalar.
+    char : int
+        Column of the first character of the scalar.
+    end_char : int
+        Column just after the last character of the scalar.
+    tag : Optional[str]
+        The suffix of the tag of the scalar, e.g. 'Ref' for !Ref.
+    tag_end : int
+        Column just after the tag."""
+
+    value: Any
+    char: int
+    end_char: int
+    tag: Optional[str] = None
+    tag_end: int = 0
+
+    @property
+    def empty(self) -> bool:
+        return self.value is None and self.char == self.end_char
+
+
+def decode_tolerant_yaml(text: SourceText) -> Any:
+    """Decode as much of the yaml document text as possible.
+
+    Parameters
+    ----------
+    text : SourceText
+        The yaml document.
+
+    Returns
+    -------
+    Any
+        The decoded document, which for a template is a PositionedDict.
+        Entries which could not be decoded are left out or, if their key
+        could be found, given the value None.  Lines holding only a scalar
+        where a key is expected are taken as keys with the value None, as
+        when a key is being typed."""
+    return _OutlineParser(text).parse()
+
+
+class _OutlineParser:
+    def __init__(self, text: SourceText):
+        self.lines = split_lines(text)
+        self.outline = outline(text)
+
+    def parse(self) -> Any:
+        root: Any = None
+        idx = 0
+        while idx < len(self.outline):
+            # More than one block if lines are indented less than the first
+            node, idx = self._block(idx, self.outline[idx][1])
+            if root is None:
+                root = node
+            elif isinstance(root, PositionedDict) and isinstance(node, PositionedDict):
+                for key, value in node.items():
+                    _set(
+                        root, key, value, node.key_spans[key], node.value_spans.get(key)
+                    )
+        return root
+
+    def _content(self, idx: int, char: int) -> Tuple[int, str]:
+        line = self.outline[idx][0]
+        return line, self.lines[line][char:]
+
+    def _end(self, idx: int, indent: int) -> int:
+        """Return the index of the first line after idx indented at most indent."""
+        idx += 1
+        while idx < len(self.outline) and self.outline[idx][1] > indent:
+            idx += 1
+        return idx
+
+    def _block(self, idx: int, char: int) -> Tuple[Any, int]:
+        """Decode the block node starting at char on the line at idx.
+
+        Following lines are part of the node if they're indented by char."""
+        if is_item(self._content(idx, char)[1]):
+            return self._sequence(idx, char)
+        return self._mapping(idx, char)
+
+    def _lines_at(self, idx: int, char: int) -> Tuple[int, int]:
+        """Return the index and column of the next line of the node at char."""
+        column = char
+        while idx < len(self.outline):
+            column = self.outline[idx][1]
+            if column <= char:
+                break
+            idx += 1  # Indented too far, so it belongs to nothing
+        return idx, column
+
+    def _mapping(self, idx: int, char: int) -> Tuple[PositionedDict, int]:
+        mapping = PositionedDict()
+        column = char
+        while column == char and idx < len(self.outline):
+            line, content = self._content(idx, char)
+            if is_item(content):  # Not valid in a mapping
+                idx = self._end(idx, char)
+            else:
+                idx = self._entry(mapping, idx, line, char, content)
+            idx, column = self._lines_at(idx, char)
+        return mapping, idx
+
+    def _sequence(self, idx: int, char: int) -> Tuple[List[Any], int]:
+        sequence = PositionedList()
+        column = char
+        while column == char and idx < len(self.outline):
+            line, content = self._content(idx, char)
+            if not is_item(content):
+                break  # e.g. the next key of a mapping holding this sequence
+            end = self._end(idx, char)
+            item_char = char + 1
+            while (
+                item_char < len(self.lines[line])
+                and self.lines[line][item_char] in " \t"
+            ):
+                item_char += 1
+            item = self.lines[line][item_char:]
+            scalar = _scalar(item, 0)
+            if is_item(item) or split_key(item) is not None:
+                sequence.append(self._block(idx, item_char)[0])  # e.g. '- Key: 1'
+            elif scalar is not None and scalar.empty and scalar.tag is None:
+                child, child_span = self._children(idx, end, char)
+                if end == idx + 1:  # An empty item, positioned after its '-'
+                    child_span = Span(line, char + 1, line, char + 1)
+                if child_span is not None:
+                    sequence.spans[len(sequence)] = child_span
+                sequence.append(child)
+            elif scalar is not None and end == idx + 1:
+                if scalar.tag is None:
+                    sequence.spans[len(sequence)] = Span(
+                        line, item_char + scalar.char, line, item_char + scalar.end_char
+                    )
+                sequence.append(_construct(scalar, line, item_char))
+            else:
+                end = self._flow_end(idx, end, item_char)
+                loaded = self._load(idx, end, char)
+                if isinstance(loaded, list) and len(loaded) == 1:
+                    span = element_span(loaded, 0)
+                    if span is not None:
+                        sequence.spans[len(sequence)] = span
+                    sequence.append(loaded[0])
+            idx, column = self._lines_at(end, char)
+        return sequence, idx
+
+    def _entry(
+        self, mapping: PositionedDict, idx: int, line: int, char: int, content: str
+    ) -> int:
+        """Add the entry at char on line to mapping, returning the next index."""
+        end = self._end(idx, char)
+        split = split_key(content)
+        key_scalar = _scalar(content[: split[0]] if split else content, 0)
+        if key_scalar is None or key_scalar.tag is not None or key_scalar.empty:
+            return end
+        key = key_scalar.value
+        try:
+            hash(key)
+        except TypeError:
+            return end
+        key_span = Span(line, char + key_scalar.char, line, char + key_scalar.end_char)
+        if split is None:  # A scalar where a key is expected
+            value: Optional[_Scalar] = _Scalar(None, len(content), len(content))
+        else:
+            value = _scalar(content, split[1])
+        if value is not None and value.empty and value.tag is None:
+            if end < len(self.outline) and split is not None:
+                # A sequence may be indented as much as its key
+                next_line, next_content = self._content(end, char)
+                if self.outline[end][1] == char and is_item(next_content):
+                    while end < len(self.outline) and (
+                        self.outline[end][1] > char
+                        or is_item(self._content(end, char)[1])
+                    ):
+                        end += 1
+            if end == idx + 1:
+                value_span = None
+                if split is not None:
+                    colon = char + split[0] + 1
+                    value_span = Span(line, colon, line, colon)
+                _set(mapping, key, None, key_span, value_span)
+            else:
+                child, child_span = self._children(idx, end, char)
+                _set(mapping, key, child, key_span, child_span)
+            return end
+        if value is None or end > idx + 1:  # e.g. flow mappings, block scalars
+            if split is not None:
+                end = self._flow_end(idx, end, char + split[1])
+            loaded = self._load(idx, end, char)
+            if isinstance(loaded, PositionedDict) and len(loaded) == 1:
+                ((key, loaded_value),) = loaded.items()
+                key_span = loaded.key_spans[key]
+                _set(mapping, key, loaded_value, key_span, loaded.value_spans.get(key))
+                return end
+            if value is None:
+                _set(mapping, key, None, key_span, None)  # Keep the key
+                return end
+            # Otherwise ignore the lines after the value
+        value_span = None
+        if value.tag is None:
+            value_span = Span(line, char + value.char, line, char + value.end_char)
+        _set(mapping, key, _construct(value, line, char), key_span, value_span)
+        return end
+
+    def _flow_end(self, idx: int, end: int, char: int) -> int:
+        """Return end, or the index after the line closing a flow collection.
+
+        A flow collection starting at char on the line at idx may be closed
+        on a line which isn't indented past it, e.g. a ']' on its own line."""
+        line, content = self._content(idx, char)
+        if content[:1] == "!":
+            content = content.split(None, 1)[1] if " " in content else ""
+        if content[:1] not in ("[", "{"):
+            return end
+        indent = self.outline[idx][1]
+        depth = _bracket_depth(content)
+        while depth > 0 and idx + 1 < len(self.outline):
+            idx += 1
+            line_indent = self.outline[idx][1]
+            content = self._content(idx, line_indent)[1]
+            if line_indent <= indent and content[0] not in "]}":
+                return end  # Not closed
+            depth += _bracket_depth(content)
+        return max(end, idx + 1)
+
+    def _children(self, idx: int, end: int, char: int) -> Tuple[Any, Optional[Span]]:
+        """Decode the value of the node at idx given by the lines up to end.
+
+        Returns the value and its span if it's a scalar."""
+        if end == idx + 1:
+            return None, None
+        first = idx + 1
+        indent = self.outline[first][1]
+        content = self._content(first, indent)[1]
+        if is_item(content) or split_key(content) is not None:
+            return self._block(first, indent)[0], None
+        # Most likely a scalar, unless a key is being typed
+        loaded = self._load(idx, end, char)
+        if isinstance(loaded, PositionedDict) and len(loaded) == 1:
+            ((key, value),) = loaded.items()
+            return value, loaded.value_spans.get(key)
+        if isinstance(loaded, list) and len(loaded) == 1:
+            return loaded[0], None
+        return self._mapping(first, indent)[0], None
+
+    def _load(self, idx: int, end: int, char: int) -> Any:
+        """Decode the lines from idx up to end with PyYAML, or return None.
+
+        The first line is decoded from char, and lines are decoded at their
+        position in the document so spans are the same."""
+        start_line = self.outline[idx][0]
+        end_line = self.outline[end][0] if end < len(self.outline) else len(self.lines)
+        first = " " * char + self.lines[start_line][char:]
+        fragment = "\n" * start_line + "\n".join(
+            [first] + self.lines[start_line + 1 : end_line]
+        )
+        if end_line < len(self.lines):
+            fragment += "\n"  # Block scalars end after their line break
+        try:
+            return yaml.load(fragment, Loader=SafePositionLoader)  # noqa
+        except Exception:  # Tags can fail to construct with any error
+            return None
+
+
+def _set(
+    mapping: PositionedDict,
+    key: Any,
+    value: Any,
+    key_span: Span,
+    value_span: Optional[Span],
+) -> None:
+    mapping[key] = value
+    mapping.key_spans[key] = key_span
+    if value_span is None:
+        mapping.value_spans.pop(key, None)
+    else:
+        mapping.value_spans[key] = value_span
+
+
+def _bracket_depth(content: str) -> int:
+    """Return the change in flow collection nesting over the line content."""
+    depth = 0
+    quote = None
+    for idx, c in enumerate(content):
+        if quote:
+            if c == quote:
+                quote = None
+        elif c in "'\"":
+            quote = c
+        elif c in "[{":
+            depth += 1
+        elif c in "]}":
+            depth -= 1
+        elif c == "#" and (idx == 0 or content[idx - 1] in " \t"):
+            break
+    return depth
+
+
+def _scalar(content: str, start: int) -> Optional[_Scalar]:
+    """Decode the scalar at start in content, if it ends on its line.
+
+    Returns None if there's no such scalar, or an empty _Scalar if there's
+    nothing but (maybe) a tag and comments from start."""
+    tag, tag_end = None, 0
+    if content[start : start + 1] == "!":
+        tag_end = start
+        while tag_end < len(content) and content[tag_end] not in " \t":
+            tag_end += 1
+        tag = content[start + 1 : tag_end]
+        if not tag or tag[0] == "!":
+            return None  # Standard tags such as !!str
+        start = tag_end
+        while content[start : start + 1] in (" ", "\t"):
+            start += 1
+    if start >= len(content) or content[start] == "#":
+        return _Scalar(None, start, start, tag, tag_end)
+    first = content[start]
+    if first in COMPLEX_STARTS or is_item(content[start:]):
+        return None
+    value: Any
+    if first in "'\"":
+        end = quote_end(content, start)
+        if end < 0:
+            return None  # It continues on the following lines
+        rest = content[end:].lstrip(" \t")
+        if rest and rest[0] != "#":
+            return None
+        inner = content[start + 1 : end - 1]
+        if first == "'":
+            value = inner.replace("''", "'")
+        elif "\\" in inner:
+            try:
+                value = yaml.load(content[start:end], Loader=SafePositionLoader)  # noqa
+            except yaml.YAMLError:
+                return None
+        else:
+            value = inner
+        return _Scalar(value, start, end, tag, tag_end)
+    text = content[start : comment_start(content, start)].rstrip(" \t")
+    if ": " in text or ":\t" in text or text.endswith(":"):
+        return None  # A mapping, which can't be a block mapping here
+    if tag is not None:
+        value = text
+    else:
+        resolved = _RESOLVER.resolve(  # type: ignore[no-untyped-call]
+            ScalarNode, text, (True, False)
+        )
+        if resolved == _STR_TAG:
+            value = text
+        elif resolved in _CONSTRUCTORS:
+            value = _CONSTRUCTORS[resolved](_CONSTRUCTOR, ScalarNode(resolved, text))
+        elif resolved == _VALUE_TAG:
+            value = text
+        else:
+            return None  # e.g. a merge key
+    return _Scalar(value, start, start + len(text), tag, tag_end)
+
+
+def _construct(scalar: _Scalar, line: int, char: int) -> Any:
+    """Return the value of scalar at char on line, as a function if tagged."""
+    if scalar.tag is None:
+        return scalar.value
+    name = function_name(scalar.tag)
+    text = "" if scalar.value is None else scalar.value
+    end = char + (scalar.tag_end if scalar.value is None else scalar.end_char)
+    fn = PositionedDict({name: text.split(".", 1) if name == "Fn::GetAtt" else text})
+    fn.value_spans[name] = Span(line, end - len(text), line, end)
+    return fn
@@ -1,31 +1,38 @@
 """
 Utilities for parsing yaml document strings.
 """
-from typing import Any, List, Tuple
+import functools
+import gc
+from threading import Lock
+from types import TracebackType
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
 
 from cfnlint.decode.cfn_yaml import FN_PREFIX, UNCONVERTED_SUFFIXES
-from cfnlint.decode.node import dict_node, list_node
 
 try:
     from yaml.cyaml import CSafeLoader as SafeLoader
 except ImportError:
     from yaml.loader import SafeLoader  # type: ignore[assignment]
 
+from yaml.constructor import ConstructorError
 from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
 
-POSITION_PREFIX = "__position__"
-VALUES_POSITION_PREFIX = "__value_positions__"
+from .interning import intern_string
+from .nodes import POSITION_PREFIX as POSITION_PREFIX
+from .nodes import VALUES_POSITION_PREFIX as VALUES_POSITION_PREFIX
+from .nodes import PositionedDict, PositionedList, Span
 
 
 # Copied from an earlier version of cfnlint for compat
-def multi_constructor(loader: SafeLoader, tag_suffix: str, node: Node) -> Node:
+def multi_constructor(loader: SafeLoader, tag_suffix: str, node: Node) -> Any:
     """Deal with !Ref style function format."""
 
-    if tag_suffix not in UNCONVERTED_SUFFIXES:
-        tag_suffix = f"{FN_PREFIX}{tag_suffix}"
+    tag_suffix = function_name(tag_suffix)
 
     if tag_suffix == "Fn::GetAtt":
-        constructor = construct_getatt
+        constructor = functools.partial(
+            construct_getatt, offset=loader.line_offset  # type: ignore[attr-defined]
+        )
     elif isinstance(node, ScalarNode):
         constructor = loader.construct_scalar  # type: ignore[assignment]
     elif isinstance(node, SequenceNode):
@@ -35,84 +42,276 @@ def multi_constructor(loader: SafeLoader, tag_suffix: str, node: Node) -> Node:
     else:
         raise Exception(f"Bad tag: !{tag_suffix}")
 
-    return dict_node({tag_suffix: constructor(node)}, node.start_mark, node.end_mark)  # type: ignore[no-any-return]
+    value = constructor(node)
+    fn = PositionedDict({tag_suffix: value})
+    if isinstance(node, ScalarNode):
+        # The position of the value of the function, e.g. for !Ref Foo
+        line = node.end_mark.line + loader.line_offset  # type: ignore[attr-defined]
+        char = node.end_mark.column
+        text = ".".join(value) if isinstance(value, list) else value
+        fn.value_spans[tag_suffix] = Span(line, char - len(text), line, char)
+    return fn
+
+
+def _scalar_function(name: str, node: ScalarNode, offset: int = 0) -> PositionedDict:
+    """Construct the function name applied to the scalar node, e.g. !Ref Foo."""
+    text = intern_string(node.value)
+    fn = PositionedDict(
+        {name: _split_getatt(text) if name == "Fn::GetAtt" else text}
+    )
+    line, char = node.end_mark.line + offset, node.end_mark.column
+    fn.value_spans[name] = Span(line, char - len(text), line, char)
+    return fn
+
 
+@functools.lru_cache(maxsize=256)
+def function_name(tag_suffix: str) -> str:
+    """Return the name of the function written as the tag !tag_suffix.
 
-def construct_getatt(node: Node) -> Node:
+    Names are cached, so all functions of a name share one string."""
+    if tag_suffix not in UNCONVERTED_SUFFIXES:
+        return f"{FN_PREFIX}{tag_suffix}"
+    return tag_suffix
+
+
+def construct_getatt(node: Node, offset: int = 0) -> List[Any]:
     """Reconstruct !GetAtt into a list."""
 
     if isinstance(node.value, str):
-        return list_node(node.value.split(".", 1), node.start_mark, node.end_mark)  # type: ignore[no-any-return]
+        return _split_getatt(node.value)
     if isinstance(node.value, list):
-        return list_node([s.value for s in node.value], node.start_mark, node.end_mark)  # type: ignore[no-any-return]
+        getatt = PositionedList()
+        for element in node.value:
+            if isinstance(element, ScalarNode):
+                getatt.spans[len(getatt)] = _span(element, offset)
+            getatt.append(
+                intern_string(element.value)
+                if isinstance(element.value, str)
+                else element.value
+            )
+        return getatt
 
     raise ValueError(f"Unexpected node type: {type(node.value)}")
 
 
+def _split_getatt(text: str) -> List[str]:
+    """Split the text of a !GetAtt into the resource and attribute."""
+    return [intern_string(part) for part in text.split(".", 1)]
+
+
+def _span(
+    node: Node, offset: int = 0, lines: Optional[Dict[int, int]] = None
+) -> Span:
+    """Return the span of node, with lines shifted by offset.
+
+    lines maps line numbers to the int shared by all spans on the line."""
+    start, end = node.start_mark, node.end_mark
+    line = start.line + offset
+    if lines is not None:
+        line = lines.setdefault(line, line)
+    if end.line == start.line:
+        end_line = line
+    else:
+        end_line = end.line + offset
+        if lines is not None:
+            end_line = lines.setdefault(end_line, end_line)
+    # Skips the python level Span.__new__
+    return tuple.__new__(Span, (line, start.column, end_line, end.column))
+
+
+class _PausedGC:
+    """Context manager making cyclic garbage collections rare within it.
+
+    Loading allocates a node for every element of a document, and the
+    collections triggered by these allocations (which find nothing, as
+    documents have no reference cycles) take most of the time spent
+    loading.  The collector isn't disabled, as other threads, e.g. linting,
+    create cycles while documents load; instead the threshold of its
+    youngest generation is raised, and restored when no thread is within."""
+
+    # About the allocations of loading a template of 1MB, the most
+    # cloudformation accepts
+    LOAD_THRESHOLD = 1_000_000
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._depth = 0
+        self._threshold: Tuple[int, ...] = gc.get_threshold()
+
+    def __enter__(self) -> None:
+        with self._lock:
+            if self._depth == 0:
+                self._threshold = gc.get_threshold()
+                gc.set_threshold(
+                    max(self._threshold[0], self.LOAD_THRESHOLD), *self._threshold[1:]
+                )
+            self._depth += 1
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        with self._lock:
+            self._depth -= 1
+            if self._depth == 0:
+                gc.set_threshold(*self._threshold)
+
+
+_PAUSED_GC = _PausedGC()
+_MAP_TAG = "tag:yaml.org,2002:map"
+_SEQ_TAG = "tag:yaml.org,2002:seq"
+_STR_TAG = "tag:yaml.org,2002:str"
+_SCALAR_TAGS = frozenset(
+    f"tag:yaml.org,2002:{name}"
+    for name in ("null", "bool", "int", "float", "timestamp")
+)
+_MERGE_TAGS = ("tag:yaml.org,2002:merge", "tag:yaml.org,2002:value")
+
+
 class SafePositionLoader(SafeLoader):
     """A loader which saves positional information on elements.
 
     It takes inspiration from https://stackoverflow.com/questions/13319067/parsing-yaml-return-with-line-number#13319530.
+
+    Attributes
+    ----------
+    line_offset : int
+        Added to the lines of all positions, for streams which are part of
+        a larger document.
     """  # noqa
 
     yaml_multi_constructors = {"!": multi_constructor}
+    line_offset = 0
 
-    def _positional_key_value(self, node: Node) -> Tuple[str, List[int]]:
-        return POSITION_PREFIX + node.value, [
-            node.start_mark.line,
-            node.start_mark.column,
-        ]
+    def resolve(self, kind: Any, value: Any, implicit: Any) -> Any:
+        """Return the tag of a node without an explicit tag.
 
-    def _value_position(self, scalar_node: ScalarNode) -> Any:
-        position_key, position_value = self._positional_key_value(scalar_node)
-        return {position_key: position_value}
+        This is called for every scalar, and most can't be anything but
+        strings: those which are quoted and those with a first character
+        no implicit tag (e.g. int) can start with."""
+        if (
+            kind is ScalarNode
+            and (not implicit[0] or value[:1] not in self.yaml_implicit_resolvers)
+            and None not in self.yaml_implicit_resolvers
+            and not self.yaml_path_resolvers
+        ):
+            return _STR_TAG
+        return super().resolve(kind, value, implicit)  # type: ignore[no-untyped-call]
 
-    def construct_mapping(self, node: MappingNode, deep: bool = False) -> Any:
-        mapping = super(SafePositionLoader, self).construct_mapping(node, deep=deep)
+    def get_single_data(self) -> Any:
+        with _PAUSED_GC:
+            node = self.get_single_node()
+            data = None if node is None else self.construct_document(node)
+            del node  # Free the nodes before collections resume
+        return data
 
-        for key_node, value_node in node.value:
-            position_key, position_value = self._positional_key_value(key_node)
-            mapping[position_key] = position_value
-
-            # Stick positional info on leaf nodes into their own mapping so they
-            # aren't confused with others, first we check if value_node is a
-            # !Ref
-            obj = self.construct_object(value_node)  # type: ignore[no-untyped-call]
-            if isinstance(value_node, ScalarNode) and hasattr(obj, "start_mark"):
-                key = key_node.value
-                if not isinstance(mapping[key], dict):
-                    continue  # This is a duplicate key (ie bad template)
-                to_add = []
-                for _, sub_value in obj.items():
-                    line, char = value_node.end_mark.line, value_node.end_mark.column
-                    sub_value = (
-                        ".".join(sub_value)
-                        if isinstance(sub_value, list)
-                        else sub_value
-                    )
-                    char -= len(sub_value)
-                    to_add.append({POSITION_PREFIX + value_node.value: [line, char]})
-                mapping[key][VALUES_POSITION_PREFIX] = to_add
-
-            # node is a normal ScalarNode (not a !Ref)
-            elif isinstance(value_node, ScalarNode):
-                if VALUES_POSITION_PREFIX not in mapping:
-                    mapping[VALUES_POSITION_PREFIX] = []
-                value_position = self._value_position(value_node)
-                mapping[VALUES_POSITION_PREFIX].append(value_position)
-        return mapping
+    def construct_document(self, node: Node) -> Any:
+        """Construct the document with the root node in one walk of its nodes.
 
-    def construct_sequence(self, node: SequenceNode, deep: bool = False) -> Any:
-        mapping = super(SafePositionLoader, self).construct_sequence(node, deep)
+        Values and their positions are built together, and collections are
+        filled from a stack rather than by recursion.  Nodes with tags other
+        than the core scalar tags, maps, sequences and functions (e.g. !Ref)
+        are left to the base constructor."""
+        built: Dict[Node, Any] = {}
+        pending: List[Tuple[Node, Any]] = []
+        offset = self.line_offset
+        lines: Dict[int, int] = {}
+        data = self._construct_shallow(node, built, pending)
+        while pending:
+            node, container = pending.pop()
+            if isinstance(container, PositionedList):
+                for element in node.value:
+                    if isinstance(element, ScalarNode) and element.tag[0] != "!":
+                        container.spans[len(container)] = _span(element, offset, lines)
+                    container.append(self._construct_shallow(element, built, pending))
+                continue
+            if any(key_node.tag in _MERGE_TAGS for key_node, _ in node.value):
+                self.flatten_mapping(node)  # type: ignore[arg-type]
+            key_spans, value_spans = container.key_spans, container.value_spans
+            for key_node, value_node in node.value:
+                key = self._construct_shallow(key_node, built, pending)
+                value = self._construct_shallow(value_node, built, pending)
+                try:
+                    container[key] = value
+                except TypeError as e:
+                    raise ConstructorError(
+                        "while constructing a mapping",
+                        node.start_mark,
+                        "found unhashable key",
+                        key_node.start_mark,
+                    ) from e
+                key_spans[key] = _span(key_node, offset, lines)
+                # Positions of function values (e.g. !Ref) are held by the function
+                if isinstance(value_node, ScalarNode) and value_node.tag[0] != "!":
+                    value_spans[key] = _span(value_node, offset, lines)
+                else:
+                    value_spans.pop(key, None)  # A duplicate key (ie bad template)
+        # Reset the state of the base constructor, as it would after a document
+        self.constructed_objects = {}
+        self.recursive_objects = {}
+        return data
 
-        for idx, value_node in enumerate(node.value):
-            obj = self.construct_object(value_node)  # type: ignore[no-untyped-call]
-            if isinstance(value_node, ScalarNode) and hasattr(obj, "start_mark"):
-                to_add = []
-                for _, sub_value in obj.items():
-                    line, char = value_node.end_mark.line, value_node.end_mark.column
-                    char -= len(sub_value)
-                    to_add.append({POSITION_PREFIX + value_node.value: [line, char]})
-                mapping[idx][VALUES_POSITION_PREFIX] = to_add
+    def _construct_shallow(
+        self, node: Node, built: Dict[Node, Any], pending: List[Tuple[Node, Any]]
+    ) -> Any:
+        """Construct node, leaving collections empty and adding them to pending."""
+        tag = node.tag
+        if isinstance(node, ScalarNode):
+            if tag == _STR_TAG:
+                return intern_string(node.value)
+            if tag in _SCALAR_TAGS:
+                return self.yaml_constructors[tag](self, node)
+            if tag[0] == "!":
+                return _scalar_function(
+                    function_name(tag[1:]), node, self.line_offset
+                )
+            return self.construct_object(node, deep=True)
+        if node in built:  # An alias
+            return built[node]
+        container: Any
+        if tag == _MAP_TAG or (tag[0] == "!" and isinstance(node, MappingNode)):
+            container = PositionedDict()
+        elif tag == _SEQ_TAG or (tag[0] == "!" and isinstance(node, SequenceNode)):
+            container = PositionedList()
+        else:  # e.g. !!set
+            return self.construct_object(node, deep=True)
+        if tag[0] == "!":
+            name = function_name(tag[1:])
+            if name == "Fn::GetAtt":
+                getatt = construct_getatt(node, self.line_offset)
+                built[node] = fn = PositionedDict({name: getatt})
+                return fn
+            built[node] = fn = PositionedDict({name: container})
+        else:
+            built[node] = container
+        pending.append((node, container))
+        return built[node]
 
+    def construct_yaml_positioned_map(self, node: MappingNode) -> Iterator[Any]:
+        data = PositionedDict()
+        yield data
+        value = self.construct_mapping(node)
+        data.update(value)
+        data.with_spans_of(value)
+
+    def construct_mapping(self, node: MappingNode, deep: bool = False) -> Any:
+        mapping = PositionedDict(
+            super(SafePositionLoader, self).construct_mapping(node, deep=deep)
+        )
+        key_spans, value_spans = mapping.key_spans, mapping.value_spans
+        for key_node, value_node in node.value:
+            key = self.construct_object(key_node)
+            key_spans[key] = _span(key_node, self.line_offset)
+            # Positions of function values (e.g. !Ref) are held by the function
+            if isinstance(value_node, ScalarNode) and not value_node.tag.startswith("!"):
+                value_spans[key] = _span(value_node, self.line_offset)
+            else:
+                value_spans.pop(key, None)  # This is a duplicate key (ie bad template)
         return mapping
+
+
+SafePositionLoader.add_constructor(
+    "tag:yaml.org,2002:map", SafePositionLoader.construct_yaml_positioned_map
+)
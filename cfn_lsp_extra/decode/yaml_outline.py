@@ -0,0 +1,165 @@
+"""
+The outline of a yaml document, given by the indentation of its lines.
+
+Block collections are delimited by indentation, so the lines making up an
+entry of a block mapping can be found without parsing the document.
+"""
+import bisect
+import functools
+import re
+from typing import List, Optional, Pattern, Tuple
+
+from ..source_text import LINE_BREAK, SourceText
+
+# Values starting with these aren't plain scalars or keys
+COMPLEX_STARTS = frozenset("[{|>&*%@`")
+
+# A line of content, i.e. not blank or a comment, and its indentation
+CONTENT_LINE = re.compile(r"^([ \t]*)[^ \t\r\n#]", re.MULTILINE)
+# Line breaks '^' doesn't match after
+LONE_CR = re.compile(r"\r(?!\n)")
+
+
+def split_lines(text: SourceText) -> List[str]:
+    """Return the lines of text, without their line breaks."""
+    if "\r" in text.text:
+        return LINE_BREAK.split(text.text)
+    return text.text.split("\n")
+
+
+def outline(text: SourceText) -> List[Tuple[int, int]]:
+    """Return the line number and indentation of each line of content.
+
+    Blank lines, comments, directives and document markers are left out."""
+    source, line_starts = text.text, text.line_starts
+    if "\r" in source and LONE_CR.search(source):
+        return _outline_by_line(split_lines(text))
+    result = []
+    line = 0
+    for match in CONTENT_LINE.finditer(source):
+        start = match.end() - 1
+        line = bisect.bisect_right(line_starts, start, lo=line) - 1
+        indent = len(match.group(1))
+        if indent == 0 and source.startswith(("%", "---", "..."), start):
+            continue
+        result.append((line, indent))
+    return result
+
+
+def _outline_by_line(lines: List[str]) -> List[Tuple[int, int]]:
+    result = []
+    for line, content in enumerate(lines):
+        stripped = content.lstrip(" \t")
+        if not stripped or stripped[0] == "#":
+            continue
+        indent = len(content) - len(stripped)
+        if indent == 0 and (stripped[0] == "%" or stripped[:3] in ("---", "...")):
+            continue
+        result.append((line, indent))
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def lines_at(indent: int) -> Pattern[str]:
+    """Return a pattern matching lines of content indented by indent."""
+    return re.compile(f"^{' ' * indent}[^ \\t\\r\\n#]", re.MULTILINE)
+
+
+def entry_lines(text: SourceText, start: int, stop: int, indent: int) -> List[int]:
+    """Return the lines of content of lines [start, stop) of text indented by indent.
+
+    Lines are found by regular expressions rather than line by line, and
+    their starts are matched by '^', so text mustn't contain lone '\\r's."""
+    source, line_starts = text.text, text.line_starts
+    end = min(line_starts[stop], len(source))
+    lines = []
+    line = start
+    for match in lines_at(indent).finditer(source, line_starts[start], end):
+        line = bisect.bisect_right(line_starts, match.start(), lo=line) - 1
+        lines.append(line)
+    return lines
+
+
+def first_content(
+    text: SourceText, start: int, stop: int
+) -> Optional[Tuple[int, int]]:
+    """Return the line and indentation of the first line of content in [start, stop)."""
+    line_starts = text.line_starts
+    match = CONTENT_LINE.search(text.text, line_starts[start], line_starts[stop])
+    if match is None:
+        return None
+    line = bisect.bisect_right(line_starts, match.start(), lo=start) - 1
+    return line, len(match.group(1))
+
+
+def is_item(content: str) -> bool:
+    """Whether content starts with a block sequence item."""
+    return content[:1] == "-" and (len(content) == 1 or content[1] in " \t")
+
+
+def opens_mapping(content: str) -> bool:
+    """Whether the line content is a key without a value on the same line."""
+    stripped = content.lstrip(" \t")
+    split = None if is_item(stripped) else split_key(stripped)
+    return split is not None and stripped[split[1] : split[1] + 1] in ("", "#")
+
+
+def is_key(content: str) -> bool:
+    """Whether the line content starts with a key."""
+    stripped = content.lstrip(" \t")
+    return not is_item(stripped) and split_key(stripped) is not None
+
+
+def split_key(content: str) -> Optional[Tuple[int, int]]:
+    """Return the column of the ':' after the key of content and of its value.
+
+    Returns None if content doesn't start with a key."""
+    if not content or content[0] in COMPLEX_STARTS or content[0] == "!":
+        return None
+    if content[0] in "'\"":
+        colon = quote_end(content, 0)
+        if colon < 0:
+            return None
+        while content[colon : colon + 1] in (" ", "\t"):
+            colon += 1
+        if content[colon : colon + 1] != ":":
+            return None
+    else:
+        colon = content.find(":")
+        while 0 < colon < len(content) - 1 and content[colon + 1] not in " \t":
+            colon = content.find(":", colon + 1)
+        if colon <= 0 or colon > comment_start(content):
+            return None
+    value = colon + 1
+    while content[value : value + 1] in (" ", "\t"):
+        value += 1
+    return colon, value
+
+
+def comment_start(content: str, start: int = 0) -> int:
+    """Return the column of a comment in plain content, or its length."""
+    hash_ = content.find("#", start)
+    while hash_ > start and content[hash_ - 1] not in " \t":
+        hash_ = content.find("#", hash_ + 1)
+    return len(content) if hash_ < 0 else hash_
+
+
+def quote_end(content: str, start: int) -> int:
+    """Return the column after the quote closing the one at start, or -1."""
+    quote = content[start]
+    idx = start + 1
+    while True:
+        idx = content.find(quote, idx)
+        if idx < 0:
+            return -1
+        if quote == "'":
+            if content[idx + 1 : idx + 2] != "'":
+                return idx + 1
+            idx += 2
+            continue
+        escapes = 0
+        while content[idx - 1 - escapes] == "\\":
+            escapes += 1
+        if escapes % 2 == 0:
+            return idx + 1
+        idx += 1
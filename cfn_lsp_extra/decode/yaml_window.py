@@ -0,0 +1,113 @@
+"""
+Windows of yaml templates around a line.
+
+Completions at a position only use the entry of the top level section the
+position is in (e.g. a single resource), and the names and types of the
+template's resources and parameters.  Decoding only the lines holding these
+bounds the cost of completions by the size of an entry rather than of the
+template.
+"""
+import bisect
+import functools
+import re
+from itertools import pairwise
+from typing import List, Optional, Pattern, Tuple
+
+from ..source_text import SourceText
+from .yaml_outline import LONE_CR, entry_lines, first_content, opens_mapping
+
+# Templates with fewer lines are decoded in full
+MIN_WINDOW_LINES = 1000
+
+# Sections whose entries are referred to from elsewhere, e.g. by !Ref
+_SYMBOL_SECTION = re.compile(r"""(["']?)(Resources|Parameters)\1[ \t]*:""")
+
+
+@functools.lru_cache(maxsize=None)
+def _headers_at(indent: int) -> Pattern[str]:
+    """Return a pattern matching the header keys of an entry indented by indent."""
+    return re.compile(
+        f"^{' ' * indent}([\"']?)(Type|Description|Default)\\1[ \\t]*:", re.MULTILINE
+    )
+
+
+def window(text: SourceText, line: int) -> Optional[SourceText]:
+    """Return text with only the lines used by completions on line.
+
+    These are the lines of the entry of the top level section containing
+    line, the top level keys, and the names and headers (Type, Description
+    and Default) of resources and parameters.  Other lines are blanked, so
+    positions are unchanged.
+
+    Returns None if line isn't within an entry of a top level section, or
+    text has fewer than MIN_WINDOW_LINES lines."""
+    source = text.text
+    if text.line_count < MIN_WINDOW_LINES or ("\r" in source and LONE_CR.search(source)):
+        return None
+    first = first_content(text, 0, text.line_count)
+    if first is None:
+        return None
+    sections = entry_lines(text, 0, text.line_count, first[1])
+    sections.append(text.line_count)
+    idx = bisect.bisect_right(sections, line) - 1
+    if idx < 0 or idx == len(sections) - 1 or sections[idx] == line:
+        return None
+    entries = _entries(text, sections[idx], sections[idx + 1], first[1])
+    entries.append(sections[idx + 1])
+    entry = bisect.bisect_right(entries, line) - 1
+    if entry < 0 or entry == len(entries) - 1:
+        return None
+    kept = [(section, section + 1) for section in sections[:-1]]
+    kept.append((entries[entry], entries[entry + 1]))
+    for section, stop in pairwise(sections):
+        if _SYMBOL_SECTION.match(text.line(section)):
+            kept.extend(_headers(text, _entries(text, section, stop, first[1]), stop))
+    return SourceText(_blank_lines(text, kept))
+
+
+def _entries(text: SourceText, section: int, stop: int, indent: int) -> List[int]:
+    """Return the lines of the entries of the section on line section."""
+    if not opens_mapping(text.line(section)):
+        return []
+    body = first_content(text, section + 1, stop)
+    if body is None or body[1] <= indent:
+        return []
+    return entry_lines(text, body[0], stop, body[1])
+
+
+def _headers(text: SourceText, entries: List[int], stop: int) -> List[Tuple[int, int]]:
+    """Return the lines of the entries and of their headers, as line ranges."""
+    if not entries:
+        return []
+    kept = [(entry, entry + 1) for entry in entries]
+    # The indentation of the content of each entry, almost always the same
+    indents = {}
+    for entry, next_entry in pairwise([*entries, stop]):
+        body = first_content(text, entry + 1, next_entry)
+        if body is not None:
+            indents[entry] = body[1]
+    line_starts = text.line_starts
+    end = min(line_starts[stop], len(text.text))
+    for indent in set(indents.values()):
+        line = entries[0]
+        for match in _headers_at(indent).finditer(text.text, line_starts[line], end):
+            line = bisect.bisect_right(line_starts, match.start(), lo=line) - 1
+            entry = entries[bisect.bisect_right(entries, line) - 1]
+            if indents.get(entry) == indent:
+                kept.append((line, line + 1))
+    return kept
+
+
+def _blank_lines(text: SourceText, kept: List[Tuple[int, int]]) -> str:
+    """Return text with all lines outside of the line ranges kept made blank."""
+    source, line_starts = text.text, text.line_starts
+    pieces = []
+    previous = 0
+    for start, stop in sorted(kept):
+        if stop <= previous:
+            continue
+        start = max(start, previous)
+        pieces.append("\n" * (start - previous))
+        pieces.append(source[line_starts[start] : line_starts[stop]])
+        previous = stop
+    return "".join(pieces)
@@ -9,7 +9,9 @@ from lsprotocol.types import Location, Position
 from pygls.workspace import TextDocument
 
 from ..aws_data import AWSContext, Tree
+from ..workspace_index import WorkspaceIndex
 from .attributes import attribute_definition
+from .imports import import_value_definition
 from .ref import ref_definition
 
 logger = logging.getLogger(__name__)
@@ -20,6 +22,7 @@ def definition(
     document: TextDocument,
     position: Position,
     aws_context: AWSContext,
+    workspace_index: Optional[WorkspaceIndex] = None,
 ) -> Optional[Location]:
     ref_result = ref_definition(template_data, document, position, aws_context)
     logger.error(ref_result)
@@ -30,4 +33,7 @@ def definition(
         template_data, document, position, aws_context
     )
     logger.error(attribute_result)
-    return attribute_result
+    if attribute_result or workspace_index is None:
+        return attribute_result
+
+    return import_value_definition(template_data, document, position, workspace_index)
@@ -8,13 +8,13 @@ from lsprotocol.types import Location, Position, Range
 from pygls.workspace import TextDocument
 
 from ..aws_data import AWSContext, AWSRefName, Tree
-from ..decode.extractors import KeyExtractor, LogicalIdExtractor
+from ..decode.extractors import KeyExtractor
 from ..ref import resolve_ref
+from ..symbols import GET_ATT_SECTIONS
 
 ATTRIBUTE_EXTRACTOR = KeyExtractor[AWSRefName](
     "Fn::GetAtt", lambda s: AWSRefName(value=s.split(".")[0])
 )
-ATTRIBUTE_SRC_EXTRACTOR = LogicalIdExtractor()
 
 
 def attribute_definition(
@@ -27,7 +27,7 @@ def attribute_definition(
         position,
         template_data,
         ref_extractor=ATTRIBUTE_EXTRACTOR,
-        ref_src_extractor=ATTRIBUTE_SRC_EXTRACTOR,
+        sections=GET_ATT_SECTIONS,
     )
     if link:
         return Location(
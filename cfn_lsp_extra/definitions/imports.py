@@ -0,0 +1,35 @@
+"""
+Definitions for !ImportValues.
+"""
+
+from typing import Optional
+
+from lsprotocol.types import Location, Position, Range
+from pygls.workspace import TextDocument
+
+from ..aws_data import Tree
+from ..workspace_index import WorkspaceIndex, import_at
+
+
+def import_value_definition(
+    template_data: Tree,
+    document: TextDocument,
+    position: Position,
+    workspace_index: WorkspaceIndex,
+) -> Optional[Location]:
+    import_span = import_at(template_data, position)
+    if import_span:
+        export = workspace_index.export(
+            import_span.value.value, excluding=document.uri
+        )
+        if export:
+            return Location(
+                uri=export.value.uri,
+                range=Range(
+                    start=Position(line=export.line, character=export.char),
+                    end=Position(
+                        line=export.line, character=export.char + export.span
+                    ),
+                ),
+            )
+    return None
@@ -0,0 +1,211 @@
+"""
+Per-document state shared between LSP requests.
+
+Decoding a template is by far the most expensive part of serving a hover,
+definition or completion request, so the result is kept around for as
+long as the document version it was decoded from is current.
+"""
+import logging
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from attrs import define, field
+from lsprotocol.types import (
+    Diagnostic,
+    Position,
+    TextDocumentContentChangeEvent,
+    TextDocumentContentChangePartial,
+)
+from pygls.workspace import TextDocument
+
+from .aws_data import Tree
+from .cfnlint_integration import diagnostics
+from .decode import CfnDecodingError, decode, decode_unfinished
+from .decode.incremental import LineChange, decode_incremental
+from .source_text import SourceText
+
+logger = logging.getLogger(__name__)
+
+
+@define
+class DocumentState:
+    """Everything derived from a single version of a text document.
+
+    Attributes
+    ----------
+    version : Optional[int]
+        The document version this state was derived from.
+    text : SourceText
+        The document content at version.
+    filename : str
+        Name of the document, determines whether it is decoded as json or yaml.
+    is_sam : bool
+        Whether the document is a SAM template.
+    base : Optional[Tuple[Tree, LineChange]]
+        A previously decoded tree and the change made to its source since,
+        used to decode this document incrementally."""
+
+    version: Optional[int]
+    text: SourceText
+    filename: str
+    is_sam: bool
+    base: Optional[Tuple[Tree, LineChange]] = None
+    _tree: Optional[Tree] = field(default=None, init=False)
+    _decoding_error: Optional[CfnDecodingError] = field(default=None, init=False)
+    _unfinished: Optional[Tuple[Position, Tree]] = field(default=None, init=False)
+    _diagnostics: Optional[List[Diagnostic]] = field(default=None, init=False)
+
+    @classmethod
+    def from_document(
+        cls, document: TextDocument, base: Optional[Tuple[Tree, LineChange]] = None
+    ) -> "DocumentState":
+        return cls(
+            version=document.version,
+            text=SourceText.of(document),
+            filename=document.filename or "unknown-file",
+            is_sam=is_document_sam(document),
+            base=base,
+        )
+
+    @property
+    def source(self) -> str:
+        return self.text.text
+
+    def tree(self) -> Tree:
+        """Return the decoded document, decoding it on first use.
+
+        Large nested mappings of the tree are only decoded when used, which
+        raises a CfnDecodingError if they can't be.
+
+        Raises
+        ------
+        CfnDecodingError
+            If the document could not be decoded."""
+        if self._decoding_error:
+            raise self._decoding_error
+        if self._tree is None and self.base and not self.filename.endswith("json"):
+            base_tree, change = self.base
+            self._tree = decode_incremental(base_tree, self.text, change)
+            self.base = None
+        if self._tree is None:
+            try:
+                self._tree = decode(self.text, self.filename, lazy=True)
+            except CfnDecodingError as e:
+                self._decoding_error = e
+                raise
+        return self._tree
+
+    def rebase(
+        self, changes: Sequence[TextDocumentContentChangeEvent]
+    ) -> Optional[Tuple[Tree, LineChange]]:
+        """Return a base for decoding this document after changes incrementally."""
+        if self._tree is not None:
+            tree, change = self._tree, None
+        elif self.base is not None:
+            tree, change = self.base
+        else:
+            return None
+        for content_change in changes:
+            if not isinstance(content_change, TextDocumentContentChangePartial):
+                return None  # The whole document was replaced
+            start, end = content_change.range.start, content_change.range.end
+            line_change = LineChange.from_range(
+                start.line, end.line, content_change.text
+            )
+            change = change.then(line_change) if change else line_change
+        return (tree, change) if change else None
+
+    def unfinished_tree(self, position: Position) -> Tree:
+        """Return the document decoded with edits to aid completions at position.
+
+        Raises
+        ------
+        CfnDecodingError
+            If the document could not be decoded."""
+        if self._unfinished and self._unfinished[0] == position:
+            return self._unfinished[1]
+        tree = decode_unfinished(self.text, self.filename, position, windowed=True)
+        self._unfinished = (position, tree)
+        return tree
+
+    def diagnostics(self, file_path: str) -> List[Diagnostic]:
+        """Return cfnlint diagnostics for the document."""
+        if self._diagnostics is None:
+            self._diagnostics = diagnostics(self.source, file_path)
+        return self._diagnostics
+
+
+class DocumentStateCache:
+    """A thread safe mapping of document uris to their latest DocumentState."""
+
+    def __init__(self) -> None:
+        self._states: Dict[str, DocumentState] = {}
+        self._lock = Lock()
+
+    def get(self, document: TextDocument) -> DocumentState:
+        """Return the state for document, replacing it if the version is stale."""
+        with self._lock:
+            state = self._states.get(document.uri)
+            if (
+                state is None
+                or state.version != document.version
+                # Versions aren't always given, e.g. for documents read from disk
+                or (document.version is None and state.source != document.source)
+            ):
+                logger.debug(
+                    "Creating state for %s at version %s",
+                    document.uri,
+                    document.version,
+                )
+                state = DocumentState.from_document(document)
+                self._states[document.uri] = state
+            return state
+
+    def update(
+        self,
+        document: TextDocument,
+        changes: Sequence[TextDocumentContentChangeEvent],
+        version: Optional[int] = None,
+    ) -> DocumentState:
+        """Return the state for document, after changes were applied to it.
+
+        Unlike get, the new state may be decoded incrementally from the
+        previous one. version is the document version changes lead to, if
+        document is at another version, e.g. later changes were already
+        applied to it, changes don't describe its content and the state is
+        decoded in full."""
+        with self._lock:
+            previous = self._states.get(document.uri)
+            if previous is not None and previous.version == document.version:
+                return previous
+            base = None
+            if previous is not None and (
+                version is None or version == document.version
+            ):
+                base = previous.rebase(changes)
+            state = DocumentState.from_document(document, base)
+            self._states[document.uri] = state
+            return state
+
+    def current(self, uri: str) -> Optional[DocumentState]:
+        """Return the latest state for the document at uri, if there is one."""
+        with self._lock:
+            return self._states.get(uri)
+
+    def remove(self, uri: str) -> None:
+        with self._lock:
+            self._states.pop(uri, None)
+
+
+def is_document_sam(document: TextDocument) -> bool:
+    text = SourceText.of(document)
+    for idx in range(text.line_count):
+        line_stripped = text.line(idx).strip()
+        if not line_stripped.startswith("#") and not line_stripped.startswith("{"):
+            return (
+                line_stripped == "Transform: AWS::Serverless-2016-10-31"
+                or line_stripped.replace(" ", "").startswith(
+                    '"Transform":"AWS::Serverless-2016-10-31"'
+                )
+            )
+    return False
@@ -8,9 +8,11 @@ from lsprotocol.types import Hover, MarkupContent, MarkupKind, Position, Range
 from pygls.workspace import TextDocument
 
 from ..aws_data import AWSContext, AWSPropertyName, AWSResourceName, Tree
-from ..decode.position import PositionLookup
+from ..decode.position import SpanTable
+from ..workspace_index import WorkspaceIndex
 from .attributes import attribute_hover
 from .functions import intrinsic_function_hover
+from .imports import import_value_hover
 from .refs import ref_hover
 
 logger = logging.getLogger(__name__)
@@ -21,7 +23,8 @@ def hover(
     position: Position,
     aws_context: AWSContext,
     document: TextDocument,
-    position_lookup: PositionLookup[Union[AWSResourceName, AWSPropertyName]],
+    position_lookup: SpanTable[Union[AWSResourceName, AWSPropertyName]],
+    workspace_index: Optional[WorkspaceIndex] = None,
 ) -> Optional[Hover]:
     line_at, char_at = position.line, position.character
     span = position_lookup.at(line_at, char_at)
@@ -49,6 +52,13 @@ def hover(
     if for_attribute:
         return for_attribute
 
+    if workspace_index is not None:
+        for_import = import_value_hover(
+            template_data, position, document, workspace_index
+        )
+        if for_import:
+            return for_import
+
     for_intrinsic_function = intrinsic_function_hover(document, position)
     if for_intrinsic_function:
         return for_intrinsic_function
@@ -0,0 +1,36 @@
+"""
+Hovers for !ImportValues.
+"""
+from typing import Optional
+
+from lsprotocol.types import Hover, MarkupContent, MarkupKind, Position, Range
+from pygls.workspace import TextDocument
+
+from ..aws_data import Tree
+from ..workspace_index import WorkspaceIndex, import_at
+
+
+def import_value_hover(
+    template_data: Tree,
+    position: Position,
+    document: TextDocument,
+    workspace_index: WorkspaceIndex,
+) -> Optional[Hover]:
+    import_span = import_at(template_data, position)
+    if import_span:
+        export = workspace_index.export(
+            import_span.value.value, excluding=document.uri
+        )
+        if export:
+            char, length = import_span.char, import_span.span
+            line_at = position.line
+            return Hover(
+                range=Range(
+                    start=Position(line=line_at, character=char),
+                    end=Position(line=line_at, character=char + length),
+                ),
+                contents=MarkupContent(
+                    kind=MarkupKind.Markdown, value=export.value.as_documentation()
+                ),
+            )
+    return None
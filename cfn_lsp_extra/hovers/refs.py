@@ -6,7 +6,7 @@ from typing import Optional, Union
 from lsprotocol.types import Hover, MarkupContent, MarkupKind, Position, Range
 
 from ..aws_data import AWSContext, AWSPropertyName, AWSResourceName, Tree
-from ..decode.position import PositionLookup
+from ..decode.position import SpanTable
 from ..ref import resolve_ref
 
 
@@ -14,7 +14,7 @@ def ref_hover(
     template_data: Tree,
     position: Position,
     aws_context: AWSContext,
-    position_lookup: PositionLookup[Union[AWSResourceName, AWSPropertyName]],
+    position_lookup: SpanTable[Union[AWSResourceName, AWSPropertyName]],
 ) -> Optional[Hover]:
     # Attempt to resolve it as a Ref
     link = resolve_ref(position, template_data)
@@ -0,0 +1,179 @@
+"""
+An on disk store of workspace index data, reused across server restarts.
+
+Summaries of templates are stored in a SQLite database in the user cache
+directory, keyed by file path and checked against the modification time,
+size and content hash of the file, so on startup only templates which
+changed since are decoded again.
+"""
+import json
+import logging
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from typing import Any, Iterable, Optional
+
+from attrs import frozen
+
+from .context import dirs, package_version
+
+logger = logging.getLogger(__name__)
+
+WORKSPACE_INDEX_PATH = Path(dirs.user_cache_dir) / "workspace-index.sqlite"
+# Bump when what is stored, or how it is derived from templates, changes
+SCHEMA_VERSION = 1
+
+
+def store_version() -> str:
+    """Return the version of the data stored, entries of other versions are dropped."""
+    return f"{SCHEMA_VERSION}:{package_version()}"
+
+
+@frozen
+class StoredFile:
+    """What is stored of a file which may be a template.
+
+    Attributes
+    ----------
+    mtime_ns : int
+        The modification time of the file when it was stored.
+    size : int
+        The size of the file in bytes when it was stored.
+    digest : str
+        The sha256 digest of the content of the file.
+    summary : Optional[Any]
+        The json serialisable summary of the file, see
+        workspace_index.TemplateSummary.to_data, None if it isn't a template."""
+
+    mtime_ns: int
+    size: int
+    digest: str
+    summary: Optional[Any]
+
+
+class IndexStore:
+    """A thread safe store of template summaries.
+
+    The database is opened on first use, if it can't be the store behaves
+    as if it were empty."""
+
+    def __init__(
+        self, path: Path = WORKSPACE_INDEX_PATH, data_version: Optional[str] = None
+    ) -> None:
+        self.path = path
+        self.data_version = data_version or store_version()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._failed = False
+        self._lock = Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._connection is None and not self._failed:
+            try:
+                self._connection = self._open()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Failed to open workspace index %s: %s", self.path, e)
+                self._failed = True
+        return self._connection
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, "
+                "mtime_ns INTEGER, size INTEGER, digest TEXT, summary TEXT)"
+            )
+            row = connection.execute(
+                "SELECT value FROM meta WHERE key = 'version'"
+            ).fetchone()
+            if row is None or row[0] != self.data_version:
+                logger.info(
+                    "Dropping workspace index entries of version %s",
+                    row[0] if row else None,
+                )
+                connection.execute("DELETE FROM files")
+                connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version', ?)",
+                    (self.data_version,),
+                )
+        return connection
+
+    def get(self, path: str) -> Optional[StoredFile]:
+        """Return what is stored of the file at path, if anything."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute(
+                    "SELECT mtime_ns, size, digest, summary FROM files WHERE path = ?",
+                    (path,),
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.debug("Failed to read %s from workspace index: %s", path, e)
+                return None
+        if row is None:
+            return None
+        mtime_ns, size, digest, summary = row
+        return StoredFile(
+            mtime_ns=mtime_ns,
+            size=size,
+            digest=digest,
+            summary=None if summary is None else json.loads(summary),
+        )
+
+    def put(self, path: str, stored: StoredFile) -> None:
+        """Store stored as what is known of the file at path."""
+        summary = None if stored.summary is None else json.dumps(stored.summary)
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                        (path, stored.mtime_ns, stored.size, stored.digest, summary),
+                    )
+            except sqlite3.Error as e:
+                logger.debug("Failed to write %s to workspace index: %s", path, e)
+
+    def remove(self, path: str) -> None:
+        """Forget the file at path."""
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                with connection:
+                    connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            except sqlite3.Error as e:
+                logger.debug("Failed to remove %s from workspace index: %s", path, e)
+
+    def retain(self, folder: str, paths: Iterable[str]) -> None:
+        """Forget the files in folder other than paths, e.g. deleted files."""
+        keep = set(paths)
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                stale = [
+                    (path,)
+                    for (path,) in connection.execute("SELECT path FROM files")
+                    if path not in keep and Path(path).is_relative_to(folder)
+                ]
+                with connection:
+                    connection.executemany("DELETE FROM files WHERE path = ?", stale)
+            except sqlite3.Error as e:
+                logger.debug("Failed to prune workspace index: %s", e)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
@@ -0,0 +1,271 @@
+"""
+The uses of the names defined by a template, e.g. the Refs of a parameter.
+
+A template's reference index is built once per decoded template, mapping
+each definition to its uses, so finding, highlighting or renaming the uses
+of a name takes time proportional to their number rather than to the size
+of the template.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from lsprotocol.types import (
+    DocumentHighlight,
+    DocumentHighlightKind,
+    Location,
+    Position,
+    Range,
+    TextEdit,
+    WorkspaceEdit,
+)
+from pygls.workspace import TextDocument
+
+from .aws_data import AWSReference, AWSSymbol, Tree
+from .decode import Template
+from .decode.extractors import ReferenceExtractor
+from .decode.position import Spanning
+from .source_text import SourceText
+from .symbols import REF_SECTIONS, SymbolTable, symbol_table
+
+REFERENCE_EXTRACTOR = ReferenceExtractor()
+# How far from its extracted position the name of a use is looked for
+ANCHOR_SLACK = 3
+
+Symbol = Spanning[AWSSymbol]
+
+
+class ReferenceIndex:
+    """The uses of the names defined by a template.
+
+    Definitions and uses are anchored to the source text, e.g. past the
+    quote of a quoted key. Only uses whose name is found at or just around
+    their extracted position are indexed, see located for the names with
+    uses which aren't.
+
+    Attributes
+    ----------
+    symbols : SymbolTable
+        The definitions of the template."""
+
+    def __init__(
+        self,
+        symbols: SymbolTable,
+        references: Sequence[Spanning[AWSReference]],
+        text: SourceText,
+    ):
+        self.symbols = symbols
+        self._definitions: Dict[Tuple[str, str], Symbol] = {}
+        self._defined_by_line: Dict[int, List[Symbol]] = {}
+        self._uses: Dict[Tuple[str, str], List[Spanning[AWSReference]]] = {}
+        self._by_line: Dict[int, List[Tuple[Spanning[AWSReference], Symbol]]] = {}
+        self._unlocated: Set[Tuple[str, str]] = set()
+        for symbol, positions in symbols.spans.items():
+            key = (symbol.section, symbol.logical_name)
+            if key in self._definitions:
+                continue
+            defined = self._definitions[key] = _anchored(text, symbol, *positions[0])
+            self._defined_by_line.setdefault(defined.line, []).append(defined)
+        for reference in sorted(references, key=lambda r: (r.line, r.char)):
+            definition = self._definition(reference.value)
+            if definition is None:
+                continue
+            key = (definition.value.section, definition.value.logical_name)
+            char = _anchor(text, reference)
+            if char is None:
+                self._unlocated.add(key)
+                continue
+            use = Spanning(
+                value=reference.value,
+                line=reference.line,
+                char=char,
+                span=reference.span,
+            )
+            self._uses.setdefault(key, []).append(use)
+            self._by_line.setdefault(use.line, []).append((use, definition))
+
+    def _definition(self, reference: AWSReference) -> Optional[Symbol]:
+        for section in reference.sections:
+            definition = self._definitions.get((section, reference.logical_name))
+            if definition is not None:
+                return definition
+        return None
+
+    def symbol_at(self, line: int, char: int) -> Optional[Symbol]:
+        """Return the definition used or defined at line and char, if any."""
+        for use, definition in self._by_line.get(line, ()):
+            if use.char <= char <= use.char + use.span:
+                return definition
+        for definition in self._defined_by_line.get(line, ()):
+            if definition.char <= char <= definition.char + definition.span:
+                return definition
+        return None
+
+    def defines(self, name: str, sections: Sequence[str]) -> bool:
+        """Whether name is defined in any of sections."""
+        return any((section, name) in self._definitions for section in sections)
+
+    def uses(self, symbol: AWSSymbol) -> List[Spanning[AWSReference]]:
+        """Return the uses of symbol, in document order."""
+        return self._uses.get((symbol.section, symbol.logical_name), [])
+
+    def located(self, symbol: AWSSymbol) -> bool:
+        """Whether every use of symbol was found in the source text."""
+        return (symbol.section, symbol.logical_name) not in self._unlocated
+
+
+def _anchor(source: SourceText, reference: Spanning[Any]) -> Optional[int]:
+    """Return the character the name of reference starts at on its line."""
+    if not 0 <= reference.line < source.line_count:
+        return None
+    text = source.line(reference.line)
+    name = reference.value.logical_name
+    char = text.find(name, max(reference.char - ANCHOR_SLACK, 0))
+    while 0 <= char <= reference.char + ANCHOR_SLACK:
+        end = char + len(name)
+        if not (char > 0 and text[char - 1].isalnum()) and not (
+            end < len(text) and text[end].isalnum()
+        ):
+            return char
+        char = text.find(name, char + 1)
+    return None
+
+
+def _anchored(
+    source: SourceText, symbol: AWSSymbol, line: int, char: int, span: int
+) -> Symbol:
+    """Return the definition of symbol at the name it defines.
+
+    Keys quoted in yaml have their position at the quote."""
+    definition = Spanning(value=symbol, line=line, char=char, span=span)
+    anchored = _anchor(source, definition)
+    if anchored is None:
+        return definition
+    return Spanning(value=symbol, line=line, char=anchored, span=span)
+
+
+def reference_index(template_data: Tree, text: SourceText) -> ReferenceIndex:
+    """Return the reference index of template_data.
+
+    If template_data is a decoded Template, the index is memoized on it, the
+    template is assumed to have been decoded from text."""
+    if isinstance(template_data, Template):
+        index: Optional[ReferenceIndex] = template_data.lookups.get(ReferenceIndex)
+        if index is None:
+            index = _build(template_data, text)
+            template_data.lookups[ReferenceIndex] = index
+        return index
+    return _build(template_data, text)
+
+
+def _build(template_data: Tree, text: SourceText) -> ReferenceIndex:
+    references = REFERENCE_EXTRACTOR.extract(template_data)
+    return ReferenceIndex(
+        symbol_table(template_data),
+        [
+            Spanning(value=reference, line=line, char=char, span=span)
+            for reference, positions in references.items()
+            for line, char, span in positions
+        ],
+        text,
+    )
+
+
+def _range(span: Spanning[Any]) -> Range:
+    return Range(
+        start=Position(line=span.line, character=span.char),
+        end=Position(line=span.line, character=span.char + span.span),
+    )
+
+
+def _symbol_at(
+    template_data: Tree, document: TextDocument, position: Position
+) -> Optional[Tuple[ReferenceIndex, Symbol]]:
+    index = reference_index(template_data, SourceText.of(document))
+    symbol = index.symbol_at(position.line, position.character)
+    if symbol is None:
+        return None
+    return index, symbol
+
+
+def references(
+    template_data: Tree,
+    document: TextDocument,
+    position: Position,
+    include_declaration: bool = True,
+) -> Optional[List[Location]]:
+    """Return the locations of the uses of the name at position.
+
+    Parameters
+    ----------
+    template_data : Tree
+        The decoded template.
+    document : TextDocument
+        The document template_data was decoded from.
+    position : Position
+        A position of the name, either its definition or one of its uses.
+    include_declaration : bool
+        Whether to include the location of the definition of the name.
+
+    Returns
+    -------
+    Optional[List[Location]]
+        The locations, None if there is no name defined by the template at
+        position."""
+    found = _symbol_at(template_data, document, position)
+    if found is None:
+        return None
+    index, symbol = found
+    uses = index.uses(symbol.value)
+    spans: List[Spanning[Any]] = [symbol] if include_declaration else []
+    spans.extend(uses)
+    return [Location(uri=document.uri, range=_range(span)) for span in spans]
+
+
+def highlights(
+    template_data: Tree, document: TextDocument, position: Position
+) -> Optional[List[DocumentHighlight]]:
+    """Return the highlights of the definition and uses of the name at position."""
+    found = _symbol_at(template_data, document, position)
+    if found is None:
+        return None
+    index, symbol = found
+    uses = index.uses(symbol.value)
+    return [
+        DocumentHighlight(range=_range(symbol), kind=DocumentHighlightKind.Write)
+    ] + [
+        DocumentHighlight(range=_range(use), kind=DocumentHighlightKind.Read)
+        for use in uses
+    ]
+
+
+def rename(
+    template_data: Tree, document: TextDocument, position: Position, new_name: str
+) -> Optional[WorkspaceEdit]:
+    """Return the edit renaming the definition and uses of the name at position.
+
+    Returns
+    -------
+    Optional[WorkspaceEdit]
+        The edit, None if there is no name defined by the template at
+        position, new_name is not a valid logical name or is already defined
+        where the uses of the name could refer to it, or the name has uses
+        which couldn't be located so would be left referring to nothing."""
+    if not new_name.isascii() or not new_name.isalnum():
+        return None
+    found = _symbol_at(template_data, document, position)
+    if found is None:
+        return None
+    index, symbol = found
+    section = symbol.value.section
+    sections = REF_SECTIONS if section in REF_SECTIONS else (section,)
+    if new_name != symbol.value.logical_name and index.defines(new_name, sections):
+        return None
+    if not index.located(symbol.value):
+        return None
+    spans: List[Spanning[Any]] = [symbol, *index.uses(symbol.value)]
+    return WorkspaceEdit(
+        changes={
+            document.uri: [
+                TextEdit(range=_range(span), new_text=new_name) for span in spans
+            ]
+        }
+    )
@@ -11,6 +11,7 @@ from typing import Optional
 import requests
 
 from ..aws_data import AWSSpecification, Tree
+from ..spec_artifact import artifact_path, write_artifact
 from .specification import (
     PARSE_SUCCESS_RATIO_KEY,
     documentation,
@@ -173,4 +174,5 @@ def run(
         aws_context[PARSE_SUCCESS_RATIO_KEY] = round(md_succ / (md_fails + md_succ), 4)
         with open(out_file, "w") as sam_spec_out:
             json.dump(aws_context, sam_spec_out, indent=2)
-    logger.info("Wrote context to %s", out_file)
+        write_artifact(aws_context, artifact_path(out_file), source=out_file)
+    logger.info("Wrote context to %s and %s", out_file, artifact_path(out_file))
@@ -23,6 +23,7 @@ from markdownify import markdownify as md  # type: ignore[import-untyped]
 
 from .. import remove_prefix, remove_suffix
 from ..aws_data import AWSSpecification, Tree
+from ..spec_artifact import artifact_path, write_artifact
 from .with_success_failure_count import WithSuccessFailureCount
 
 ALLOWED_VALUES_PREFIX = "*Allowed values*:"
@@ -236,4 +237,5 @@ def run(
         logger.info("Failed getting markdown: %d/%d", md_fails, md_fails + md_succ)
         with open(out_path, "w") as f_:
             json.dump(ctx_map, f_, indent=2)
-    logger.info("Wrote context to %s", out_path)
+        write_artifact(ctx_map, artifact_path(out_path), source=out_path)
+    logger.info("Wrote context to %s and %s", out_path, artifact_path(out_path))
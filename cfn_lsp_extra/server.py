@@ -4,11 +4,13 @@ https://pygls.readthedocs.io/en/latest/
 https://microsoft.github.io/language-server-protocol/specifications/specification-current/
 """
 
+import asyncio
 import logging
 import os
 import re
 import sys
-from typing import Optional, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Union
 
 from lsprotocol.types import (
     COMPLETION_ITEM_RESOLVE,
@@ -16,9 +18,13 @@ from lsprotocol.types import (
     TEXT_DOCUMENT_COMPLETION,
     TEXT_DOCUMENT_DEFINITION,
     TEXT_DOCUMENT_DID_CHANGE,
+    TEXT_DOCUMENT_DID_CLOSE,
     TEXT_DOCUMENT_DID_OPEN,
     TEXT_DOCUMENT_DID_SAVE,
+    TEXT_DOCUMENT_DOCUMENT_HIGHLIGHT,
     TEXT_DOCUMENT_HOVER,
+    TEXT_DOCUMENT_REFERENCES,
+    TEXT_DOCUMENT_RENAME,
     WORKSPACE_DID_CHANGE_CONFIGURATION,
     CompletionItem,
     CompletionList,
@@ -27,19 +33,25 @@ from lsprotocol.types import (
     DefinitionParams,
     DidChangeConfigurationParams,
     DidChangeTextDocumentParams,
+    DidCloseTextDocumentParams,
     DidOpenTextDocumentParams,
     DidSaveTextDocumentParams,
+    DocumentHighlight,
+    DocumentHighlightParams,
     Hover,
     HoverParams,
     InitializedParams,
     Location,
     PublishDiagnosticsParams,
+    ReferenceParams,
+    RenameParams,
+    WorkspaceEdit,
 )
 from pygls.lsp.server import LanguageServer
-from pygls.workspace import TextDocument
+from pygls.uris import to_fs_path
 
 from .aws_data import AWSContext, AWSPropertyName, AWSResourceName
-from .cfnlint_integration import CFNLINT_VERSION, diagnostics, load_cfnlint_config
+from .cfnlint_integration import CFNLINT_VERSION, load_cfnlint_config
 from .completions import TRIGGER_CHARACTERS, completions_for
 from .completions.resources import resolve_resource_completion_item
 from .config.user_configuration import (
@@ -49,7 +61,7 @@ from .config.user_configuration import (
     from_did_change_config,
     from_get_configuration_response,
 )
-from .decode import CfnDecodingError, decode, decode_unfinished
+from .decode import CfnDecodingError
 from .decode.extractors import (
     AllowedValuesExtractor,
     CompositeExtractor,
@@ -57,28 +69,69 @@ from .decode.extractors import (
     ResourcePropertyExtractor,
 )
 from .definitions import definition
+from .document_state import DocumentState, DocumentStateCache
 from .hovers import hover
+from .index_store import IndexStore
+from .references import highlights, references, rename
+from .workspace_index import WorkspaceIndex
 
 logger = logging.getLogger(__name__)
 
+# A context, or the future of one still loading
+# see context.load_contexts_in_background
+ContextSource = Union[AWSContext, "Future[AWSContext]"]
+# How long in seconds a request waits for a context which is still loading
+CONTEXT_TIMEOUT = 1.0
 
-def server(cfn_aws_context: AWSContext, sam_aws_context: AWSContext) -> LanguageServer:
+
+async def aws_context_of(
+    source: ContextSource, timeout: float = CONTEXT_TIMEOUT
+) -> Optional[AWSContext]:
+    """Return the context of source, waiting at most timeout for it to load.
+
+    Returns
+    -------
+    Optional[AWSContext]
+        The context, None if it's still loading or failed to load."""
+    if isinstance(source, AWSContext):
+        return source
+    if not source.done():
+        await asyncio.wait([asyncio.wrap_future(source)], timeout=timeout)
+        if not source.done():
+            logger.info("Context still loading after %ss", timeout)
+            return None
+    try:
+        return source.result()
+    except Exception as e:
+        logger.error("Failed to load context: %s", e)
+        return None
+
+
+def server(
+    cfn_aws_context: ContextSource, sam_aws_context: ContextSource
+) -> LanguageServer:
     server = LanguageServer("cfn-lsp-extra", "")  # TODO get real version here
     allowed_values_extractor = AllowedValuesExtractor()
     extractor = CompositeExtractor[Union[AWSResourceName, AWSPropertyName]](
         ResourcePropertyExtractor(), ResourceExtractor()
     )
     config = UserConfiguration()
+    documents = DocumentStateCache()
+    # A single worker, so diagnostics of changes are published in order
+    diagnostics_executor = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="cfn-lsp-diagnostics"
+    )
+    workspace_index = WorkspaceIndex(store=IndexStore())
     logger.info("PYTHONPATH: %s", os.environ.get("PYTHONPATH"))
     logger.info("sys.path: %s", sys.path)
     logger.info("cfnlint version: %s", CFNLINT_VERSION)
-    logger.info("Test loading cfnlint configuration...")
-    load_cfnlint_config(log_exceptions=True)
 
     @server.thread()
     @server.feature(INITIALIZED)
     def intialiazed(ls: LanguageServer, params: InitializedParams) -> None:
         """Client initialized notification."""
+        logger.info("Test loading cfnlint configuration...")
+        load_cfnlint_config(log_exceptions=True)
         workspace_capabilities = ls.client_capabilities.workspace
         if workspace_capabilities and workspace_capabilities.configuration:
             logger.info("Obtaining user config")
@@ -92,6 +145,11 @@ def server(cfn_aws_context: AWSContext, sam_aws_context: AWSContext) -> Language
                 nonlocal config
                 config = from_get_configuration_response(config_response)
                 logger.info("Obtained user config: %s", config)
+        folders = [to_fs_path(f.uri) for f in ls.workspace.folders.values()]
+        if not folders and ls.workspace.root_uri:
+            folders = [to_fs_path(ls.workspace.root_uri)]
+        logger.info("Indexing templates in %s", folders)
+        workspace_index.scan(folder for folder in folders if folder)
 
     @server.thread()
     @server.feature(TEXT_DOCUMENT_DID_OPEN)
@@ -99,25 +157,42 @@ def server(cfn_aws_context: AWSContext, sam_aws_context: AWSContext) -> Language
         """Text document did open notification."""
         uri = params.text_document.uri
         text_doc = ls.workspace.get_text_document(uri)
-        logger.debug("Is template SAM: %s", is_document_sam(text_doc))
+        state = documents.get(text_doc)
+        logger.debug("Is template SAM: %s", state.is_sam)
         file_path = text_doc.path
-        ls.text_document_publish_diagnostics(PublishDiagnosticsParams(text_doc.uri, diagnostics(text_doc.source, file_path)))
+        ls.text_document_publish_diagnostics(PublishDiagnosticsParams(text_doc.uri, state.diagnostics(file_path)))
 
-    @server.thread()
     @server.feature(TEXT_DOCUMENT_DID_CHANGE)
     def did_change(ls: LanguageServer, params: DidChangeTextDocumentParams) -> None:
         """Text document did change notification."""
         uri = params.text_document.uri
         text_doc = ls.workspace.get_text_document(uri)
+        # Run on the event loop, so states are updated in the order of changes
+        state = documents.update(
+            text_doc, params.content_changes, params.text_document.version
+        )
         file_path = text_doc.path
         if (
             config.diagnostic_publishing_method
             == DiagnosticPublishingMethod.ON_DID_CHANGE
         ):
             # Publishing diagnostics removes old ones
+            diagnostics_executor.submit(publish_diagnostics, ls, state, uri, file_path)
+
+    def publish_diagnostics(
+        ls: LanguageServer, state: DocumentState, uri: str, file_path: str
+    ) -> None:
+        """Publish the diagnostics of state, unless the document changed since."""
+        if documents.current(uri) is not state:
+            return
+        try:
             ls.text_document_publish_diagnostics(
-                PublishDiagnosticsParams(text_doc.uri, diagnostics(text_doc.source, file_path))
+                PublishDiagnosticsParams(
+                    uri, state.diagnostics(file_path), state.version
+                )
             )
+        except Exception:
+            logger.exception("Failed to publish diagnostics for %s", uri)
 
     @server.thread()
     @server.feature(TEXT_DOCUMENT_DID_SAVE)
@@ -126,30 +201,42 @@ def server(cfn_aws_context: AWSContext, sam_aws_context: AWSContext) -> Language
         uri = params.text_document.uri
         text_doc = ls.workspace.get_text_document(uri)
         file_path = text_doc.path
+        workspace_index.submit(
+            uri, text_doc.source, text_doc.filename or "unknown-file"
+        )
         if (
             config.diagnostic_publishing_method
             == DiagnosticPublishingMethod.ON_DID_SAVE
         ):
+            state = documents.get(text_doc)
             ls.text_document_publish_diagnostics(
-                PublishDiagnosticsParams(text_doc.uri, diagnostics(text_doc.source, file_path))
+                PublishDiagnosticsParams(text_doc.uri, state.diagnostics(file_path))
             )
 
+    @server.feature(TEXT_DOCUMENT_DID_CLOSE)
+    def did_close(ls: LanguageServer, params: DidCloseTextDocumentParams) -> None:
+        """Text document did close notification."""
+        documents.remove(params.text_document.uri)
+
     @server.feature(
         TEXT_DOCUMENT_COMPLETION,
         CompletionOptions(trigger_characters=TRIGGER_CHARACTERS, resolve_provider=True),
     )
-    def completions(
+    async def completions(
         ls: LanguageServer, params: CompletionParams
     ) -> Optional[CompletionList]:
         """Returns completion items."""
         uri = params.text_document.uri
         document = server.workspace.get_text_document(uri)
-        use_sam = is_document_sam(document)
-        aws_context = sam_aws_context if use_sam else cfn_aws_context
+        state = documents.get(document)
+        use_sam = state.is_sam
+        aws_context = await aws_context_of(
+            sam_aws_context if use_sam else cfn_aws_context
+        )
+        if aws_context is None:
+            return None
         try:
-            template_data = decode_unfinished(
-                document.source, document.filename or "unknown-file", params.position
-            )
+            template_data = state.unfinished_tree(params.position)
         except CfnDecodingError as e:
             logger.debug("Failed to decode document: %s", e)
             return None
@@ -160,45 +247,112 @@ def server(cfn_aws_context: AWSContext, sam_aws_context: AWSContext) -> Language
             params.position,
             allowed_values_extractor,
             use_sam,
+            workspace_index,
         )
 
     @server.feature(COMPLETION_ITEM_RESOLVE)
-    def completion_item_resolve(
+    async def completion_item_resolve(
         ls: LanguageServer, completion_item: CompletionItem
     ) -> CompletionItem:
         """Resolves a completion item."""
         if re.match(r"^.+::.+::.+$", completion_item.label):
-            return resolve_resource_completion_item(completion_item, cfn_aws_context)
+            aws_context = await aws_context_of(cfn_aws_context)
+            if aws_context is not None:
+                return resolve_resource_completion_item(completion_item, aws_context)
         return completion_item  # Not a resource
 
     @server.feature(TEXT_DOCUMENT_HOVER)
-    def did_hover(ls: LanguageServer, params: HoverParams) -> Optional[Hover]:
+    async def did_hover(ls: LanguageServer, params: HoverParams) -> Optional[Hover]:
         """Text document did hover notification."""
         uri = params.text_document.uri
         document = server.workspace.get_text_document(uri)
-        aws_context = sam_aws_context if is_document_sam(document) else cfn_aws_context
+        state = documents.get(document)
+        aws_context = await aws_context_of(
+            sam_aws_context if state.is_sam else cfn_aws_context
+        )
+        if aws_context is None:
+            return None
         try:
-            template_data = decode(document.source, document.filename or "unknown-file")
+            template_data = state.tree()
+            position = params.position
+            position_lookup = extractor.extract(
+                template_data, (position.line, position.character)
+            )
+            return hover(
+                template_data,
+                position,
+                aws_context,
+                document,
+                position_lookup,
+                workspace_index,
+            )
         except CfnDecodingError as e:
             logger.debug("Failed to decode document: %s", e)
             return None
-        position_lookup = extractor.extract(template_data)
-        return hover(
-            template_data, params.position, aws_context, document, position_lookup
-        )
 
     @server.feature(TEXT_DOCUMENT_DEFINITION)
-    def goto_definition(
+    async def goto_definition(
         ls: LanguageServer, params: DefinitionParams
     ) -> Optional[Location]:
         document = server.workspace.get_text_document(params.text_document.uri)
-        aws_context = sam_aws_context if is_document_sam(document) else cfn_aws_context
+        state = documents.get(document)
+        aws_context = await aws_context_of(
+            sam_aws_context if state.is_sam else cfn_aws_context
+        )
+        if aws_context is None:
+            return None
         try:
-            template_data = decode(document.source, document.filename or "unknown-file")
+            template_data = state.tree()
+            return definition(
+                template_data, document, params.position, aws_context, workspace_index
+            )
+        except CfnDecodingError as e:
+            logger.debug("Failed to decode document: %s", e)
+            return None
+
+    @server.feature(TEXT_DOCUMENT_REFERENCES)
+    def find_references(
+        ls: LanguageServer, params: ReferenceParams
+    ) -> Optional[List[Location]]:
+        document = server.workspace.get_text_document(params.text_document.uri)
+        state = documents.get(document)
+        try:
+            template_data = state.tree()
+            return references(
+                template_data,
+                document,
+                params.position,
+                params.context.include_declaration,
+            )
+        except CfnDecodingError as e:
+            logger.debug("Failed to decode document: %s", e)
+            return None
+
+    @server.feature(TEXT_DOCUMENT_DOCUMENT_HIGHLIGHT)
+    def document_highlight(
+        ls: LanguageServer, params: DocumentHighlightParams
+    ) -> Optional[List[DocumentHighlight]]:
+        document = server.workspace.get_text_document(params.text_document.uri)
+        state = documents.get(document)
+        try:
+            template_data = state.tree()
+            return highlights(template_data, document, params.position)
+        except CfnDecodingError as e:
+            logger.debug("Failed to decode document: %s", e)
+            return None
+
+    @server.feature(TEXT_DOCUMENT_RENAME)
+    def rename_symbol(
+        ls: LanguageServer, params: RenameParams
+    ) -> Optional[WorkspaceEdit]:
+        document = server.workspace.get_text_document(params.text_document.uri)
+        state = documents.get(document)
+        try:
+            template_data = state.tree()
+            return rename(template_data, document, params.position, params.new_name)
         except CfnDecodingError as e:
             logger.debug("Failed to decode document: %s", e)
             return None
-        return definition(template_data, document, params.position, aws_context)
 
     @server.feature(WORKSPACE_DID_CHANGE_CONFIGURATION)
     def did_change_configuration(
@@ -211,15 +365,3 @@ def server(cfn_aws_context: AWSContext, sam_aws_context: AWSContext) -> Language
 
     return server
 
-
-def is_document_sam(document: TextDocument) -> bool:
-    for line in document.lines:
-        line_stripped = line.strip()
-        if not line_stripped.startswith("#") and not line_stripped.startswith("{"):
-            return (
-                line_stripped == "Transform: AWS::Serverless-2016-10-31"
-                or line_stripped.replace(" ", "").startswith(
-                    '"Transform":"AWS::Serverless-2016-10-31"'
-                )
-            )
-    return False
@@ -0,0 +1,117 @@
+"""
+An immutable snapshot of a document's content.
+
+The line structure of a document is needed when decoding it, when patching
+the line at the cursor for completions and when finding the word at the
+cursor, so it's computed once per document version and shared.
+"""
+from __future__ import annotations
+
+import bisect
+import re
+from itertools import accumulate
+from threading import Lock
+from typing import List, Tuple, Union
+from weakref import WeakKeyDictionary
+
+from pygls.workspace import TextDocument
+
+# Line breaks as defined by the LSP specification
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+class SourceText:
+    """The content of a document and the offsets of the starts of its lines.
+
+    Lines are separated by any of '\\n', '\\r\\n' or '\\r', so a text ending
+    in a line break ends with an empty line.
+
+    Attributes
+    ----------
+    text : str
+        The content of the document.
+    line_starts : List[int]
+        The offset of the start of each line in text, followed by
+        len(text) + 1 as if text ended with a line break."""
+
+    __slots__ = ("text", "line_starts")
+
+    _cache: WeakKeyDictionary[TextDocument, SourceText] = WeakKeyDictionary()
+    _cache_lock = Lock()
+
+    def __init__(self, text: str, line_starts: Union[List[int], None] = None):
+        self.text = text
+        if line_starts is None:
+            if "\r" in text:
+                line_starts = [0] + [m.end() for m in LINE_BREAK.finditer(text)]
+                line_starts.append(len(text) + 1)
+            else:
+                line_starts = list(
+                    accumulate((len(line) + 1 for line in text.split("\n")), initial=0)
+                )
+        self.line_starts = line_starts
+
+    @classmethod
+    def of(cls, document: TextDocument) -> SourceText:
+        """Return the SourceText of the current content of document.
+
+        The result is cached until the content of document changes."""
+        source = document.source
+        with cls._cache_lock:
+            cached = cls._cache.get(document)
+            if cached is None or cached.text is not source:
+                cached = cls._cache[document] = cls(source)
+            return cached
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_starts) - 1
+
+    def line(self, line: int) -> str:
+        """Return the content of line, without its line break.
+
+        Raises
+        ------
+        IndexError
+            If line is not a line of the text."""
+        if not 0 <= line < self.line_count:
+            raise IndexError(line)
+        start, end = self.line_starts[line], self.line_starts[line + 1] - 1
+        if end > start and self.text[end - 1 : end + 1] == "\r\n":
+            end -= 1
+        return self.text[start:end]
+
+    def offset_at(self, line: int, char: int) -> int:
+        """Return the offset in text of char on line."""
+        return self.line_starts[line] + char
+
+    def position_at(self, offset: int) -> Tuple[int, int]:
+        """Return the line and character of offset in text."""
+        line = bisect.bisect_right(self.line_starts, offset) - 1
+        return line, offset - self.line_starts[line]
+
+    def with_line(self, line: int, content: str) -> SourceText:
+        """Return a SourceText with line replaced by content.
+
+        Only the offsets of the lines after line are recomputed, rather
+        than those of the whole text.
+
+        Raises
+        ------
+        IndexError
+            If line is not a line of the text."""
+        old = self.line(line)
+        start = self.line_starts[line]
+        text = self.text[:start] + content + self.text[start + len(old) :]
+        if LINE_BREAK.search(content):
+            return SourceText(text)
+        delta = len(content) - len(old)
+        starts = self.line_starts
+        return SourceText(
+            text, starts[: line + 1] + [s + delta for s in starts[line + 1 :]]
+        )
+
+
+def as_source_text(source: Union[str, SourceText]) -> SourceText:
+    """Return source as a SourceText."""
+    return source if isinstance(source, SourceText) else SourceText(source)
@@ -0,0 +1,284 @@
+"""
+An indexed binary form of a specification, decoded lazily from a memory map.
+
+Alongside each json specification update-specification writes an artifact
+with the same stem and the suffix ".spec":
+
+    MAGIC | header length (uint32 le) | header (json) | records | documentation
+
+The header gives the offset and length of the record of each resource and
+property type, the values of the other top level keys, and the size and
+crc32 of the json specification the artifact was written from, so an
+artifact isn't used once its specification has changed. Each record is
+the compact json of a single type. Opening an artifact only reads its
+header, a type is decoded the first time it's looked up, and since the
+records are read through a read only memory map, server processes share
+the pages of the artifact rather than each holding a copy of the spec.
+
+Documentation, i.e. markdown, Ref return values and urls, is most of the
+bytes of a spec and is kept out of the records: each text is replaced by
+the id of an entry of the documentation store, a table of (offset, length)
+pairs of utf-8 entries, which is only read when documentation is shown.
+Entries aren't compressed: it saves about a third of their size, which
+being mapped isn't resident anyway, for over a second of compile time.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .aws_data import AWSSpecification, Tree
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CFNSPEC\x04"
+ARTIFACT_SUFFIX = ".spec"
+HEADER = struct.Struct("<8sI")
+DOCUMENTATION_ENTRY = struct.Struct("<II")
+
+
+def source_digest(path: Path) -> int:
+    """Return the digest of the json specification at path."""
+    return zlib.crc32(path.read_bytes())
+
+
+def artifact_path(spec_path: Path) -> Path:
+    """Return the path of the artifact of the json specification at spec_path."""
+    return spec_path.with_suffix(ARTIFACT_SUFFIX)
+
+
+class LazySection(Mapping[str, Tree]):
+    """A top level section of an artifact, e.g. ResourceTypes.
+
+    Types are decoded from their records on first lookup, and kept."""
+
+    def __init__(self, buffer: mmap.mmap, index: Dict[str, List[int]]):
+        self._buffer = buffer
+        self._index = index
+        self._decoded: Dict[str, Tree] = {}
+
+    def __getitem__(self, key: str) -> Tree:
+        tree = self._decoded.get(key)
+        if tree is None:
+            start, length = self._index[key]
+            tree = self._decoded[key] = json.loads(self._buffer[start : start + length])
+        return tree
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class DocumentationStore(Mapping[int, str]):
+    """The documentation of an artifact, by id.
+
+    Entries are decoded on each lookup, see AWSContext for caching."""
+
+    def __init__(self, buffer: mmap.mmap, start: int, table: int, count: int):
+        self._buffer = buffer
+        self._start = start
+        self._table = table
+        self._count = count
+
+    def __getitem__(self, doc_id: int) -> str:
+        if not 0 <= doc_id < self._count:
+            raise KeyError(doc_id)
+        offset, length = DOCUMENTATION_ENTRY.unpack_from(
+            self._buffer, self._table + doc_id * DOCUMENTATION_ENTRY.size
+        )
+        start = self._start + offset
+        return self._buffer[start : start + length].decode()
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self._count))
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SpecArtifact(Mapping[str, Any]):
+    """A specification read from an artifact.
+
+    Attributes
+    ----------
+    path : Path
+        The path of the artifact.
+    source_size : Optional[int]
+        The size of the json specification the artifact was written from.
+    source_digest : Optional[int]
+        The digest of the json specification the artifact was written from.
+    documentation : DocumentationStore
+        The documentation the records of the artifact refer to."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            # The map stays valid once the file is closed
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._buffer) < HEADER.size:
+            raise ValueError(f"{path} is not a specification artifact")
+        magic, header_length = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a specification artifact")
+        header_end = HEADER.size + header_length
+        header = json.loads(self._buffer[HEADER.size : header_end])
+        self.source_size: Optional[int] = header["source_size"]
+        self.source_digest: Optional[int] = header["source_digest"]
+        table, count = header["documentation"]
+        self.documentation = DocumentationStore(
+            self._buffer, header_end, header_end + table, count
+        )
+        self._items: Dict[str, Any] = dict(header["values"])
+        for section, index in header["sections"].items():
+            self._items[section] = LazySection(
+                self._buffer,
+                {
+                    key: [header_end + start, length]
+                    for key, (start, length) in index.items()
+                },
+            )
+
+    def __getitem__(self, key: str) -> Any:
+        return self._items[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def write_artifact(
+    spec: Tree,
+    path: Path,
+    source: Optional[Path] = None,
+    documentation: Optional[Mapping[int, str]] = None,
+) -> None:
+    """Write the artifact of spec to path.
+
+    Parameters
+    ----------
+    spec : Tree
+        The specification, as written to source.
+    path : Path
+        The path to write the artifact to, it is replaced atomically so
+        processes mapping the previous artifact are unaffected.
+    source : Optional[Path]
+        The json specification, if given the artifact is only used while
+        source has the size and content it has now.
+    documentation : Optional[Mapping[int, str]]
+        The documentation the ids of spec refer to, if spec is, or is
+        derived from, another artifact."""
+    sections: Dict[str, Dict[str, Tuple[int, int]]] = {}
+    values: Dict[str, Any] = {}
+    records: List[bytes] = []
+    texts: Dict[str, int] = {}
+    offset = 0
+    for key, value in spec.items():
+        if not (
+            isinstance(value, Mapping)
+            and all(isinstance(v, Mapping) for v in value.values())
+        ):
+            values[key] = value
+            continue
+        index = sections[key] = {}
+        for name, tree in value.items():
+            structure = _split_documentation(tree, texts, documentation)
+            record = json.dumps(structure, separators=(",", ":")).encode()
+            index[name] = (offset, len(record))
+            records.append(record)
+            offset += len(record)
+    table = offset
+    offset += DOCUMENTATION_ENTRY.size * len(texts)
+    entries = [text.encode() for text in texts]
+    for entry in entries:
+        records.append(DOCUMENTATION_ENTRY.pack(offset, len(entry)))
+        offset += len(entry)
+    records.extend(entries)
+    header = json.dumps(
+        {
+            "source_size": source.stat().st_size if source else None,
+            "source_digest": source_digest(source) if source else None,
+            "values": values,
+            "sections": sections,
+            "documentation": [table, len(texts)],
+        },
+        separators=(",", ":"),
+    ).encode()
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        f.writelines(records)
+    os.replace(tmp_path, path)
+
+
+_DOCUMENTATION_IDS = {
+    field + AWSSpecification.ID_SUFFIX: field
+    for field in AWSSpecification.DOCUMENTATION_FIELDS
+}
+
+
+def _split_documentation(
+    tree: Tree, texts: Dict[str, int], documentation: Optional[Mapping[int, str]]
+) -> Tree:
+    """Return tree with its documentation replaced by ids of texts.
+
+    Equal texts share an id. Ids of documentation in tree are replaced by
+    ids of their texts, unless tree also gives the text inline."""
+    if isinstance(tree, list):
+        return [_split_documentation(item, texts, documentation) for item in tree]
+    if not isinstance(tree, (dict, Mapping)):  # dict first as it's quicker
+        return tree
+    structure = {}
+    for key, value in tree.items():
+        field = _DOCUMENTATION_IDS.get(key)
+        if field is not None and documentation is not None:
+            if field in tree or value not in documentation:
+                continue
+            key, value = field, documentation[value]
+        if key in AWSSpecification.DOCUMENTATION_FIELDS and isinstance(value, str):
+            doc_id = texts.setdefault(value, len(texts))
+            structure[key + AWSSpecification.ID_SUFFIX] = doc_id
+        else:
+            structure[key] = _split_documentation(value, texts, documentation)
+    return structure
+
+
+def open_artifact(spec_path: Path) -> Optional[SpecArtifact]:
+    """Return the artifact of the json specification at spec_path.
+
+    Returns
+    -------
+    Optional[SpecArtifact]
+        The artifact, None if there is none, it can't be read, or it was
+        written from a json specification other than that at spec_path."""
+    path = artifact_path(spec_path)
+    if not path.exists():
+        return None
+    try:
+        artifact = SpecArtifact(path)
+        if (
+            artifact.source_size is not None
+            and spec_path.exists()
+            # The size is compared first as it's cheaper
+            and (
+                spec_path.stat().st_size != artifact.source_size
+                or source_digest(spec_path) != artifact.source_digest
+            )
+        ):
+            logger.info("Ignoring stale specification artifact %s", path)
+            return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Failed to read specification artifact %s: %s", path, e)
+        return None
+    return artifact
@@ -0,0 +1,96 @@
+"""
+The names defined by a template, e.g. its resources and parameters.
+
+A template's symbol table is built once per decoded template, so resolving
+a Ref or GetAtt is a dict lookup rather than a search of everything the
+template defines.
+"""
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from .aws_data import AWSRefSource, AWSSymbol, Tree
+from .decode import Template
+from .decode.extractors import SymbolExtractor
+from .decode.position import Spanning, SpanTable
+
+SYMBOL_EXTRACTOR = SymbolExtractor()
+# The sections defining what Refs refer to, resources taking precedence
+REF_SECTIONS = ("Resources", "Parameters")
+# GetAtts only refer to resources
+GET_ATT_SECTIONS = ("Resources",)
+
+
+class SymbolTable:
+    """The names defined by a template, by section.
+
+    Attributes
+    ----------
+    spans : SpanTable[AWSSymbol]
+        The positions of the definitions of the template."""
+
+    def __init__(self, spans: SpanTable[AWSSymbol]):
+        self.spans = spans
+        self._sections: Dict[str, Dict[str, Spanning[AWSSymbol]]] = {}
+        for symbol, positions in spans.items():
+            line, char, span = positions[0]
+            self._sections.setdefault(symbol.section, {}).setdefault(
+                symbol.logical_name,
+                Spanning(value=symbol, line=line, char=char, span=span),
+            )
+
+    def section(self, section: str) -> Mapping[str, Spanning[AWSSymbol]]:
+        """Return the definitions of section, by name in document order."""
+        return self._sections.get(section, {})
+
+    def get(self, section: str, name: str) -> Optional[Spanning[AWSSymbol]]:
+        """Return the definition of name in section, if there is one."""
+        return self.section(section).get(name)
+
+    def ref_source(
+        self, name: str, sections: Sequence[str] = REF_SECTIONS
+    ) -> Optional[Spanning[AWSRefSource]]:
+        """Return what a Ref of name refers to and its position.
+
+        Parameters
+        ----------
+        name : str
+            The name refered to.
+        sections : Sequence[str]
+            The sections name may be defined in, earlier sections taking
+            precedence.
+
+        Returns
+        -------
+        Optional[Spanning[AWSRefSource]]
+            The source of name, if it is defined."""
+        for section in sections:
+            definition = self.get(section, name)
+            if definition is not None and definition.value.source is not None:
+                return Spanning(
+                    value=definition.value.source,
+                    line=definition.line,
+                    char=definition.char,
+                    span=definition.span,
+                )
+        return None
+
+    def ref_sources(self, sections: Sequence[str] = REF_SECTIONS) -> List[AWSRefSource]:
+        """Return what Refs may refer to, in order of sections."""
+        return [
+            definition.value.source
+            for section in sections
+            for definition in self.section(section).values()
+            if definition.value.source is not None
+        ]
+
+
+def symbol_table(template_data: Tree) -> SymbolTable:
+    """Return the symbol table of template_data.
+
+    If template_data is a decoded Template, the table is memoized on it."""
+    if isinstance(template_data, Template):
+        table: Optional[SymbolTable] = template_data.lookups.get(SymbolTable)
+        if table is None:
+            table = SymbolTable(SYMBOL_EXTRACTOR.extract(template_data))
+            template_data.lookups[SymbolTable] = table
+        return table
+    return SymbolTable(SYMBOL_EXTRACTOR.extract(template_data))
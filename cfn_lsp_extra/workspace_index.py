@@ -0,0 +1,411 @@
+"""
+An index of the templates in the workspace, e.g. for Fn::ImportValue.
+
+Templates are found and decoded in the background by a small pool of
+workers, and summarised by what other templates may use of them, so
+features working across templates never decode other files while serving
+a request.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from attrs import frozen
+from lsprotocol.types import Position
+from pygls.uris import from_fs_path
+
+from .aws_data import AWSExport, AWSLogicalId, AWSRefName, Tree
+from .decode import CfnDecodingError, decode
+from .decode.extractors import KeyExtractor
+from .decode.nodes import key_span, value_span
+from .decode.position import Spanning
+from .index_store import IndexStore, StoredFile
+from .symbols import symbol_table
+
+logger = logging.getLogger(__name__)
+
+IMPORT_VALUE_EXTRACTOR = KeyExtractor[AWSRefName](
+    "Fn::ImportValue", lambda s: AWSRefName(value=s)
+)
+TEMPLATE_SUFFIXES = (".yaml", ".yml", ".json", ".template")
+# Directories never holding templates worth indexing
+IGNORED_DIRECTORIES = frozenset({"node_modules", "__pycache__"})
+# Larger files are very unlikely to be hand written templates
+MAX_TEMPLATE_BYTES = 2_000_000
+MAX_WORKERS = 2
+
+
+@frozen
+class TemplateSummary:
+    """What other templates may use of a template.
+
+    Attributes
+    ----------
+    uri : str
+        The uri of the template.
+    exports : Tuple[Spanning[AWSExport], ...]
+        The exports of the template and the positions of their names.
+    resources : Tuple[AWSLogicalId, ...]
+        The resources of the template."""
+
+    uri: str
+    exports: Tuple[Spanning[AWSExport], ...]
+    resources: Tuple[AWSLogicalId, ...]
+
+    @classmethod
+    def of(cls, template_data: Tree, uri: str) -> "TemplateSummary":
+        symbols = symbol_table(template_data)
+        resources = tuple(
+            definition.value.source
+            for definition in symbols.section("Resources").values()
+            if isinstance(definition.value.source, AWSLogicalId)
+        )
+        outputs = template_data.get("Outputs", None)
+        exports = (
+            tuple(_exports(outputs, uri, {r.logical_name: r for r in resources}))
+            if isinstance(outputs, dict)
+            else ()
+        )
+        return cls(uri=uri, exports=exports, resources=resources)
+
+    def to_data(self) -> Dict[str, Any]:
+        """Return the summary as json serialisable data, less its uri."""
+        return {
+            "exports": [
+                [
+                    e.value.name,
+                    e.value.output,
+                    e.value.is_sub,
+                    e.value.description,
+                    e.value.resource and _resource_data(e.value.resource),
+                    e.line,
+                    e.char,
+                    e.span,
+                ]
+                for e in self.exports
+            ],
+            "resources": [_resource_data(r) for r in self.resources],
+        }
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], uri: str) -> "TemplateSummary":
+        """Return the summary of the template at uri given by to_data."""
+        exports = tuple(
+            Spanning(
+                value=AWSExport(
+                    name=name,
+                    output=output,
+                    uri=uri,
+                    is_sub=is_sub,
+                    description=description,
+                    resource=resource and AWSLogicalId(*resource),
+                ),
+                line=line,
+                char=char,
+                span=span,
+            )
+            for name, output, is_sub, description, resource, line, char, span in data[
+                "exports"
+            ]
+        )
+        resources = tuple(AWSLogicalId(*r) for r in data["resources"])
+        return cls(uri=uri, exports=exports, resources=resources)
+
+
+def _resource_data(resource: AWSLogicalId) -> List[Optional[str]]:
+    return [resource.logical_name, resource.type_]
+
+
+def _exports(
+    outputs: Dict[str, Any], uri: str, resources: Dict[str, AWSLogicalId]
+) -> Iterator[Spanning[AWSExport]]:
+    for output, content in outputs.items():
+        export = content.get("Export", None) if isinstance(content, dict) else None
+        if not isinstance(export, dict):
+            continue
+        name, span = export.get("Name", None), value_span(export, "Name")
+        is_sub = isinstance(name, dict) and isinstance(name.get("Fn::Sub"), str)
+        if isinstance(name, dict) and is_sub:
+            name, span = name["Fn::Sub"], value_span(name, "Fn::Sub")
+        if not isinstance(name, str):
+            continue
+        span = span or key_span(outputs, output)
+        if span is None:
+            continue
+        description = content.get("Description", None)
+        yield Spanning(
+            value=AWSExport(
+                name=name,
+                output=output,
+                uri=uri,
+                is_sub=is_sub,
+                description=description if isinstance(description, str) else None,
+                resource=resources.get(_value_resource(content.get("Value"))),
+            ),
+            line=span.line,
+            char=span.char,
+            span=len(name),
+        )
+
+
+def _value_resource(value: Any) -> str:
+    """Return the logical id the value of an output refers to, if any."""
+    if isinstance(value, dict):
+        if isinstance(value.get("Ref"), str):
+            return value["Ref"]  # type: ignore[no-any-return]
+        att = value.get("Fn::GetAtt")
+        if isinstance(att, list) and att:
+            return str(att[0])
+        if isinstance(att, str):
+            return att.split(".")[0]
+    return ""
+
+
+def summarize(source: str, filename: str, uri: str) -> Optional[TemplateSummary]:
+    """Return the summary of source, None if it isn't a template.
+
+    Raises
+    ------
+    CfnDecodingError
+        If source could not be decoded."""
+    template_data = decode(source, filename)
+    if not isinstance(template_data, dict) or "Resources" not in template_data:
+        return None
+    return TemplateSummary.of(template_data, uri)
+
+
+def template_paths(folder: str) -> Iterator[Path]:
+    """Return the paths of the files in folder which may be templates."""
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [
+            d for d in dirs if not d.startswith(".") and d not in IGNORED_DIRECTORIES
+        ]
+        for file_name in files:
+            if file_name.endswith(TEMPLATE_SUFFIXES):
+                yield Path(root, file_name)
+
+
+def _summarize(source: str, filename: str, uri: str) -> Optional[TemplateSummary]:
+    """Return the summary of source if it looks like a template.
+
+    Raises
+    ------
+    CfnDecodingError
+        If source looks like a template but could not be summarised."""
+    if "Resources" not in source or (
+        "AWSTemplateFormatVersion" not in source and "AWS::" not in source
+    ):
+        return None
+    try:
+        return summarize(source, filename, uri)
+    except CfnDecodingError:
+        raise
+    except Exception as e:  # Never let a bad file stop indexing
+        logger.exception("Failed to index %s", uri)
+        raise CfnDecodingError(f"Error summarising {uri}") from e
+
+
+class WorkspaceIndex:
+    """A thread safe index of the templates of a workspace.
+
+    Templates are summarised by a bounded pool of worker threads, so
+    indexing never competes with more than a couple of request threads."""
+
+    def __init__(
+        self, max_workers: int = MAX_WORKERS, store: Optional[IndexStore] = None
+    ) -> None:
+        self._summaries: Dict[str, TemplateSummary] = {}
+        self._exports: Dict[str, Dict[str, Spanning[AWSExport]]] = {}
+        self._sub_exports: Dict[str, List[Spanning[AWSExport]]] = {}
+        self._lock = Lock()
+        self._max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.store = store
+
+    def _submit(self, fn: Any, *args: Any) -> "Future[None]":
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="cfn-lsp-index",
+                )
+            return self._executor.submit(fn, *args)
+
+    def scan(self, folders: Iterable[str]) -> List["Future[None]"]:
+        """Index the templates in folders in the background.
+
+        Files are only decoded if they changed since they were last stored,
+        and what is stored of files no longer in folders is forgotten.
+
+        Returns
+        -------
+        List[Future[None]]
+            The futures of indexing each file which may be a template."""
+        futures: List["Future[None]"] = []
+        for folder in folders:
+            paths = list(template_paths(folder))
+            if self.store is not None:
+                self.store.retain(folder, map(str, paths))
+            futures.extend(self._submit(self.index_file, path) for path in paths)
+        return futures
+
+    def submit(self, uri: str, source: str, filename: str) -> "Future[None]":
+        """Index the content of the template at uri in the background."""
+        return self._submit(self.index_source, uri, source, filename)
+
+    def index_file(self, path: Path) -> None:
+        """Index the template at path, if it is one."""
+        uri = from_fs_path(str(path)) or str(path)
+        stored = self.store.get(str(path)) if self.store is not None else None
+        try:
+            stat = path.stat()
+            if stat.st_size > MAX_TEMPLATE_BYTES:
+                # Forget the template the file may have been before growing
+                if self.store is not None:
+                    self.store.remove(str(path))
+                self._apply(uri, None)
+                return
+            if (
+                stored is not None
+                and stored.mtime_ns == stat.st_mtime_ns
+                and stored.size == stat.st_size
+            ):
+                self._apply(uri, stored.summary)
+                return
+            content = path.read_bytes()
+        except OSError as e:
+            logger.debug("Failed to read %s: %s", path, e)
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        if stored is not None and stored.digest == digest:
+            summary_data = stored.summary
+        else:
+            try:
+                summary = _summarize(content.decode("utf-8"), path.name, uri)
+            except (CfnDecodingError, UnicodeDecodeError) as e:
+                logger.debug("Failed to decode %s: %s", path, e)
+                return  # Keep what was known of the template
+            summary_data = summary.to_data() if summary else None
+        if self.store is not None:
+            self.store.put(
+                str(path),
+                StoredFile(
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size,
+                    digest=digest,
+                    summary=summary_data,
+                ),
+            )
+        self._apply(uri, summary_data)
+
+    def _apply(self, uri: str, summary_data: Optional[Dict[str, Any]]) -> None:
+        if summary_data is None:
+            self.remove(uri)
+        else:
+            self.update(TemplateSummary.from_data(summary_data, uri))
+
+    def index_source(self, uri: str, source: str, filename: str) -> None:
+        """Index the content of the template at uri."""
+        try:
+            summary = _summarize(source, filename, uri)
+        except CfnDecodingError as e:
+            logger.debug("Failed to decode %s: %s", uri, e)
+            return  # Keep what was known of the template
+        if summary is None:
+            self.remove(uri)
+        else:
+            self.update(summary)
+
+    def update(self, summary: TemplateSummary) -> None:
+        """Replace what is known of the template of summary with it."""
+        with self._lock:
+            self._remove(summary.uri)
+            self._summaries[summary.uri] = summary
+            for export in summary.exports:
+                if export.value.is_sub:
+                    self._sub_exports.setdefault(summary.uri, []).append(export)
+                else:
+                    self._exports.setdefault(export.value.name, {})[
+                        summary.uri
+                    ] = export
+
+    def remove(self, uri: str) -> None:
+        """Forget the template at uri."""
+        with self._lock:
+            self._remove(uri)
+
+    def _remove(self, uri: str) -> None:
+        summary = self._summaries.pop(uri, None)
+        if summary is None:
+            return
+        self._sub_exports.pop(uri, None)
+        for export in summary.exports:
+            by_uri = self._exports.get(export.value.name, {})
+            by_uri.pop(uri, None)
+            if not by_uri:
+                self._exports.pop(export.value.name, None)
+
+    def export(self, name: str, excluding: str = "") -> Optional[Spanning[AWSExport]]:
+        """Return the export named name and its position, if there is one.
+
+        Parameters
+        ----------
+        name : str
+            The name of the export.
+        excluding : str
+            The uri of a template whose exports to ignore, e.g. the template
+            importing name, since stacks can't import their own exports."""
+        with self._lock:
+            for uri, export in self._exports.get(name, {}).items():
+                if uri != excluding:
+                    return export
+            for uri, exports in self._sub_exports.items():
+                if uri != excluding:
+                    for export in exports:
+                        if export.value.matches(name):
+                            return export
+        return None
+
+    def exports(self, excluding: str = "") -> List[AWSExport]:
+        """Return the exports with literal names, excluding those of a template."""
+        with self._lock:
+            return [
+                export.value
+                for by_uri in self._exports.values()
+                for uri, export in by_uri.items()
+                if uri != excluding
+            ]
+
+    def summary(self, uri: str) -> Optional[TemplateSummary]:
+        with self._lock:
+            return self._summaries.get(uri)
+
+    def resource_types(self) -> Set[str]:
+        """Return the types of the resources of the templates of the workspace."""
+        with self._lock:
+            return {
+                resource.type_
+                for summary in self._summaries.values()
+                for resource in summary.resources
+                if resource.type_
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self.store is not None:
+            self.store.close()
+
+
+def import_at(template_data: Tree, position: Position) -> Optional[Spanning[AWSRefName]]:
+    """Return the name imported by a Fn::ImportValue at position, if any."""
+    lookup = IMPORT_VALUE_EXTRACTOR.extract(
+        template_data, (position.line, position.character)
+    )
+    return lookup.at(position.line, position.character)
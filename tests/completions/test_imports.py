@@ -0,0 +1,44 @@
+"""
+Tests for !ImportValue completions.
+"""
+import pytest
+from lsprotocol.types import Position
+from pygls.workspace import TextDocument
+
+from cfn_lsp_extra.completions.imports import import_value_completions
+from cfn_lsp_extra.decode import decode_unfinished
+from cfn_lsp_extra.workspace_index import WorkspaceIndex, summarize
+
+from ..test_workspace_index import NETWORK, NETWORK_URI
+
+APP_PREFIX = """AWSTemplateFormatVersion: "2010-09-09"
+Resources:
+  Sg:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+"""
+
+
+@pytest.mark.parametrize(
+    "line,typed",
+    [
+        ("      VpcId: !ImportValue ", ""),
+        ("      VpcId: !ImportValue netw", "netw"),
+        ("      VpcId: !ImportValue network-Vp", "network-Vp"),
+        ("      VpcId:\n        Fn::ImportValue: ", ""),
+    ],
+)
+def test_import_value_completions(line, typed):
+    index = WorkspaceIndex()
+    index.update(summarize(NETWORK, "network.yaml", NETWORK_URI))
+    source = APP_PREFIX + line + "\n"
+    document = TextDocument(uri="file:///app.yaml", source=source)
+    last_line = line.split("\n")[-1]
+    position = Position(line=source.count("\n") - 1, character=len(last_line))
+    template_data = decode_unfinished(source, "app.yaml", position)
+    result = import_value_completions(template_data, document, position, index)
+    assert [item.label for item in result.items] == ["network-VpcId"]
+    edit = result.items[0].text_edit
+    assert edit.range.end == position
+    assert edit.new_text == "network-VpcId"
+    assert edit.range.start.character == position.character - len(typed)
@@ -9,10 +9,8 @@ from cfn_lsp_extra.decode import CfnDecodingError
 from cfn_lsp_extra.decode import decode
 from cfn_lsp_extra.decode import decode_unfinished
 from cfn_lsp_extra.decode.extractors import RecursiveExtractor
-from cfn_lsp_extra.decode.extractors import remove_prefix
 from cfn_lsp_extra.decode.position import PositionLookup
 from cfn_lsp_extra.decode.position import Spanning
-from cfn_lsp_extra.decode.yaml_decoding import POSITION_PREFIX
 
 from .test_json_decoding import json_string
 from .test_yaml_decoding import yaml_string
@@ -23,11 +21,8 @@ def extractor():
     class TestExtractor(RecursiveExtractor[str]):
         def extract_node(self, node):
             spans = []
-            for key, value in node.items():
-                if key.startswith(POSITION_PREFIX):
-                    name = remove_prefix(key, POSITION_PREFIX)
-                    line, char = value
-                    spans.append(Spanning(value=name, line=line, char=char, span=1))
+            for name, (line, char, _, _) in node.key_spans.items():
+                spans.append(Spanning(value=name, line=line, char=char, span=1))
             return spans
 
     return TestExtractor()
@@ -104,6 +99,14 @@ def test_decode_for_invalid_yaml(extractor):
         decode(invalid_yaml, "f.yaml")
 
 
+def test_decode_lazy_for_yaml(extractor, yaml_string):
+    result = decode(yaml_string, "f.yaml", lazy=True)
+    assert result == decode(yaml_string, "f.yaml")
+    assert extractor.extract(result) == extractor.extract(decode(yaml_string, "f.yaml"))
+    with pytest.raises(CfnDecodingError):
+        decode("foo: {bar", "f.yaml", lazy=True)
+
+
 def test_decode_unfinished_for_json(extractor, json_string):
     result = decode_unfinished(json_string, "f.json", Position(line=6, character=0))
     assert "AWSTemplateFormatVersion" in result
@@ -208,3 +211,23 @@ Resources:
       VpcId: !Ref DefaultVpcId
       VpcId: !"""
     decode(doc, "f.yaml")
+
+
+def test_decode_memoizes_extracted_lookups(extractor, yaml_string):
+    result = decode(yaml_string, "f.yaml")
+    assert extractor.extract(result) is extractor.extract(result)
+
+
+def test_decode_unfinished_for_yaml_broken_elsewhere(
+    extractor, resource_of_partial_property
+):
+    doc = f"""AWSTemplateFormatVersion: "2010-09-09"
+Description: [My template
+Resources:
+  {resource_of_partial_property}:
+    Type: AWS::ECS::TaskDefinition
+    Properties:
+      
+      NetworkMode: awsvpc"""
+    result = decode_unfinished(doc, "f.yaml", Position(line=6, character=6))
+    assert "." in result["Resources"][resource_of_partial_property]["Properties"]
@@ -0,0 +1,178 @@
+"""
+Tests for cfn_lsp_extra/decode/extraction.py
+"""
+import pytest
+
+from cfn_lsp_extra.aws_data import AWSRefName
+from cfn_lsp_extra.completions.static import CFN_EXTRACTOR
+from cfn_lsp_extra.decode import decode, lazy_yaml
+from cfn_lsp_extra.decode.extraction import ExtractionEngine, extract_all
+from cfn_lsp_extra.decode.extractors import (
+    AllowedValuesExtractor,
+    GetAttExtractor,
+    KeyExtractor,
+    LogicalIdExtractor,
+    NodeExtractor,
+    ParameterExtractor,
+    ResourceExtractor,
+    ResourcePropertyExtractor,
+)
+from cfn_lsp_extra.decode.nodes import LazyPositionedDict
+from cfn_lsp_extra.decode.position import Spanning, SpanTable
+
+TEMPLATE = """AWSTemplateFormatVersion: "2010-09-09"
+Parameters:
+  VpcId:
+    Type: String
+Resources:
+  Subnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      VpcId: !Ref VpcId
+      Tags:
+        - Key: Name
+          Value: !GetAtt Bucket.Arn
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties: .
+Outputs:
+  Id:
+    Value: !Ref Subnet
+"""
+TEMPLATE_JSON = """{
+  "Resources": {
+    "Subnet": {
+      "Type": "AWS::EC2::Subnet",
+      "Properties": {"VpcId": {"Ref": "VpcId"}, "Tags": [
+        {"Key": "Name", "Value": {"Fn::GetAtt": ["Bucket", "Arn"]}}]}
+    },
+    "Bucket": {"Type": "AWS::S3::Bucket", "Properties": {}}
+  },
+  "Outputs": {"Id": {"Value": {"Ref": "Subnet"}}}
+}"""
+
+
+REF_EXTRACTOR = KeyExtractor[AWSRefName]("Ref", lambda s: AWSRefName(value=s))
+EXTRACTORS = [
+    AllowedValuesExtractor(),
+    CFN_EXTRACTOR,
+    GetAttExtractor(),
+    REF_EXTRACTOR,
+    LogicalIdExtractor(),
+    ParameterExtractor(),
+    ResourceExtractor(),
+    ResourcePropertyExtractor(),
+]
+
+
+class KeyNameExtractor(NodeExtractor[str]):
+    def visit(self, node, path, parent):
+        for key, span in node.key_spans.items():
+            yield Spanning(value=key, line=span.line, char=span.char, span=len(key))
+
+
+class FailingExtractor(NodeExtractor[str]):
+    def visit(self, node, path, parent):
+        raise ValueError("Failed")
+
+
+def test_extract_all_is_extracting_separately():
+    template = decode(TEMPLATE, "f.yaml")
+    lookups = extract_all(template, EXTRACTORS)
+    for extractor in EXTRACTORS:
+        separate = extractor._extract(template)
+        assert lookups[extractor] == separate
+        assert separate
+
+
+def test_extract_all_for_lists():
+    tree = decode("- Ref: A\n- [{Ref: B}]\n", "f.yaml")
+    lookups = extract_all(tree, EXTRACTORS)
+    assert list(lookups[REF_EXTRACTOR]) == [
+        AWSRefName(value="A"),
+        AWSRefName(value="B"),
+    ]
+    assert not lookups[LogicalIdExtractor()]
+
+
+def test_extract_all_with_generator():
+    extractor = KeyNameExtractor()
+    lookup = extract_all(decode(TEMPLATE, "f.yaml"), [extractor])[extractor]
+    assert isinstance(lookup, SpanTable)
+    assert lookup["Type"] == [(3, 4, 4), (6, 4, 4), (13, 4, 4)]
+    assert lookup.at(7, 6).value == "Properties"
+
+
+def test_node_extractors_are_equal_by_value():
+    assert GetAttExtractor() == GetAttExtractor()
+    assert hash(GetAttExtractor()) == hash(GetAttExtractor())
+    assert LogicalIdExtractor() != ParameterExtractor()
+    assert KeyExtractor("Ref", str) != KeyExtractor("Condition", str)
+
+
+def test_extraction_engine_extracts_with_registered_extractors():
+    engine = ExtractionEngine()
+    template = decode(TEMPLATE, "f.yaml")
+    get_att, logical_id = GetAttExtractor(), LogicalIdExtractor()
+    engine.extract(template, get_att)
+    assert set(template.lookups) == {get_att}
+
+    # Extractors are registered, so new templates are extracted from by both
+    engine.extract(template, logical_id)
+    template = decode(TEMPLATE, "f.yaml")
+    lookup = engine.extract(template, logical_id)
+    assert set(template.lookups) == {get_att, logical_id}
+    assert engine.extract(template, LogicalIdExtractor()) is lookup
+
+
+def test_extraction_engine_with_failing_extractor():
+    engine = ExtractionEngine()
+    failing = FailingExtractor()
+    with pytest.raises(ValueError):
+        engine.extract(decode(TEMPLATE, "f.yaml"), failing)
+    assert engine.extract(decode(TEMPLATE, "f.yaml"), GetAttExtractor())
+    del failing
+
+
+@pytest.mark.parametrize("filename", ["f.yaml", "f.json"])
+def test_extract_all_for_line_has_the_spans_on_line(filename):
+    document = TEMPLATE if filename == "f.yaml" else TEMPLATE_JSON
+    template = decode(document, filename)
+    lookups = extract_all(template, EXTRACTORS)
+    for line, text in enumerate(document.split("\n")):
+        line_lookups = extract_all(template, EXTRACTORS, line)
+        for extractor in EXTRACTORS:
+            for char in range(len(text) + 1):
+                assert line_lookups[extractor].at(line, char) == lookups[
+                    extractor
+                ].at(line, char)
+
+
+def test_extract_all_for_line_skips_other_subtrees():
+    template = decode(TEMPLATE, "f.yaml")
+    lookups = extract_all(template, EXTRACTORS, 11)
+    assert list(lookups[REF_EXTRACTOR]) == []
+    assert list(lookups[GetAttExtractor()]) == ["Bucket.Arn"]
+    assert [r.value for r in lookups[ResourceExtractor()]] == ["AWS::EC2::Subnet"]
+
+
+def test_extract_all_for_line_leaves_other_subtrees_undecoded(monkeypatch):
+    monkeypatch.setattr(lazy_yaml, "MIN_LAZY_LINES", 2)
+    template = decode(TEMPLATE, "f.yaml", lazy=True)
+    extract_all(template, EXTRACTORS, 17)
+    assert type(template["Parameters"]) is LazyPositionedDict
+    assert type(template["Resources"]["Subnet"]["Properties"]) is LazyPositionedDict
+
+
+def test_extraction_engine_extracts_for_last_line():
+    engine = ExtractionEngine()
+    template = decode(TEMPLATE, "f.yaml")
+    get_att, ref = GetAttExtractor(), REF_EXTRACTOR
+    assert list(engine.extract(template, get_att, 11)) == ["Bucket.Arn"]
+    assert not engine.extract(template, ref, 11)
+    assert get_att not in template.lookups
+
+    lookup = engine.extract(template, ref, 17)
+    assert lookup.at(17, 17).value == AWSRefName(value="Subnet")
+    assert len(engine.extract(template, ref)) == 2
+    assert engine.extract(template, ref, 11) is template.lookups[ref]
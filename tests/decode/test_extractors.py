@@ -2,10 +2,13 @@ import pytest
 from cfn_lsp_extra.aws_data import (
     AWSLogicalId,
     AWSParameter,
+    AWSReference,
     AWSRefName,
     AWSResourceName,
+    AWSSymbol,
 )
 from cfn_lsp_extra.completions.static import RESOURCE_PATH
+from cfn_lsp_extra.decode import decode
 from cfn_lsp_extra.decode.extractors import (
     AllowedValuesExtractor,
     CompositeExtractor,
@@ -14,9 +17,11 @@ from cfn_lsp_extra.decode.extractors import (
     LogicalIdExtractor,
     ParameterExtractor,
     RecursiveExtractor,
+    ReferenceExtractor,
     ResourceExtractor,
     ResourcePropertyExtractor,
     StaticExtractor,
+    SymbolExtractor,
 )
 from cfn_lsp_extra.decode.position import Spanning
 
@@ -468,6 +473,96 @@ def test_logical_id_extractor_incomplete_logical_id(
     ]
 
 
+def test_symbol_extractor(document_mapping):
+    extractor = SymbolExtractor()
+    positions = extractor.extract(document_mapping)
+    subnet = AWSLogicalId(logical_name="PublicSubnet", type_="AWS::EC2::Subnet")
+    assert [(8, 2, 12)] == positions[
+        AWSSymbol(section="Resources", logical_name="PublicSubnet", source=subnet)
+    ]
+    assert {symbol.section for symbol in positions} == {"Parameters", "Resources"}
+
+
+def test_reference_extractor(document_mapping):
+    extractor = ReferenceExtractor()
+    positions = extractor.extract(document_mapping)
+    ref = AWSReference(
+        kind="Ref", logical_name="DefaultVpcId", sections=("Resources", "Parameters")
+    )
+    assert list(positions) == [ref]
+    assert [(13, 18, 12), (20, 13, 12), (23, 34, 12)] == sorted(positions[ref])
+
+
+def test_reference_extractor_sub_variables():
+    extractor = ReferenceExtractor()
+    node = {
+        "Fn::Sub": "${Bucket.Arn}/${Key}-${AWS::Region}-${!Literal}",
+        "__value_positions__": [
+            {"__position__${Bucket.Arn}/${Key}-${AWS::Region}-${!Literal}": [3, 10]}
+        ],
+    }
+    positions = extractor.extract(node)
+    bucket = AWSReference(kind="Fn::Sub", logical_name="Bucket", sections=("Resources",))
+    key = AWSReference(
+        kind="Fn::Sub", logical_name="Key", sections=("Resources", "Parameters")
+    )
+    assert list(positions) == [bucket, key]
+    assert positions[bucket] == [(3, 12, 6)]
+    assert positions[key] == [(3, 26, 3)]
+
+
+def test_reference_extractor_list_forms():
+    extractor = ReferenceExtractor()
+    template = decode(
+        """Resources:
+  Foo:
+    DependsOn: [Bar, Baz]
+    Properties:
+      A: !GetAtt [Bar, Arn]
+      B: !If [IsProd, !Sub ["${Baz}-${Name}", {Name: x}], ""]
+      C: !FindInMap [Names, !Ref Region, Key]""",
+        "template.yaml",
+    )
+    positions = extractor.extract(template)
+    bar = AWSReference(kind="DependsOn", logical_name="Bar", sections=("Resources",))
+    getatt = AWSReference(
+        kind="Fn::GetAtt", logical_name="Bar", sections=("Resources",)
+    )
+    is_prod = AWSReference(
+        kind="Fn::If", logical_name="IsProd", sections=("Conditions",)
+    )
+    baz = AWSReference(
+        kind="Fn::Sub", logical_name="Baz", sections=("Resources", "Parameters")
+    )
+    names = AWSReference(
+        kind="Fn::FindInMap", logical_name="Names", sections=("Mappings",)
+    )
+    assert positions[bar] == [(2, 16, 3)]
+    assert positions[getatt] == [(4, 18, 3)]
+    assert positions[is_prod] == [(5, 14, 6)]
+    assert positions[baz] == [(5, 30, 3)]
+    assert positions[names] == [(6, 21, 5)]
+    assert not any(ref.logical_name == "Name" for ref in positions)
+
+
+def test_reference_extractor_unknown_line():
+    extractor = ReferenceExtractor()
+    template = decode(
+        """Resources:
+  Foo:
+    Properties:
+      A: !Sub |
+        ${Bucket}
+        suffix""",
+        "template.yaml",
+    )
+    positions = extractor.extract(template)
+    bucket = AWSReference(
+        kind="Fn::Sub", logical_name="Bucket", sections=("Resources", "Parameters")
+    )
+    assert positions[bucket] == [(ReferenceExtractor.UNKNOWN_LINE, 0, 6)]
+
+
 def test_static_extractor(document_mapping):
     extractor = StaticExtractor(paths={RESOURCE_PATH})
     positions = extractor.extract(document_mapping)
@@ -0,0 +1,144 @@
+"""
+Tests for cfn_lsp_extra/decode/incremental.py
+"""
+import pytest
+
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.decode.json_decoding import decode_json
+from cfn_lsp_extra.decode.incremental import LineChange
+from cfn_lsp_extra.decode.incremental import decode_incremental
+from cfn_lsp_extra.decode.incremental import shift_positions
+from cfn_lsp_extra.decode.nodes import PositionedDict
+from cfn_lsp_extra.decode.nodes import Span
+from cfn_lsp_extra.decode.nodes import as_positioned
+
+
+@pytest.fixture
+def template_string():
+    return """AWSTemplateFormatVersion: "2010-09-09"
+Description: My template
+Parameters:
+  DefaultVpcId:
+    Type: String
+    Default: vpc-1431243213
+Resources:
+  PublicSubnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      CidrBlock: 172.31.48.0/20
+      VpcId: !Ref DefaultVpcId
+
+  PrivateSubnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      CidrBlock: 172.31.64.0/20
+      VpcId:
+        Ref: DefaultVpcId
+      Tags:
+        - Key: MyKey
+          Value: !GetAtt PublicSubnet.VpcId
+Outputs:
+  SubnetId:
+    Value: !Ref PrivateSubnet"""
+
+
+def spans(node):
+    """Return the spans of node and its children, keyed by path."""
+    if isinstance(node, list):
+        return {(idx,) + p: s for idx, c in enumerate(node) for p, s in spans(c).items()}
+    if not isinstance(node, PositionedDict):
+        return {}
+    result = {(k, "key"): s for k, s in node.key_spans.items()}
+    result.update({(k, "value"): s for k, s in node.value_spans.items()})
+    for key, child in node.items():
+        result.update({(key,) + p: s for p, s in spans(child).items()})
+    return result
+
+
+def edit(source, start_line, end_line, text):
+    """Replace lines start_line..end_line (inclusive) of source with text."""
+    lines = source.splitlines()
+    new_source = "\n".join(lines[:start_line] + [text] + lines[end_line + 1 :])
+    return new_source, LineChange.from_range(start_line, end_line, text)
+
+
+@pytest.mark.parametrize(
+    "start_line,end_line,text",
+    [
+        (10, 10, "      CidrBlock: 172.31.50.0/20"),
+        (10, 10, "      CidrBlock: 172.31.50.0/20\n      MapPublicIpOnLaunch: true"),
+        (10, 11, "      CidrBlock: 172.31.50.0/20"),
+        (13, 13, "  PrivateSubnet2:"),
+        (18, 18, "        Ref: DefaultVpcId\n      AvailabilityZone: eu-west-1a\n"),
+        (5, 5, "    Default: vpc-1\n    Description: The vpc"),
+        (24, 24, "    Value: !Ref PublicSubnet"),
+    ],
+)
+def test_decode_incremental_matches_decode(template_string, start_line, end_line, text):
+    tree = decode(template_string, "f.yaml")
+    new_source, change = edit(template_string, start_line, end_line, text)
+    result = decode_incremental(tree, new_source, change)
+    assert result is not None
+    expected = decode(new_source, "f.yaml")
+    assert result == expected
+    assert spans(result) == spans(expected)
+
+
+def test_decode_incremental_reuses_entries_before_edit(template_string):
+    tree = decode(template_string, "f.yaml")
+    new_source, change = edit(template_string, 16, 16, "      CidrBlock: 10.0.0.0/16")
+    result = decode_incremental(tree, new_source, change)
+    assert result["Resources"]["PublicSubnet"] is tree["Resources"]["PublicSubnet"]
+    assert result["Outputs"] is tree["Outputs"]
+
+
+def test_decode_incremental_edit_outside_entry(template_string):
+    tree = decode(template_string, "f.yaml")
+    new_source, change = edit(template_string, 1, 1, "Description: Another")
+    assert decode_incremental(tree, new_source, change) is None
+
+
+def test_decode_incremental_edit_leaves_section(template_string):
+    tree = decode(template_string, "f.yaml")
+    new_source, change = edit(template_string, 12, 12, "Conditions:")
+    assert decode_incremental(tree, new_source, change) is None
+
+
+def test_decode_incremental_invalid_edit(template_string):
+    tree = decode(template_string, "f.yaml")
+    new_source, change = edit(template_string, 10, 10, "      CidrBlock: {foo")
+    assert decode_incremental(tree, new_source, change) is None
+
+
+def test_line_change_then():
+    first = LineChange.from_range(10, 10, "foo\nbar")
+    second = LineChange.from_range(20, 21, "baz")
+    assert first.then(second) == LineChange(start=10, end=21, delta=0)
+
+
+def test_line_change_then_within_change():
+    first = LineChange.from_range(10, 10, "foo\nbar\nbaz")
+    second = LineChange.from_range(11, 11, "qux\n")
+    assert first.then(second) == LineChange(start=10, end=11, delta=3)
+
+
+def test_shift_positions():
+    node = as_positioned(
+        {
+            "Foo": {"Ref": "Bar", "__value_positions__": [{"__position__Bar": [1, 5]}]},
+            "__position__Foo": [1, 0],
+        }
+    )
+    shifted = shift_positions(node, 2)
+    assert shifted == node
+    assert shifted.key_spans == {"Foo": Span(3, 0, 3, 3)}
+    assert shifted["Foo"].value_spans == {"Ref": Span(3, 5, 3, 8)}
+    assert node.key_spans == {"Foo": Span(1, 0, 1, 3)}
+
+
+def test_shift_positions_of_elements():
+    node = decode_json('{"DependsOn": ["Foo", {"Ref": "Bar"}]}')
+    shifted = shift_positions(node, 2)
+    assert shifted == node
+    assert shifted["DependsOn"].spans == {0: Span(2, 16, 2, 19)}
+    assert shifted["DependsOn"][1].value_spans == {"Ref": Span(2, 31, 2, 34)}
@@ -0,0 +1,62 @@
+"""
+Tests for cfn_lsp_extra/decode/interning.py
+"""
+import pytest
+
+from cfn_lsp_extra.decode import decode, interning
+from cfn_lsp_extra.decode.interning import intern_string
+
+YAML = """Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: !GetAtt Foo.Bar
+      Tags: [a, LONG]
+"""
+JSON = """{
+  "Resources": {
+    "Bucket": {
+      "Type": "AWS::S3::Bucket",
+      "Properties": {"BucketName": {"Fn::GetAtt": ["Foo", "Bar"]},
+                     "Tags": ["a", "LONG"]}
+    }
+  }
+}"""
+LONG = "x" * (interning.MAX_INTERNED_LENGTH + 1)
+
+
+def test_intern_string():
+    value = "".join(["Ty", "pe"])
+    assert intern_string(value) is intern_string("Type")
+    long_value = "".join([LONG[:1], LONG[1:]])
+    assert intern_string(long_value) is long_value
+
+
+@pytest.mark.parametrize(
+    "document,filename",
+    [(YAML.replace("LONG", LONG), "f.yaml"), (JSON.replace("LONG", LONG), "f.json")],
+)
+def test_decoded_templates_share_strings(document, filename):
+    first, second = decode(document, filename), decode(document, filename)
+    first_bucket = first["Resources"]["Bucket"]
+    second_bucket = second["Resources"]["Bucket"]
+    first_key, second_key = next(iter(first_bucket)), next(iter(second_bucket))
+    assert first_key == "Type" and first_key is second_key
+    assert first_bucket["Type"] is second_bucket["Type"]
+    first_properties = first_bucket["Properties"]
+    second_properties = second_bucket["Properties"]
+    assert (
+        first_properties["BucketName"]["Fn::GetAtt"][1]
+        is second_properties["BucketName"]["Fn::GetAtt"][1]
+    )
+    assert first_properties["Tags"][0] is second_properties["Tags"][0]
+    assert first_properties["Tags"][1] == LONG
+    assert first_properties["Tags"][1] is not second_properties["Tags"][1]
+
+
+def test_decoded_yaml_spans_share_lines():
+    template = decode("\n" * 300 + YAML, "f.yaml")
+    bucket = template["Resources"]["Bucket"]
+    key_span, value_span = bucket.key_spans["Type"], bucket.value_spans["Type"]
+    assert key_span.line == 302
+    assert key_span.line is value_span.line is value_span.end_line
@@ -6,6 +6,8 @@ import json
 import pytest
 
 from cfn_lsp_extra.decode.json_decoding import CfnJSONDecoder
+from cfn_lsp_extra.decode.json_decoding import decode_json
+from cfn_lsp_extra.decode.nodes import Span
 from cfn_lsp_extra.decode.yaml_decoding import VALUES_POSITION_PREFIX
 
 
@@ -102,3 +104,60 @@ def test_parsing_of_value_positions(json_string):
         {"__position__AWS::ECS::TaskDefinition": [4, 21]},
         {"__position__OriginAccessIdentity": [5, 26]},
     ]
+
+
+def all_spans(node):
+    if isinstance(node, list):
+        spans = [(i, "element", s) for i, s in node.spans.items()]
+        return spans + [s for child in node for s in all_spans(child)]
+    if not isinstance(node, dict):
+        return []
+    spans = [(k, "key", s) for k, s in node.key_spans.items()]
+    spans += [(k, "value", s) for k, s in node.value_spans.items()]
+    return spans + [s for child in node.values() for s in all_spans(child)]
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        '{"a": 1, "a": {"b": "x"}, "c": [1, {"d": "\\"q\\u00e9"}], "a": [{"z": 1.5e3}]}',
+        '{"a": {"b": 1}, "a": "c"}',
+        '{\r\n  "a": "b",\r\n  "c": [true, false, null]\r\n}',
+        '{\r  "a": "b",\r  "c": {}\r}',
+        '{\n  "key"\n  :\n  "value", "e\\\\": -1}',
+        '[{"a": "b"}, "x", [[], {}]]',
+        '"scalar"',
+    ],
+)
+def test_decode_json_matches_decoder(source):
+    expected = json.loads(source, cls=CfnJSONDecoder)
+    content = decode_json(source)
+    assert content == expected
+    assert all_spans(content) == all_spans(expected)
+
+
+def test_decode_json_matches_decoder_on_template(json_string):
+    expected = json.loads(json_string, cls=CfnJSONDecoder)
+    content = decode_json(json_string)
+    assert content == expected
+    assert all_spans(content) == all_spans(expected)
+
+
+def test_decode_json_element_spans():
+    content = decode_json('{"a": ["x",\n  2, {"b": "c"}, [true]]}')
+    assert content["a"].spans == {0: Span(0, 8, 0, 9), 1: Span(1, 2, 1, 3)}
+    assert content["a"][3].spans == {0: Span(1, 18, 1, 22)}
+
+
+def test_decode_json_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        decode_json('{"a": }')
+
+
+def test_parsing_of_many_string_values():
+    values = 2000
+    source = json.dumps({f"Key{i}": f"value-{i}" for i in range(values)}, indent=0)
+    content = json.loads(source, cls=CfnJSONDecoder)
+    assert len(content.value_spans) == values
+    assert content.value_spans["Key1234"] == (1235, 12, 1235, 22)
+    assert content.key_spans["Key1234"] == (1235, 1, 1235, 8)
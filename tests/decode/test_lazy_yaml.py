@@ -0,0 +1,155 @@
+"""
+Tests for cfn_lsp_extra/decode/lazy_yaml.py
+"""
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cfn_lsp_extra.decode import CfnDecodingError, lazy_yaml
+from cfn_lsp_extra.decode.incremental import shift_positions
+from cfn_lsp_extra.decode.lazy_yaml import decode_lazy_yaml
+from cfn_lsp_extra.decode.nodes import LazyPositionedDict, PositionedDict, Span
+from cfn_lsp_extra.decode.yaml_decoding import SafePositionLoader
+from cfn_lsp_extra.source_text import SourceText
+
+TEMPLATE = """AWSTemplateFormatVersion: "2010-09-09"
+Parameters:
+  DefaultVpcId:
+    Type: String
+    Default: vpc-1431243213
+Resources:
+  Role:
+    Type: AWS::IAM::Role
+    Properties:  # comment
+      RoleName: !Sub "${AWS::StackName}-role"
+
+      AssumeRolePolicyDocument:
+        Version: "2012-10-17"
+        Statement:
+          - Effect: Allow
+            Principal:
+              Service: lambda.amazonaws.com
+            Action: sts:AssumeRole
+      Tags:
+      - Key: Name
+        Value: !GetAtt Foo.Bar
+  Subnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      VpcId: !Ref DefaultVpcId
+"""
+
+
+@pytest.fixture(autouse=True)
+def min_lazy_lines(monkeypatch):
+    monkeypatch.setattr(lazy_yaml, "MIN_LAZY_LINES", 2)
+
+
+def assert_same(expected, actual):
+    if isinstance(expected, dict):
+        assert isinstance(actual, PositionedDict)
+        assert list(actual) == list(expected)
+        assert actual.key_spans == expected.key_spans
+        assert actual.value_spans == expected.value_spans
+        for key in expected:
+            assert_same(expected[key], actual[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for expected_value, value in zip(expected, actual, strict=True):
+            assert_same(expected_value, value)
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        TEMPLATE,
+        TEMPLATE.replace("\n", "\r\n"),
+        "  " + TEMPLATE.replace("\n", "\n  "),
+        (Path(__file__).parents[1] / "integration/workspace/template.yaml").read_text(),
+    ],
+)
+def test_decode_lazy_yaml_is_safe_position_loader(document):
+    expected = yaml.load(document, Loader=SafePositionLoader)
+    assert_same(expected, decode_lazy_yaml(SourceText(document)))
+
+
+def test_decode_lazy_yaml_leaves_nested_mappings_undecoded():
+    result = decode_lazy_yaml(SourceText(TEMPLATE))
+    assert type(result) is PositionedDict
+    resources = result["Resources"]
+    assert type(resources) is LazyPositionedDict
+    assert result.key_spans["Resources"] == Span(5, 0, 5, 9)
+    assert "Resources" not in result.value_spans
+
+    # Resources are decoded with their section, but not their properties
+    assert resources["Role"]["Type"] == "AWS::IAM::Role"
+    assert type(resources) is PositionedDict
+    properties = resources["Role"]["Properties"]
+    assert type(properties) is LazyPositionedDict
+    assert not properties.value_spans
+    assert type(properties) is PositionedDict
+    assert type(properties["AssumeRolePolicyDocument"]) is LazyPositionedDict
+    assert properties.key_spans["Tags"] == Span(18, 6, 18, 10)
+    assert type(result["Parameters"]) is LazyPositionedDict
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        "Resources:\n  Foo: &foo\n    Type: A\n    Properties: {}\n  Bar: *foo\n",
+        "%YAML 1.2\n---\nResources:\n  Foo:\n    Type: A\n    Bar: 1\n",
+    ],
+)
+def test_decode_lazy_yaml_with_anchors_or_directives_is_eager(document):
+    result = decode_lazy_yaml(SourceText(document))
+    assert type(result["Resources"]) is PositionedDict
+
+
+def test_decode_lazy_yaml_raises_on_use_of_broken_mappings():
+    document = TEMPLATE.replace("Action: sts:AssumeRole", "Action: [sts")
+    result = decode_lazy_yaml(SourceText(document))
+    properties = result["Resources"]["Role"]["Properties"]
+    assert properties["RoleName"] == {"Fn::Sub": "${AWS::StackName}-role"}
+    policy = properties["AssumeRolePolicyDocument"]
+    with pytest.raises(CfnDecodingError):
+        policy["Statement"]
+    # Still undecoded, so it raises again
+    with pytest.raises(CfnDecodingError):
+        len(policy)
+
+
+def test_decode_lazy_yaml_raises_for_broken_top_level():
+    with pytest.raises(yaml.YAMLError):
+        decode_lazy_yaml(SourceText("foo: {bar\nResources:\n  Foo:\n    A: 1\n"))
+
+
+def test_shift_positions_keeps_lazy_mappings_undecoded():
+    result = decode_lazy_yaml(SourceText(TEMPLATE))
+    shifted = shift_positions(result, 3)
+    assert type(shifted["Resources"]) is LazyPositionedDict
+    assert type(result["Resources"]) is LazyPositionedDict
+    expected = yaml.load("\n\n\n" + TEMPLATE, Loader=SafePositionLoader)
+    assert_same(expected, shifted)
+    assert_same(yaml.load(TEMPLATE, Loader=SafePositionLoader), result)
+
+
+def test_lazy_positioned_dict_decodes_once():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        node = PositionedDict(a=1)
+        node.key_spans["a"] = Span(0, 0, 0, 1)
+        return node
+
+    lazy = LazyPositionedDict(loader)
+    assert isinstance(lazy, dict)
+    assert not calls
+    assert lazy == {"a": 1}
+    assert lazy.key_spans == {"a": Span(0, 0, 0, 1)}
+    assert dict(lazy) == {"a": 1}
+    assert type(lazy) is PositionedDict
+    assert calls == [1]
@@ -0,0 +1,96 @@
+"""
+Tests for cfn_lsp_extra/decode/nodes.py
+"""
+import pytest
+
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.decode.nodes import POSITION_PREFIX
+from cfn_lsp_extra.decode.nodes import VALUES_POSITION_PREFIX
+from cfn_lsp_extra.decode.nodes import PositionedDict
+from cfn_lsp_extra.decode.nodes import Span
+from cfn_lsp_extra.decode.nodes import as_positioned
+from cfn_lsp_extra.decode.nodes import key_span
+from cfn_lsp_extra.decode.nodes import value_span
+
+
+@pytest.fixture
+def node():
+    node = PositionedDict({"Type": "AWS::S3::Bucket", "Properties": {}})
+    node.key_spans = {"Type": Span(2, 4, 2, 8), "Properties": Span(3, 4, 3, 14)}
+    node.value_spans = {"Type": Span(2, 10, 2, 25)}
+    return node
+
+
+def test_positioned_dict_legacy_view(node):
+    assert node[POSITION_PREFIX + "Type"] == [2, 4]
+    assert node[VALUES_POSITION_PREFIX] == [
+        {POSITION_PREFIX + "AWS::S3::Bucket": [2, 10]}
+    ]
+    assert POSITION_PREFIX + "Properties" in node
+    assert POSITION_PREFIX + "Foo" not in node
+
+
+def test_positioned_dict_legacy_view_get(node):
+    assert node.get(POSITION_PREFIX + "Type") == [2, 4]
+    assert node.get(VALUES_POSITION_PREFIX) == [
+        {POSITION_PREFIX + "AWS::S3::Bucket": [2, 10]}
+    ]
+    assert node.get(POSITION_PREFIX + "Foo") is None
+    assert node.get(POSITION_PREFIX + "Foo", []) == []
+    assert node.get("Type") == "AWS::S3::Bucket"
+    assert node.get("Foo", 1) == 1
+    assert PositionedDict().get(VALUES_POSITION_PREFIX) is None
+
+
+def test_positioned_dict_positions_not_content(node):
+    assert list(node) == ["Type", "Properties"]
+    assert node == {"Type": "AWS::S3::Bucket", "Properties": {}}
+    with pytest.raises(KeyError):
+        node[POSITION_PREFIX + "Foo"]
+
+
+def test_key_and_value_span(node):
+    assert key_span(node, "Type") == Span(2, 4, 2, 8)
+    assert value_span(node, "Type") == Span(2, 10, 2, 25)
+    assert value_span(node, "Properties") is None
+    assert key_span({"Type": "foo"}, "Type") is None
+
+
+def test_as_positioned():
+    legacy = {
+        "Resources": {
+            "Bucket": {
+                "Type": "AWS::S3::Bucket",
+                "Resource": {"Fn::GetAtt": ["Foo", "Arn"]},
+                VALUES_POSITION_PREFIX: [{POSITION_PREFIX + "AWS::S3::Bucket": [2, 10]}],
+                POSITION_PREFIX + "Type": [2, 4],
+            },
+            POSITION_PREFIX + "Bucket": [1, 2],
+        },
+        POSITION_PREFIX + "Resources": [0, 0],
+    }
+    node = as_positioned(legacy)
+    bucket = node["Resources"]["Bucket"]
+    assert list(node) == ["Resources"]
+    assert list(bucket) == ["Type", "Resource"]
+    assert node["Resources"].key_spans == {"Bucket": Span(1, 2, 1, 8)}
+    assert bucket.value_spans == {"Type": Span(2, 10, 2, 25)}
+
+
+@pytest.mark.parametrize(
+    "source,filename",
+    [
+        ("Resources:\n  Bucket:\n    Type: AWS::S3::Bucket\n", "f.yaml"),
+        ('{\n"Resources": {\n  "Bucket": {\n    "Type": "AWS::S3::Bucket"}}}', "f.json"),
+    ],
+)
+def test_decoded_spans_cover_text(source, filename):
+    lines = source.splitlines()
+    bucket = decode(source, filename)["Resources"]["Bucket"]
+
+    def text(span):
+        assert span.line == span.end_line
+        return lines[span.line][span.char : span.end_char]
+
+    assert text(bucket.key_spans["Type"]) == "Type"
+    assert text(bucket.value_spans["Type"]) == "AWS::S3::Bucket"
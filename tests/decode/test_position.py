@@ -1,6 +1,9 @@
+import random
+
 import pytest
 
 from cfn_lsp_extra.decode.position import PositionLookup
+from cfn_lsp_extra.decode.position import SpanTable
 from cfn_lsp_extra.decode.position import Spanning
 
 
@@ -33,3 +36,76 @@ def test_lookup_extend_with_appends():
     assert lookup1.at(2, 11) == Spanning[str](
         value=item, line=line + 1, char=char, span=span
     )
+
+
+def linear_at(lookup, line, char):
+    for item, positions in lookup.items():
+        for item_line, char_min, item_span in positions:
+            if line == item_line and char_min <= char <= char_min + item_span:
+                return Spanning(value=item, line=item_line, char=char_min, span=item_span)
+    return None
+
+
+def test_lookup_at_overlapping_spans_first_inserted():
+    lookup = PositionLookup[str]()
+    lookup["outer"].append((1, 2, 20))
+    lookup["inner"].append((1, 5, 3))
+    lookup["adjacent"].append((1, 22, 3))
+    assert lookup.at(1, 6).value == "outer"
+    assert lookup.at(1, 22).value == "outer"
+    assert lookup.at(1, 23).value == "adjacent"
+    assert lookup.at(1, 1) is None
+    assert lookup.at(2, 6) is None
+
+
+def test_lookup_at_after_extend_with_appends():
+    lookup1 = PositionLookup[str]()
+    lookup1["foo"].append((1, 10, 3))
+    assert lookup1.at(2, 11) is None
+    lookup2 = PositionLookup[str]()
+    lookup2["bar"].append((2, 10, 3))
+    lookup1.extend_with_appends(lookup2)
+    assert lookup1.at(2, 11) == Spanning[str](value="bar", line=2, char=10, span=3)
+
+
+@pytest.mark.parametrize("cls", [PositionLookup, SpanTable])
+@pytest.mark.parametrize("seed", range(5))
+def test_lookup_at_matches_linear_scan(cls, seed):
+    rng = random.Random(seed)
+    lookup = cls.from_iterable(
+        Spanning(
+            value=rng.randrange(50),
+            line=rng.randrange(10),
+            char=rng.randrange(40),
+            span=rng.randrange(10),
+        )
+        for _ in range(300)
+    )
+    for line in range(11):
+        for char in range(55):
+            assert lookup.at(line, char) == linear_at(lookup, line, char)
+
+
+def test_span_table():
+    table = SpanTable[str]()
+    table.add("foo", 1, 10, 3)
+    table.add("bar", 1, 2, 20)
+    table.add("foo", 0, 4, 3)
+    assert list(table) == ["foo", "bar"]
+    assert "foo" in table and "baz" not in table
+    assert table["foo"] == [(1, 10, 3), (0, 4, 3)]
+    assert table == {"foo": [(1, 10, 3), (0, 4, 3)], "bar": [(1, 2, 20)]}
+    # Earlier items come first, as in a PositionLookup
+    assert table.at(1, 11) == Spanning(value="foo", line=1, char=10, span=3)
+    assert table.at(1, 2) == Spanning(value="bar", line=1, char=2, span=20)
+    assert table.at(2, 2) is None
+
+
+def test_span_table_extend_with_appends():
+    table = SpanTable.from_iterable([Spanning(value="foo", line=1, char=10, span=3)])
+    assert table.at(2, 11) is None
+    lookup = PositionLookup[str]()
+    lookup["bar"].append((2, 10, 3))
+    table.extend_with_appends(lookup)
+    assert table.at(2, 11) == Spanning(value="bar", line=2, char=10, span=3)
+    assert table["bar"] == [(2, 10, 3)]
@@ -0,0 +1,145 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cfn_lsp_extra.decode.nodes import PositionedDict, PositionedList, Span
+from cfn_lsp_extra.decode.tolerant_yaml import decode_tolerant_yaml
+from cfn_lsp_extra.decode.yaml_decoding import SafePositionLoader
+from cfn_lsp_extra.source_text import SourceText
+
+TEMPLATE = """AWSTemplateFormatVersion: "2010-09-09"
+# Pointless comment
+Description: >
+  My template
+  over two lines
+Parameters:
+  DefaultVpcId:
+    Type: String
+    Default: vpc-1431243213
+    AllowedValues: [vpc-1431243213,
+      vpc-1]
+Resources:
+  PublicSubnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      CidrBlock: '172.31.48.0/20'  # comment
+      MapPublicIpOnLaunch: true
+      VpcId: !Ref DefaultVpcId
+      AvailabilityZone: !GetAtt Foo.Bar
+      Tags:
+      - Key: "My\\tKey"
+        Value: !Join
+          - ''
+          - - !Ref DefaultVpcId
+            - VPC
+      - Key: Other
+        Value: !Sub |
+          ${AWS::Region}
+
+  PrivateSubnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      CidrBlock: 172.31.64.0/20
+      VpcId:
+        Ref: DefaultVpcId
+      Ipv6Native: !Ref
+      Tags:
+        - Key: MyKey
+          Value: !Join ['', [!Ref DefaultVpcId, VPC]]
+Outputs:
+  Id:
+    Value:
+      Fn::GetAtt:
+      - PublicSubnet
+      - SubnetId
+"""
+
+
+def assert_same(expected, actual):
+    assert type(actual) is type(expected) or (
+        isinstance(expected, dict) and isinstance(actual, dict)
+    )
+    if isinstance(expected, dict):
+        assert list(actual) == list(expected)
+        if isinstance(expected, PositionedDict):
+            assert actual.key_spans == expected.key_spans
+            assert actual.value_spans == expected.value_spans
+        for key in expected:
+            assert_same(expected[key], actual[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        if isinstance(expected, PositionedList):
+            assert actual.spans == expected.spans
+        for idx, expected_value in enumerate(expected):
+            assert_same(expected_value, actual[idx])
+    else:
+        assert actual == expected
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        TEMPLATE,
+        TEMPLATE.replace("\n", "\r\n"),
+        (Path(__file__).parents[1] / "integration/workspace/template.yaml").read_text(),
+    ],
+)
+def test_decode_tolerant_yaml_is_safe_position_loader_for_valid_documents(
+    document,
+):
+    expected = yaml.load(document, Loader=SafePositionLoader)
+    assert_same(expected, decode_tolerant_yaml(SourceText(document)))
+
+
+def test_decode_tolerant_yaml_skips_broken_entries():
+    document = TEMPLATE.replace("CidrBlock: 172.31.64.0/20", "CidrBlock: {172")
+    result = decode_tolerant_yaml(SourceText(document))
+    properties = result["Resources"]["PrivateSubnet"]["Properties"]
+    assert properties["CidrBlock"] is None
+    assert properties.key_spans["CidrBlock"] == Span(32, 6, 32, 15)
+    assert properties["VpcId"] == {"Ref": "DefaultVpcId"}
+    assert result["Resources"]["PublicSubnet"]["Properties"]["VpcId"] == {
+        "Ref": "DefaultVpcId"
+    }
+
+
+def test_decode_tolerant_yaml_skips_misplaced_lines():
+    document = """Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+      Oops: 1
+    - item
+    Properties:
+      BucketName: foo: bar
+      Tags: []"""
+    result = decode_tolerant_yaml(SourceText(document))
+    bucket = result["Resources"]["Bucket"]
+    assert bucket["Type"] == "AWS::S3::Bucket"
+    assert bucket["Properties"] == {"BucketName": None, "Tags": []}
+
+
+def test_decode_tolerant_yaml_takes_lone_scalars_as_keys():
+    document = """Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      Bucke
+      Tags: []
+    Depends"""
+    result = decode_tolerant_yaml(SourceText(document))
+    bucket = result["Resources"]["Bucket"]
+    assert bucket["Properties"] == {"Bucke": None, "Tags": []}
+    assert bucket["Properties"].key_spans["Bucke"] == Span(4, 6, 4, 11)
+    assert bucket["Depends"] is None
+
+
+def test_decode_tolerant_yaml_lone_scalar_value():
+    document = """Resources:
+  Bucket:
+    Properties:
+      Bucke"""
+    result = decode_tolerant_yaml(SourceText(document))
+    bucket = result["Resources"]["Bucket"]
+    assert bucket["Properties"] == "Bucke"
+    assert bucket.value_spans["Properties"] == Span(3, 6, 3, 11)
@@ -1,6 +1,11 @@
+import gc
+import threading
+
 import pytest
 import yaml
+from yaml.constructor import ConstructorError
 
+from cfn_lsp_extra.decode.nodes import Span
 from cfn_lsp_extra.decode.yaml_decoding import POSITION_PREFIX
 from cfn_lsp_extra.decode.yaml_decoding import VALUES_POSITION_PREFIX
 from cfn_lsp_extra.decode.yaml_decoding import SafePositionLoader
@@ -72,3 +77,108 @@ def test_safe_position_loader_ref_positions(yaml_string):
         23,
         34,
     ]
+
+
+def test_safe_position_loader_spans(yaml_string):
+    data = yaml.load(yaml_string, Loader=SafePositionLoader)
+    properties = data["Resources"]["PublicSubnet"]["Properties"]
+    assert properties.key_spans["CidrBlock"] == Span(11, 6, 11, 15)
+    assert properties.value_spans["CidrBlock"] == Span(11, 17, 11, 31)
+    assert properties["MapPublicIpOnLaunch"] is True
+    assert "VpcId" not in properties.value_spans
+    assert properties["VpcId"].value_spans["Ref"] == Span(13, 18, 13, 30)
+
+
+def test_safe_position_loader_functions():
+    data = yaml.load(
+        """A: !GetAtt Foo.Bar
+B: !GetAtt [Foo, Bar]
+C: !If [Cond, !Ref X, {Ref: Y}]
+D: !Transform
+  Name: Foo""",
+        Loader=SafePositionLoader,
+    )
+    assert data == {
+        "A": {"Fn::GetAtt": ["Foo", "Bar"]},
+        "B": {"Fn::GetAtt": ["Foo", "Bar"]},
+        "C": {"Fn::If": ["Cond", {"Ref": "X"}, {"Ref": "Y"}]},
+        "D": {"Fn::Transform": {"Name": "Foo"}},
+    }
+    assert data["A"].value_spans["Fn::GetAtt"] == Span(0, 11, 0, 18)
+    assert data["B"]["Fn::GetAtt"].spans == {
+        0: Span(1, 12, 1, 15),
+        1: Span(1, 17, 1, 20),
+    }
+    assert data["C"]["Fn::If"].spans == {0: Span(2, 8, 2, 12)}
+    assert data["D"]["Fn::Transform"].key_spans["Name"] == Span(4, 2, 4, 6)
+
+
+def test_safe_position_loader_element_spans():
+    data = yaml.load(
+        """DependsOn:
+  - Foo
+  - "Bar"
+  - [1, {a: b}]""",
+        Loader=SafePositionLoader,
+    )
+    assert data["DependsOn"].spans == {0: Span(1, 4, 1, 7), 1: Span(2, 4, 2, 9)}
+    assert data["DependsOn"][2].spans == {0: Span(3, 5, 3, 6)}
+
+
+def test_safe_position_loader_anchors_and_merge_keys():
+    data = yaml.load(
+        """Base: &base
+  Type: String
+Derived:
+  <<: *base
+  Default: x
+Same: *base
+Set: !!set {a, b}""",
+        Loader=SafePositionLoader,
+    )
+    assert data["Derived"] == {"Type": "String", "Default": "x"}
+    assert data["Same"] is data["Base"]
+    assert data["Set"] == {"a", "b"}
+
+
+def test_safe_position_loader_unhashable_key():
+    with pytest.raises(ConstructorError):
+        yaml.load("[a]: b", Loader=SafePositionLoader)
+
+
+@pytest.mark.parametrize("document", ["foo: bar", "foo: !!R bar"])
+def test_safe_position_loader_reenables_gc(document):
+    try:
+        yaml.load(document, Loader=SafePositionLoader)
+    except yaml.YAMLError:
+        pass
+    assert gc.isenabled()
+
+
+def test_safe_position_loader_overlapping_loads_restore_gc():
+    threshold = gc.get_threshold()
+    barrier = threading.Barrier(2, timeout=5)
+    thresholds = []
+    enabled = []
+
+    class BarrierLoader(SafePositionLoader):
+        def construct_document(self, node):
+            barrier.wait()  # Both loads are underway
+            thresholds.append(gc.get_threshold())
+            enabled.append(gc.isenabled())
+            barrier.wait()
+            return super().construct_document(node)
+
+    threads = [
+        threading.Thread(target=yaml.load, args=("a: b", BarrierLoader))
+        for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(thresholds) == 2
+    assert all(t[0] > threshold[0] for t in thresholds)
+    assert enabled == [True, True]
+    assert gc.isenabled()
+    assert gc.get_threshold() == threshold
@@ -0,0 +1,79 @@
+"""
+Tests for cfn_lsp_extra/decode/yaml_window.py
+"""
+import pytest
+from lsprotocol.types import Position
+
+from cfn_lsp_extra.decode import decode_unfinished, yaml_window
+from cfn_lsp_extra.decode.nodes import Span
+from cfn_lsp_extra.decode.yaml_window import window
+from cfn_lsp_extra.source_text import SourceText
+
+TEMPLATE = """AWSTemplateFormatVersion: "2010-09-09"
+Description: My template
+Parameters:
+  VpcId:
+    Type: String
+    Description: The vpc
+    AllowedValues:
+      - vpc-1
+Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+    Properties:
+      BucketName: foo
+      Tags:
+        - Key: Type
+          Value: bar
+  Subnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      VpcId: !Ref VpcId
+
+Outputs:
+  Id:
+    Value: !Ref Subnet
+"""
+
+
+@pytest.fixture
+def min_window_lines(monkeypatch):
+    monkeypatch.setattr(yaml_window, "MIN_WINDOW_LINES", 0)
+
+
+def test_window_for_small_templates():
+    assert window(SourceText(TEMPLATE), 18) is None
+
+
+@pytest.mark.parametrize("line", [0, 1, 2, 8, 21])
+def test_window_outside_of_section_entries(min_window_lines, line):
+    assert window(SourceText(TEMPLATE), line) is None
+
+
+def test_window(min_window_lines):
+    windowed = window(SourceText(TEMPLATE), 18)
+    lines = TEMPLATE.split("\n")
+    kept = {0, 1, 2, 3, 4, 5, 8, 9, 10, 16, 17, 18, 19, 20, 21}
+    assert windowed.line_count == 23
+    for line in range(windowed.line_count):
+        assert windowed.line(line) == (lines[line] if line in kept else "")
+
+
+def test_window_with_crlf(min_window_lines):
+    windowed = window(SourceText(TEMPLATE.replace("\n", "\r\n")), 18)
+    assert windowed.line(18) == "    Properties:"
+    assert windowed.line(12) == ""
+
+
+def test_decode_unfinished_windowed(min_window_lines):
+    position = Position(line=19, character=6)
+    result = decode_unfinished(TEMPLATE, "f.yaml", position, windowed=True)
+    resources = result["Resources"]
+    assert resources["Bucket"] == {"Type": "AWS::S3::Bucket"}
+    assert resources.value_spans == {}
+    assert resources["Subnet"]["Properties"] == {"VpcId": {"Ref": "VpcId"}}
+    assert resources["Subnet"].value_spans["Type"] == Span(17, 10, 17, 26)
+    assert result["Parameters"] == {
+        "VpcId": {"Type": "String", "Description": "The vpc"}
+    }
+    assert result["Outputs"] is None
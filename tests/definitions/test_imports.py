@@ -0,0 +1,34 @@
+"""
+Test definitions for !ImportValues.
+"""
+
+from lsprotocol.types import Position
+from pygls.workspace import TextDocument
+
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.definitions.imports import import_value_definition
+from cfn_lsp_extra.workspace_index import WorkspaceIndex, summarize
+
+from ..test_workspace_index import APP, NETWORK, NETWORK_URI
+
+
+def test_import_value_definition():
+    index = WorkspaceIndex()
+    index.update(summarize(NETWORK, "network.yaml", NETWORK_URI))
+    document = TextDocument(uri="file:///app.yaml", source=APP)
+    template_data = decode(APP, "app.yaml")
+    position = Position(line=5, character=30)
+    result = import_value_definition(template_data, document, position, index)
+    assert result.uri == NETWORK_URI
+    assert result.range.start == Position(line=11, character=12)
+    assert result.range.end == Position(line=11, character=25)
+
+
+def test_import_value_definition_without_export():
+    document = TextDocument(uri="file:///app.yaml", source=APP)
+    template_data = decode(APP, "app.yaml")
+    position = Position(line=5, character=30)
+    assert (
+        import_value_definition(template_data, document, position, WorkspaceIndex())
+        is None
+    )
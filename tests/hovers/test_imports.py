@@ -0,0 +1,36 @@
+"""
+Tests for !ImportValue hovers.
+"""
+from lsprotocol.types import Position
+from pygls.workspace import TextDocument
+
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.hovers.imports import import_value_hover
+from cfn_lsp_extra.workspace_index import WorkspaceIndex, summarize
+
+from ..test_workspace_index import APP, NETWORK, NETWORK_URI
+
+
+def test_import_value_hover():
+    index = WorkspaceIndex()
+    index.update(summarize(NETWORK, "network.yaml", NETWORK_URI))
+    document = TextDocument(uri="file:///app.yaml", source=APP)
+    template_data = decode(APP, "app.yaml")
+    result = import_value_hover(
+        template_data, Position(line=5, character=28), document, index
+    )
+    assert result.range.start == Position(line=5, character=26)
+    assert result.range.end == Position(line=5, character=39)
+    assert "### Export: `network-VpcId`" in result.contents.value
+    assert "*Resource*: `Vpc` (`AWS::EC2::VPC`)" in result.contents.value
+
+
+def test_import_value_hover_outside_import():
+    index = WorkspaceIndex()
+    index.update(summarize(NETWORK, "network.yaml", NETWORK_URI))
+    document = TextDocument(uri="file:///app.yaml", source=APP)
+    template_data = decode(APP, "app.yaml")
+    assert (
+        import_value_hover(template_data, Position(line=3, character=8), document, index)
+        is None
+    )
@@ -0,0 +1,50 @@
+"""
+Integration tests for textDocument/references and textDocument/rename.
+"""
+
+import pytest
+from lsprotocol.types import Position
+from lsprotocol.types import ReferenceContext
+from lsprotocol.types import ReferenceParams
+from lsprotocol.types import RenameParams
+from lsprotocol.types import TextDocumentIdentifier
+
+from .conftest import root_path
+
+
+pytestmark = pytest.mark.integration
+
+
+@pytest.mark.asyncio
+async def test_parameter_references(client):
+    text_document = TextDocumentIdentifier(uri=str(root_path / "template.yaml"))
+    result = await client.text_document_references_async(
+        ReferenceParams(
+            text_document=text_document,
+            position=Position(line=10, character=4),
+            context=ReferenceContext(include_declaration=True),
+        )
+    )
+    assert [(r.range.start.line, r.range.start.character) for r in result] == [
+        (10, 2),
+        (83, 36),
+        (191, 11),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_parameter_rename(client):
+    text_document = TextDocumentIdentifier(uri=str(root_path / "template.yaml"))
+    result = await client.text_document_rename_async(
+        RenameParams(
+            text_document=text_document,
+            position=Position(line=83, character=40),
+            new_name="Certificate",
+        )
+    )
+    edits = result.changes[text_document.uri]
+    assert [(e.range.start.line, e.new_text) for e in edits] == [
+        (10, "Certificate"),
+        (83, "Certificate"),
+        (191, "Certificate"),
+    ]
@@ -1,6 +1,6 @@
 import pytest
 from cfn_lsp_extra.aws_data import AWSContext, AWSResourceName, AWSSpecification
-from cfn_lsp_extra.context import load_cfn_context
+from cfn_lsp_extra.context import load_context
 
 
 @pytest.fixture
@@ -94,9 +94,16 @@ def aws_context(aws_context_resource_dct):
     return AWSContext(resource_map=aws_context_resource_dct, property_map={})
 
 
-@pytest.fixture
-def full_aws_context():
-    return load_cfn_context()
+@pytest.fixture(scope="module")
+def full_aws_context(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("full_aws_context")
+    config_dir = tmp_path / "config"
+    return load_context(
+        "context.json",
+        config_dir / "context.json",
+        config_dir / "custom.json",
+        tmp_path / "cache",
+    )
 
 
 @pytest.fixture
@@ -226,3 +233,93 @@ def test_aws_context_contains_negative(aws_context, aws_resource_string):
     resource_name = AWSResourceName(value=aws_resource_string)
     assert AWSResourceName(value="notaresource") not in aws_context
     assert resource_name / "notaproperty" not in aws_context
+
+
+@pytest.fixture
+def item_type_aws_context():
+    listener = "AWS::ElasticLoadBalancingV2::Listener"
+    return AWSContext(
+        resource_map={
+            listener: {
+                "Properties": {
+                    "DefaultActions": {"Type": "List", "ItemType": "Action"},
+                    "Certificates": {"Type": "List", "ItemType": "String"},
+                }
+            }
+        },
+        property_map={
+            f"{listener}.Action": {
+                "Properties": {"Type": {"AllowedValues": ["forward", "redirect"]}}
+            },
+            f"{listener}.redirectconfig": {"Properties": {"Port": {}}},
+        },
+    )
+
+
+@pytest.mark.parametrize(
+    "props,expected",
+    [
+        (["DefaultActions"], ["Properties"]),
+        (["DefaultActions", "Type"], ["AllowedValues"]),
+        # ItemTypes which aren't property types are ignored
+        (["Certificates"], ["Type", "ItemType"]),
+        # Property types are matched ignoring case
+        (["DefaultActions", "RedirectConfig"], ["Properties"]),
+        (["DefaultActions", "RedirectConfig", "Port"], []),
+        (["DefaultActions", "Missing"], None),
+        (["Missing", "Type"], None),
+    ],
+)
+def test_aws_context_getitem_applies_item_types(
+    item_type_aws_context, props, expected
+):
+    name = AWSResourceName(value="AWS::ElasticLoadBalancingV2::Listener")
+    for prop in props:
+        name = name / prop
+    if expected is None:
+        assert name not in item_type_aws_context
+        with pytest.raises(KeyError):
+            item_type_aws_context[name]
+    else:
+        assert name in item_type_aws_context
+        assert list(item_type_aws_context[name]) == expected
+        assert item_type_aws_context[name] is item_type_aws_context[name]
+
+
+def test_aws_context_allowed_values_of_item_type(item_type_aws_context):
+    name = AWSResourceName(value="AWS::ElasticLoadBalancingV2::Listener")
+    assert item_type_aws_context.allowed_values(name / "DefaultActions" / "Type") == [
+        "forward",
+        "redirect",
+    ]
+
+
+def test_aws_context_reads_documentation_by_id():
+    reads = []
+
+    class Documentation(dict):
+        def __getitem__(self, doc_id):
+            reads.append(doc_id)
+            return super().__getitem__(doc_id)
+
+    context = AWSContext(
+        resource_map={
+            "AWS::S3::Bucket": {
+                "MarkdownDocumentationId": 0,
+                "Attributes": {"Arn": {"MarkdownDocumentationId": 1}},
+                "Properties": {
+                    "BucketName": {"MarkdownDocumentation": "Inline"},
+                    "Tags": {"MarkdownDocumentationId": 5},
+                },
+            }
+        },
+        property_map={},
+        documentation=Documentation({0: "A bucket", 1: "The arn"}),
+    )
+    bucket = AWSResourceName(value="AWS::S3::Bucket")
+    assert context.description(bucket) == "A bucket"
+    assert context.description(bucket) == "A bucket"
+    assert context.return_values(bucket) == {"Arn": "The arn"}
+    assert context.description(bucket / "BucketName") == "Inline"
+    assert context.description(bucket / "Tags") == ""
+    assert reads == [0, 1, 5]
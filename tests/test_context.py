@@ -1,9 +1,12 @@
 import json
+from typing import Mapping
 from unittest import mock as mocker
 
 import pytest
-from cfn_lsp_extra.aws_data import AWSResourceName, AWSSpecification
-from cfn_lsp_extra.context import load_context, with_custom
+from cfn_lsp_extra.aws_data import AWSContext, AWSResourceName, AWSSpecification
+from cfn_lsp_extra import context
+from cfn_lsp_extra.context import deep_merge, load_context, load_spec, with_custom
+from cfn_lsp_extra.spec_artifact import SpecArtifact, artifact_path, write_artifact
 
 from .test_aws_data import (
     aws_context,
@@ -12,6 +15,8 @@ from .test_aws_data import (
     aws_resource_string,
 )
 
+SERVERLESS_FUNCTION = AWSResourceName(value="AWS::Serverless::Function")
+
 
 @pytest.fixture
 def aws_context_json_complete_dct(aws_context_resource_dct):
@@ -27,17 +32,26 @@ def aws_context_str(aws_context_json_complete_dct):
 
 
 @pytest.fixture
-def mocker_cache_file(mocker, aws_context_json_complete_dct, aws_context_str):
-    opened_file = mocker.MagicMock(read=lambda: aws_context_str)
-    cache_file = mocker.MagicMock(__open__=lambda _: opened_file, exists=lambda: True)
-    mocker.patch("json.load", lambda f: aws_context_json_complete_dct)
-    return cache_file
+def override_path(tmp_path):
+    return tmp_path / "config" / "context.json"
+
+
+@pytest.fixture
+def custom_path(tmp_path):
+    return tmp_path / "config" / "custom.json"
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return tmp_path / "cache"
 
 
 @pytest.fixture
-def mocker_inexistant_cache_file(mocker):
-    cache_file = mocker.MagicMock(exists=lambda: False)
-    return cache_file
+def load(override_path, custom_path, cache_dir):
+    def _load(resource="sam_context.json"):
+        return load_context(resource, override_path, custom_path, cache_dir)
+
+    return _load
 
 
 @pytest.fixture
@@ -62,14 +76,19 @@ def mocker_custom_file(mocker):
 
 
 def test_load_context_reads_override_file(
-    mocker, mocker_cache_file, aws_context_resource_dct
+    load, override_path, aws_context_json_complete_dct, aws_context_resource_dct
 ):
-    result = load_context("context.json", mocker_cache_file)
+    override_path.parent.mkdir()
+    override_path.write_text(json.dumps(aws_context_json_complete_dct))
+    result = load()
     assert list(result.resource_map.keys()) == list(aws_context_resource_dct.keys())
 
 
-def test_load_context_reads_package_file(mocker_inexistant_cache_file):
-    load_context("context.json", mocker_inexistant_cache_file)
+def test_load_context_reads_package_file(load, cache_dir):
+    result = load()
+    assert SERVERLESS_FUNCTION in result
+    assert result.description(SERVERLESS_FUNCTION)
+    assert len(list(cache_dir.iterdir())) == 1
 
 
 def test_with_custom(aws_context, mocker_custom_file):
@@ -81,3 +100,146 @@ def test_with_custom(aws_context, mocker_custom_file):
         ]
         == new_description
     )
+
+
+def test_load_context_reads_override_artifact(
+    load, override_path, aws_context_json_complete_dct
+):
+    override_path.parent.mkdir()
+    override_path.write_text(json.dumps(aws_context_json_complete_dct))
+    write_artifact(
+        aws_context_json_complete_dct, artifact_path(override_path), override_path
+    )
+    result = load()
+    assert isinstance(result.resource_map, Mapping)
+    assert result.documentation is not None
+    resources = aws_context_json_complete_dct[AWSSpecification.RESOURCE_TYPES]
+    assert list(result.resource_map) == list(resources)
+    for resource, tree in resources.items():
+        name = AWSResourceName(value=resource)
+        assert result.description(name) == tree["MarkdownDocumentation"]
+        for prop, prop_tree in tree["Properties"].items():
+            assert result.description(name / prop) == prop_tree["MarkdownDocumentation"]
+
+
+def test_load_spec_falls_back_to_json(tmp_path, aws_context_json_complete_dct):
+    path = tmp_path / "context.json"
+    path.write_text(json.dumps(aws_context_json_complete_dct))
+    assert load_spec(path) == aws_context_json_complete_dct
+    write_artifact(aws_context_json_complete_dct, artifact_path(path), path)
+    assert isinstance(load_spec(path), SpecArtifact)
+
+
+def test_load_context_compiles_once(load, mocker):
+    compile_spy = mocker.spy(context, "_compile")
+    description = load().description(SERVERLESS_FUNCTION)
+    assert compile_spy.call_count == 1
+    json_spy = mocker.spy(json, "load")
+    assert load().description(SERVERLESS_FUNCTION) == description
+    assert compile_spy.call_count == 1
+    assert json_spy.call_count == 0
+
+
+def test_load_context_recompiles_when_custom_changes(load, custom_path, cache_dir):
+    custom_path.parent.mkdir()
+    for description in ("first", "second"):
+        custom_path.write_text(
+            json.dumps(
+                {
+                    "ResourceTypes": {
+                        "AWS::Serverless::Function": {
+                            "MarkdownDocumentation": description
+                        }
+                    }
+                }
+            )
+        )
+        result = load()
+        assert result.description(SERVERLESS_FUNCTION) == description
+        # Custom content is merged into, rather than replaces, the spec
+        assert AWSResourceName(value="AWS::Serverless::Api") in result
+        assert result.description(SERVERLESS_FUNCTION / "Handler")
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_load_context_prunes_compiled(
+    load, custom_path, cache_dir, monkeypatch, mocker
+):
+    monkeypatch.setattr(context, "MAX_COMPILED_CONTEXTS", 1)
+    custom_path.parent.mkdir()
+    for description in ("first", "second"):
+        custom_path.write_text(json.dumps({"Description": description}))
+        load()
+    assert len(list(cache_dir.iterdir())) == 1
+    compile_spy = mocker.spy(context, "_compile")
+    load()
+    assert compile_spy.call_count == 0
+
+
+def test_load_context_without_cache_dir(load, cache_dir):
+    cache_dir.write_text("not a directory")
+    assert SERVERLESS_FUNCTION in load()
+
+
+@pytest.mark.parametrize(
+    "base,overlay,expected",
+    [
+        ({"a": {"b": 1, "c": 2}}, {"a": {"c": 3}}, {"a": {"b": 1, "c": 3}}),
+        ({"a": {"b": 1}}, {"a": 2}, {"a": 2}),
+        ({"a": 1}, {"b": {"c": 2}}, {"a": 1, "b": {"c": 2}}),
+        ({"a": [1]}, {"a": [2]}, {"a": [2]}),
+    ],
+)
+def test_deep_merge(base, overlay, expected):
+    base_copy = json.loads(json.dumps(base))
+    assert deep_merge(base, overlay) == expected
+    assert base == base_copy
+
+
+@pytest.mark.parametrize("writable", [True, False])
+def test_load_context_from_bundled_artifact(
+    load,
+    tmp_path,
+    custom_path,
+    cache_dir,
+    monkeypatch,
+    aws_context_json_complete_dct,
+    writable,
+):
+    spec_path = tmp_path / "bundled.json"
+    spec_path.write_text(json.dumps(aws_context_json_complete_dct))
+    write_artifact(aws_context_json_complete_dct, artifact_path(spec_path), spec_path)
+    monkeypatch.setattr(context, "load_spec", lambda _: load_spec(spec_path))
+    custom_path.parent.mkdir()
+    custom_path.write_text(json.dumps({"Description": "custom"}))
+    if not writable:
+        cache_dir.write_text("not a directory")
+    result = load()
+    resources = aws_context_json_complete_dct[AWSSpecification.RESOURCE_TYPES]
+    for resource, tree in resources.items():
+        name = AWSResourceName(value=resource)
+        assert result.description(name) == tree["MarkdownDocumentation"]
+        assert result.ref_return_value(name) == tree["RefReturnValue"]
+
+
+def test_load_contexts_in_background(monkeypatch):
+    cfn, sam = AWSContext({}, {}), AWSContext({}, {})
+    monkeypatch.setattr(context, "load_cfn_context", lambda: cfn)
+    monkeypatch.setattr(context, "load_context", lambda resource, override_path: sam)
+    cfn_future, sam_future = context.load_contexts_in_background()
+    assert cfn_future.result(timeout=5) is cfn
+    assert sam_future.result(timeout=5) is sam
+
+
+def test_load_contexts_in_background_cfn_failure(monkeypatch):
+    sam = AWSContext({}, {})
+
+    def fail():
+        raise ValueError("invalid context")
+
+    monkeypatch.setattr(context, "load_cfn_context", fail)
+    monkeypatch.setattr(context, "load_context", lambda resource, override_path: sam)
+    cfn_future, sam_future = context.load_contexts_in_background()
+    with pytest.raises(ValueError):
+        cfn_future.result(timeout=5)
+    assert sam_future.result(timeout=5) is sam
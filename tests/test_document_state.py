@@ -0,0 +1,140 @@
+"""
+Tests for cfn_lsp_extra/document_state.py
+"""
+import pytest
+from lsprotocol.types import Position
+from pygls.workspace import TextDocument
+
+from cfn_lsp_extra.decode import CfnDecodingError
+from cfn_lsp_extra.document_state import DocumentStateCache
+from cfn_lsp_extra.document_state import is_document_sam
+from cfn_lsp_extra.source_text import SourceText
+
+
+@pytest.fixture
+def document_string():
+    return """AWSTemplateFormatVersion: "2010-09-09"
+Resources:
+  PublicSubnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      CidrBlock: 172.31.48.0/20"""
+
+
+def test_state_reused_for_same_version(document_string):
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source=document_string, version=1)
+    state = cache.get(document)
+    assert cache.get(document) is state
+    assert state.tree() is cache.get(document).tree()
+
+
+def test_state_shares_source_text(document_string):
+    document = TextDocument(uri="file:///t.yaml", source=document_string, version=1)
+    state = DocumentStateCache().get(document)
+    assert state.text is SourceText.of(document)
+    assert state.source == document_string
+
+
+def test_state_dropped_for_new_version(document_string):
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source=document_string, version=1)
+    state = cache.get(document)
+    new_document = TextDocument(
+        uri="file:///t.yaml", source=document_string + "\n", version=2
+    )
+    new_state = cache.get(new_document)
+    assert new_state is not state
+    assert new_state.version == 2
+
+
+def test_state_removed(document_string):
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source=document_string, version=1)
+    state = cache.get(document)
+    cache.remove(document.uri)
+    assert cache.get(document) is not state
+
+
+def test_state_decoding_error_is_cached():
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source="foo: {bar", version=1)
+    state = cache.get(document)
+    with pytest.raises(CfnDecodingError):
+        state.tree()
+    with pytest.raises(CfnDecodingError):
+        state.tree()
+
+
+def test_state_unfinished_tree_reused_for_same_position(document_string):
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source=document_string, version=1)
+    state = cache.get(document)
+    position = Position(line=5, character=10)
+    assert state.unfinished_tree(position) is state.unfinished_tree(position)
+
+
+def test_is_document_sam():
+    document = TextDocument(
+        uri="file:///t.yaml", source="Transform: AWS::Serverless-2016-10-31\n"
+    )
+    assert is_document_sam(document)
+
+
+def test_state_update_decodes_incrementally(document_string):
+    from lsprotocol.types import Range
+    from lsprotocol.types import TextDocumentContentChangePartial
+
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source=document_string, version=1)
+    tree = cache.get(document).tree()
+    change = TextDocumentContentChangePartial(
+        range=Range(
+            start=Position(line=5, character=24), end=Position(line=5, character=26)
+        ),
+        text="50",
+    )
+    document.apply_change(change)
+    document.version = 2
+    state = cache.update(document, [change])
+    assert state.base[0] is tree
+    assert state.tree()["Resources"]["PublicSubnet"]["Properties"]["CidrBlock"] == (
+        "172.31.50.0/20"
+    )
+
+
+def test_state_update_decodes_in_full_after_later_changes():
+    from lsprotocol.types import Range
+    from lsprotocol.types import TextDocumentContentChangePartial
+
+    source = """Resources:
+  First:
+    Type: AWS::SNS::Topic
+  Second:
+    Type: AWS::SNS::Topic
+"""
+    cache = DocumentStateCache()
+    document = TextDocument(uri="file:///t.yaml", source=source, version=1)
+    cache.get(document).tree()
+
+    def replace(line, text):
+        return TextDocumentContentChangePartial(
+            range=Range(
+                start=Position(line=line, character=10),
+                end=Position(line=line, character=25),
+            ),
+            text=text,
+        )
+
+    first, second = replace(2, "AWS::SQS::Queue"), replace(4, "AWS::S3::Bucket")
+    # Both changes are applied before the state of the first is updated
+    document.apply_change(first)
+    document.apply_change(second)
+    document.version = 3
+    state = cache.update(document, [first], version=2)
+    assert state.base is None
+    resources = state.tree()["Resources"]
+    assert resources["First"]["Type"] == "AWS::SQS::Queue"
+    assert resources["Second"]["Type"] == "AWS::S3::Bucket"
+    assert cache.update(document, [second], version=3) is state
+    assert cache.current(document.uri) is state
@@ -0,0 +1,62 @@
+"""
+Tests for cfn_lsp_extra/index_store.py
+"""
+from cfn_lsp_extra.index_store import IndexStore, StoredFile, store_version
+
+STORED = StoredFile(mtime_ns=1, size=2, digest="abc", summary={"exports": []})
+
+
+def test_store_version():
+    assert store_version().startswith("1:")
+
+
+def test_put_get(tmp_path):
+    store = IndexStore(tmp_path / "cache" / "index.sqlite", "v1")
+    assert store.get("/ws/a.yaml") is None
+    store.put("/ws/a.yaml", STORED)
+    store.put("/ws/b.yaml", StoredFile(mtime_ns=1, size=2, digest="d", summary=None))
+    assert store.get("/ws/a.yaml") == STORED
+    assert store.get("/ws/b.yaml").summary is None
+    store.close()
+    assert IndexStore(tmp_path / "cache" / "index.sqlite", "v1").get(
+        "/ws/a.yaml"
+    ) == STORED
+
+
+def test_other_version_is_dropped(tmp_path):
+    store = IndexStore(tmp_path / "index.sqlite", "v1")
+    store.put("/ws/a.yaml", STORED)
+    store.close()
+    newer = IndexStore(tmp_path / "index.sqlite", "v2")
+    assert newer.get("/ws/a.yaml") is None
+    newer.put("/ws/a.yaml", STORED)
+    newer.close()
+    assert IndexStore(tmp_path / "index.sqlite", "v2").get("/ws/a.yaml") == STORED
+
+
+def test_retain(tmp_path):
+    store = IndexStore(tmp_path / "index.sqlite", "v1")
+    for path in ("/ws/a.yaml", "/ws/sub/b.yaml", "/other/c.yaml"):
+        store.put(path, STORED)
+    store.retain("/ws", ["/ws/a.yaml"])
+    assert store.get("/ws/a.yaml") == STORED
+    assert store.get("/ws/sub/b.yaml") is None
+    assert store.get("/other/c.yaml") == STORED
+
+
+def test_remove(tmp_path):
+    store = IndexStore(tmp_path / "index.sqlite", "v1")
+    store.put("/ws/a.yaml", STORED)
+    store.put("/ws/b.yaml", STORED)
+    store.remove("/ws/a.yaml")
+    store.remove("/ws/c.yaml")
+    assert store.get("/ws/a.yaml") is None
+    assert store.get("/ws/b.yaml") == STORED
+
+
+def test_unusable_store(tmp_path):
+    (tmp_path / "file").write_text("")
+    store = IndexStore(tmp_path / "file" / "index.sqlite", "v1")
+    store.put("/ws/a.yaml", STORED)
+    store.remove("/ws/a.yaml")
+    assert store.get("/ws/a.yaml") is None
@@ -0,0 +1,320 @@
+"""
+Tests for cfn_lsp_extra/references.py
+"""
+import pytest
+from lsprotocol.types import (
+    DocumentHighlightKind,
+    Position,
+    TextDocumentContentChangePartial,
+)
+from pygls.workspace import TextDocument
+
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.references import (
+    highlights,
+    reference_index,
+    references,
+    rename,
+)
+from cfn_lsp_extra.source_text import SourceText
+
+TEMPLATE = """AWSTemplateFormatVersion: "2010-09-09"
+Parameters:
+  Env:
+    Type: String
+Conditions:
+  IsProd: !Equals [!Ref Env, prod]
+Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+    Condition: IsProd
+  Topic:
+    Type: AWS::SNS::Topic
+    DependsOn: Bucket
+    Properties:
+      TopicName: !Sub "${Bucket}-${Env}-${AWS::Region}"
+      DisplayName: !GetAtt Bucket.Arn
+  Queue:
+    Type: AWS::SQS::Queue
+    Properties:
+      QueueName:
+        Ref: 'Bucket'
+      Tags:
+        - Key: !Ref AWS::Region
+          Value: !Sub ${Bucket.Arn}
+Outputs:
+  BucketName:
+    Condition: IsProd
+    Value: !Ref Bucket
+"""
+
+URI = "file:///template.yaml"
+
+
+@pytest.fixture
+def document():
+    return TextDocument(URI, TEMPLATE)
+
+
+@pytest.fixture
+def template():
+    return decode(TEMPLATE, "template.yaml")
+
+
+def ranges(locations):
+    return [
+        (r.range.start.line, r.range.start.character, r.range.end.character)
+        for r in locations
+    ]
+
+
+BUCKET_USES = [
+    (12, 15, 21),
+    (14, 25, 31),
+    (15, 27, 33),
+    (20, 14, 20),
+    (23, 24, 30),
+    (27, 16, 22),
+]
+
+
+@pytest.mark.parametrize(
+    "line,char",
+    [
+        (7, 2),  # The definition
+        (7, 8),
+        (12, 17),  # DependsOn
+        (14, 27),  # Sub
+        (15, 28),  # GetAtt
+        (20, 16),  # Quoted Ref
+        (23, 26),  # Sub of an attribute
+        (27, 21),  # Ref
+    ],
+)
+def test_references(template, document, line, char):
+    result = references(template, document, Position(line=line, character=char))
+    assert all(location.uri == URI for location in result)
+    assert ranges(result) == [(7, 2, 8)] + BUCKET_USES
+
+
+def test_references_without_declaration(template, document):
+    result = references(
+        template, document, Position(line=7, character=4), include_declaration=False
+    )
+    assert ranges(result) == BUCKET_USES
+
+
+def test_references_of_parameter_and_condition(template, document):
+    env = references(template, document, Position(line=2, character=3))
+    assert ranges(env) == [(2, 2, 5), (5, 24, 27), (14, 35, 38)]
+    is_prod = references(template, document, Position(line=9, character=16))
+    assert ranges(is_prod) == [(5, 2, 8), (9, 15, 21), (26, 15, 21)]
+
+
+@pytest.mark.parametrize(
+    "line,char",
+    [
+        (0, 3),  # Not a name
+        (22, 22),  # A pseudo parameter
+        (14, 45),  # A pseudo parameter in a Sub
+    ],
+)
+def test_references_of_undefined(template, document, line, char):
+    assert references(template, document, Position(line=line, character=char)) is None
+
+
+def test_reference_index_is_memoized(template, document):
+    index = reference_index(template, SourceText.of(document))
+    assert reference_index(template, SourceText.of(document)) is index
+
+
+def test_highlights(template, document):
+    result = highlights(template, document, Position(line=27, character=18))
+    assert [h.kind for h in result] == [DocumentHighlightKind.Write] + [
+        DocumentHighlightKind.Read
+    ] * len(BUCKET_USES)
+    assert ranges(result) == [(7, 2, 8)] + BUCKET_USES
+
+
+def test_rename(template, document):
+    edit = rename(template, document, Position(line=12, character=16), "Store")
+    edits = edit.changes[URI]
+    assert {e.new_text for e in edits} == {"Store"}
+    assert ranges(edits) == [(7, 2, 8)] + BUCKET_USES
+
+
+def test_rename_to_invalid_name(template, document):
+    assert rename(template, document, Position(line=7, character=2), "My-Bucket") is None
+
+
+def test_references_json():
+    source = """{
+  "Parameters": {"Env": {"Type": "String"}},
+  "Resources": {
+    "Bucket": {
+      "Type": "AWS::S3::Bucket",
+      "Properties": {"BucketName": {"Fn::Sub": "${Env}-bucket"}}
+    },
+    "Topic": {"Type": "AWS::SNS::Topic", "DependsOn": "Bucket"}
+  },
+  "Outputs": {"Env": {"Value": {"Ref": "Env"}}}
+}
+"""
+    document = TextDocument("file:///template.json", source)
+    template = decode(source, "template.json")
+    result = references(template, document, Position(line=9, character=40))
+    assert ranges(result) == [(1, 18, 21), (5, 50, 53), (9, 40, 43)]
+    bucket = references(template, document, Position(line=7, character=55))
+    assert ranges(bucket) == [(3, 5, 11), (7, 55, 61)]
+
+
+def test_rename_list_forms_json():
+    source = """{
+  "Resources": {
+    "Bucket": {"Type": "AWS::S3::Bucket"},
+    "Key": {"Type": "AWS::KMS::Key"},
+    "Topic": {
+      "Type": "AWS::SNS::Topic",
+      "DependsOn": ["Key", "Bucket"],
+      "Properties": {
+        "DisplayName": {"Fn::GetAtt": ["Bucket", "Arn"]},
+        "TopicName": {"Fn::Sub": ["${Bucket}-${Name}", {"Name": "topic"}]}
+      }
+    }
+  }
+}
+"""
+    uri = "file:///template.json"
+    document = TextDocument(uri, source)
+    template = decode(source, "template.json")
+    edit = rename(template, document, Position(line=2, character=6), "Store")
+    assert ranges(edit.changes[uri]) == [
+        (2, 5, 11),
+        (6, 28, 34),
+        (8, 40, 46),
+        (9, 37, 43),
+    ]
+    
+
+def test_references_list_forms_yaml():
+    source = """Conditions:
+  IsProd: !Equals [prod, prod]
+Mappings:
+  Names:
+    Bucket:
+      Name: bucket
+Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+  Topic:
+    Type: AWS::SNS::Topic
+    DependsOn:
+      - Bucket
+    Properties:
+      DisplayName: !GetAtt [Bucket, Arn]
+      TopicName: !Sub ["${Bucket}-${Name}", {Name: topic}]
+      KmsMasterKeyId: !If [IsProd, !FindInMap [Names, Bucket, Name], !Ref Bucket]
+"""
+    document = TextDocument(URI, source)
+    template = decode(source, "template.yaml")
+    bucket = references(template, document, Position(line=7, character=2))
+    assert ranges(bucket) == [
+        (7, 2, 8),
+        (12, 8, 14),
+        (14, 28, 34),
+        (15, 26, 32),
+        (16, 74, 80),
+    ]
+    is_prod = references(template, document, Position(line=1, character=2))
+    assert ranges(is_prod) == [(1, 2, 8), (16, 27, 33)]
+    names = references(template, document, Position(line=3, character=2))
+    assert ranges(names) == [(3, 2, 7), (16, 47, 52)]
+
+
+def test_rename_with_unlocated_use():
+    source = """Resources:
+  Bucket:
+    Type: AWS::S3::Bucket
+  Instance:
+    Type: AWS::EC2::Instance
+    Properties:
+      UserData: !Sub |
+        echo ${Bucket}
+      KeyName: !Ref Bucket
+"""
+    document = TextDocument(URI, source)
+    template = decode(source, "template.yaml")
+    position = Position(line=1, character=2)
+    assert ranges(references(template, document, position)) == [
+        (1, 2, 8),
+        (8, 20, 26),
+    ]
+    assert rename(template, document, position, "Store") is None
+
+
+QUOTED_TEMPLATE = """Parameters:
+  "Quoted":
+    Type: String
+  'Single':
+    Type: String
+Resources:
+  Topic:
+    Type: AWS::SNS::Topic
+    Properties:
+      TopicName: !Ref Quoted
+      DisplayName: !Ref Single
+"""
+
+
+@pytest.mark.parametrize(
+    "line,char,expected",
+    [
+        (9, 22, [(1, 3, 9), (9, 22, 28)]),
+        (1, 8, [(1, 3, 9), (9, 22, 28)]),
+        (10, 24, [(3, 3, 9), (10, 24, 30)]),
+    ],
+)
+def test_references_of_quoted_definition(line, char, expected):
+    document = TextDocument(URI, QUOTED_TEMPLATE)
+    template = decode(QUOTED_TEMPLATE, "template.yaml")
+    position = Position(line=line, character=char)
+    assert ranges(references(template, document, position)) == expected
+    assert ranges(highlights(template, document, position)) == expected
+
+
+@pytest.mark.parametrize(
+    "line,char,expected",
+    [(9, 22, [(1, 3, 9), (9, 22, 28)]), (10, 24, [(3, 3, 9), (10, 24, 30)])],
+)
+def test_rename_quoted_definition(line, char, expected):
+    document = TextDocument(URI, QUOTED_TEMPLATE)
+    template = decode(QUOTED_TEMPLATE, "template.yaml")
+    edit = rename(template, document, Position(line=line, character=char), "Renamed")
+    assert ranges(edit.changes[URI]) == expected
+    edited = TextDocument(URI, QUOTED_TEMPLATE)
+    for text_edit in reversed(edit.changes[URI]):
+        edited.apply_change(
+            TextDocumentContentChangePartial(
+                range=text_edit.range, text=text_edit.new_text
+            )
+        )
+    renamed = decode(edited.source, "template.yaml")
+    assert "Renamed" in renamed["Parameters"]
+
+
+@pytest.mark.parametrize(
+    "line,char,new_name",
+    [
+        (7, 2, "Env"),
+        (7, 2, "Topic"),
+        (2, 2, "Bucket"),
+    ],
+)
+def test_rename_to_defined_name(template, document, line, char, new_name):
+    position = Position(line=line, character=char)
+    assert rename(template, document, position, new_name) is None
+
+
+def test_rename_to_name_defined_elsewhere(template, document):
+    edit = rename(template, document, Position(line=5, character=2), "Bucket")
+    assert ranges(edit.changes[URI]) == [(5, 2, 8), (9, 15, 21), (26, 15, 21)]
@@ -1,5 +1,9 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
 from cfn_lsp_extra.aws_data import AWSContext
-from cfn_lsp_extra.server import server
+from cfn_lsp_extra.server import aws_context_of, server
 
 
 def test_create_server():
@@ -7,3 +11,38 @@ def test_create_server():
         AWSContext(resource_map={}, property_map={}),
         AWSContext(resource_map={}, property_map={}),
     )
+
+
+def test_create_server_with_loading_contexts():
+    assert server(Future(), Future()) is not None
+
+
+def test_aws_context_of_context():
+    aws_context = AWSContext(resource_map={}, property_map={})
+    assert asyncio.run(aws_context_of(aws_context)) is aws_context
+
+
+def test_aws_context_of_loaded_future():
+    aws_context = AWSContext(resource_map={}, property_map={})
+    future = Future()
+    future.set_result(aws_context)
+    assert asyncio.run(aws_context_of(future, timeout=0)) is aws_context
+
+
+def test_aws_context_of_future_loaded_while_waiting():
+    aws_context = AWSContext(resource_map={}, property_map={})
+    future = Future()
+    threading.Timer(0.05, future.set_result, (aws_context,)).start()
+    assert asyncio.run(aws_context_of(future, timeout=5)) is aws_context
+
+
+def test_aws_context_of_loading_future():
+    future = Future()
+    assert asyncio.run(aws_context_of(future, timeout=0.01)) is None
+    assert not future.cancelled()
+
+
+def test_aws_context_of_failed_future():
+    future = Future()
+    future.set_exception(OSError("no spec"))
+    assert asyncio.run(aws_context_of(future)) is None
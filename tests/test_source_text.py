@@ -0,0 +1,61 @@
+"""
+Tests for cfn_lsp_extra/source_text.py
+"""
+import re
+
+import pytest
+from pygls.workspace import TextDocument
+
+from cfn_lsp_extra.source_text import SourceText
+
+
+@pytest.mark.parametrize(
+    "text", ["a\nbc\n", "ab\r\ncd\rq\r\r\n", "", "x", "\n\n", "Resources:\n  Foo: 1"]
+)
+def test_lines(text):
+    source_text = SourceText(text)
+    lines = re.split(r"\r\n|\r|\n", text)
+    assert source_text.line_count == len(lines)
+    assert [source_text.line(i) for i in range(source_text.line_count)] == lines
+
+
+@pytest.mark.parametrize("text", ["a\nbc\n", "ab\r\ncd\rq\r\r\n", "x"])
+def test_offset_position_round_trip(text):
+    source_text = SourceText(text)
+    for offset in range(len(text) + 1):
+        line, char = source_text.position_at(offset)
+        assert source_text.offset_at(line, char) == offset
+
+
+def test_position_at():
+    source_text = SourceText("ab\r\ncd\nef")
+    assert source_text.position_at(0) == (0, 0)
+    assert source_text.position_at(5) == (1, 1)
+    assert source_text.position_at(8) == (2, 1)
+
+
+def test_line_out_of_range():
+    with pytest.raises(IndexError):
+        SourceText("a\nb").line(2)
+
+
+@pytest.mark.parametrize("text", ["a\nbc\n", "ab\r\ncd\rq\r\r\n", "x"])
+@pytest.mark.parametrize("content", ["", "patched", "two\nlines"])
+def test_with_line(text, content):
+    source_text = SourceText(text)
+    for line in range(source_text.line_count):
+        patched = source_text.with_line(line, content)
+        expected = re.split(r"\r\n|\r|\n", text)
+        expected[line] = content
+        assert patched.line_starts == SourceText(patched.text).line_starts
+        assert "\n".join(
+            patched.line(i) for i in range(patched.line_count)
+        ) == "\n".join(expected)
+
+
+def test_of_is_cached_per_content():
+    document = TextDocument(uri="file:///t.yaml", source="foo: bar\n", version=1)
+    text = SourceText.of(document)
+    assert SourceText.of(document) is text
+    document._source = "foo: baz\n"
+    assert SourceText.of(document).text == "foo: baz\n"
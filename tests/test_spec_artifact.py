@@ -0,0 +1,195 @@
+"""
+Tests for cfn_lsp_extra/spec_artifact.py
+"""
+import json
+
+import pytest
+
+from cfn_lsp_extra.aws_data import AWSContext, AWSResourceName, AWSSpecification
+from cfn_lsp_extra.spec_artifact import (
+    ARTIFACT_SUFFIX,
+    DocumentationStore,
+    LazySection,
+    SpecArtifact,
+    artifact_path,
+    open_artifact,
+    write_artifact,
+)
+
+SPEC = {
+    "PropertyTypes": {
+        "AWS::S3::Bucket.Tag": {
+            "Properties": {"Key": {"Type": "String"}, "Value": {"Type": "String"}}
+        },
+    },
+    "ResourceTypes": {
+        "AWS::S3::Bucket": {
+            "MarkdownDocumentation": "A bucket ✓",
+            "RefReturnValue": "The name",
+            "Attributes": {"Arn": {"MarkdownDocumentation": "The arn"}},
+            "Properties": {
+                "Tags": {
+                    "ItemType": "Tag",
+                    "Type": "List",
+                    "MarkdownDocumentation": "Some tags",
+                    "Documentation": "https://docs",
+                }
+            },
+        },
+        "AWS::SNS::Topic": {"Documentation": "https://docs", "Properties": {}},
+    },
+    "ResourceSpecificationVersion": "1.0.0",
+    "parse_success_ratio": 0.97,
+}
+
+
+@pytest.fixture
+def spec_path(tmp_path):
+    path = tmp_path / "context.json"
+    path.write_text(json.dumps(SPEC, indent=2))
+    write_artifact(SPEC, artifact_path(path), source=path)
+    return path
+
+
+def test_artifact_path(tmp_path):
+    assert artifact_path(tmp_path / "context.json") == tmp_path / (
+        "context" + ARTIFACT_SUFFIX
+    )
+
+
+def test_artifact_round_trip(spec_path):
+    artifact = open_artifact(spec_path)
+    assert isinstance(artifact, SpecArtifact)
+    assert artifact["ResourceSpecificationVersion"] == "1.0.0"
+    assert artifact["parse_success_ratio"] == 0.97
+    assert isinstance(artifact[AWSSpecification.RESOURCE_TYPES], LazySection)
+    assert isinstance(artifact.documentation, DocumentationStore)
+    # Equal texts share an entry
+    assert list(artifact.documentation.values()) == [
+        "A bucket ✓",
+        "The name",
+        "The arn",
+        "Some tags",
+        "https://docs",
+    ]
+    resources = artifact[AWSSpecification.RESOURCE_TYPES]
+    assert resources["AWS::S3::Bucket"] == {
+        "MarkdownDocumentationId": 0,
+        "RefReturnValueId": 1,
+        "Attributes": {"Arn": {"MarkdownDocumentationId": 2}},
+        "Properties": {
+            "Tags": {
+                "ItemType": "Tag",
+                "Type": "List",
+                "MarkdownDocumentationId": 3,
+                "DocumentationId": 4,
+            }
+        },
+    }
+    assert resources["AWS::SNS::Topic"] == {"DocumentationId": 4, "Properties": {}}
+    assert dict(artifact[AWSSpecification.PROPERTY_TYPES]) == SPEC["PropertyTypes"]
+
+
+def test_documentation_store_of_unknown_id(spec_path):
+    documentation = open_artifact(spec_path).documentation
+    assert len(documentation) == 5
+    for doc_id in (-1, 5):
+        assert doc_id not in documentation
+        with pytest.raises(KeyError):
+            documentation[doc_id]
+
+
+def test_sections_decode_lazily(spec_path):
+    resources = open_artifact(spec_path)[AWSSpecification.RESOURCE_TYPES]
+    assert list(resources) == ["AWS::S3::Bucket", "AWS::SNS::Topic"]
+    assert "AWS::SNS::Topic" in resources
+    assert "AWS::SQS::Queue" not in resources
+    assert resources._decoded == {}
+    bucket = resources["AWS::S3::Bucket"]
+    assert resources["AWS::S3::Bucket"] is bucket
+    assert list(resources._decoded) == ["AWS::S3::Bucket"]
+    assert resources.get("AWS::SQS::Queue") is None
+
+
+def test_aws_context_of_artifact(spec_path):
+    artifact = open_artifact(spec_path)
+    context = AWSContext(
+        artifact[AWSSpecification.RESOURCE_TYPES],
+        artifact[AWSSpecification.PROPERTY_TYPES],
+        artifact.documentation,
+    )
+    bucket = AWSResourceName(value="AWS::S3::Bucket")
+    assert context.description(bucket) == "A bucket ✓"
+    assert context.return_values(bucket) == {"Arn": "The arn"}
+    assert context.ref_return_value(bucket) == "The name"
+    assert context.ref_return_value(AWSResourceName(value="AWS::SNS::Topic")) == (
+        "unknown"
+    )
+    assert "Key" in context[bucket / "Tags"]["Properties"]
+    # Tags is given by the property type, which has no documentation
+    assert context.description(bucket / "Tags") == ""
+
+
+def test_open_artifact_of_spec_without_one(tmp_path):
+    path = tmp_path / "context.json"
+    path.write_text(json.dumps(SPEC))
+    assert open_artifact(path) is None
+
+
+def test_open_stale_artifact(spec_path):
+    spec_path.write_text(json.dumps(SPEC))
+    assert open_artifact(spec_path) is None
+
+
+def test_open_stale_artifact_of_same_size(spec_path):
+    content = spec_path.read_text()
+    assert '"1.0.0"' in content
+    spec_path.write_text(content.replace('"1.0.0"', '"1.0.1"'))
+    assert open_artifact(spec_path) is None
+
+
+@pytest.mark.parametrize("content", [b"", b"not an artifact at all"])
+def test_open_invalid_artifact(tmp_path, content):
+    path = tmp_path / "context.json"
+    artifact_path(path).write_bytes(content)
+    assert open_artifact(path) is None
+
+
+def test_write_artifact_replaces_mapped_artifact(spec_path):
+    artifact = open_artifact(spec_path)
+    write_artifact({**SPEC, "ResourceTypes": {}}, artifact_path(spec_path))
+    resources = artifact[AWSSpecification.RESOURCE_TYPES]
+    assert resources["AWS::SNS::Topic"] == {"DocumentationId": 4, "Properties": {}}
+    assert len(open_artifact(spec_path)[AWSSpecification.RESOURCE_TYPES]) == 0
+    assert sorted(p.name for p in spec_path.parent.iterdir()) == [
+        "context.json",
+        "context.spec",
+    ]
+
+
+def test_write_artifact_of_artifact(spec_path, tmp_path):
+    artifact = open_artifact(spec_path)
+    spec = {
+        **artifact,
+        "ResourceTypes": {
+            **artifact["ResourceTypes"],
+            "AWS::SNS::Topic": {"MarkdownDocumentation": "A topic"},
+        },
+    }
+    spec["ResourceTypes"]["AWS::S3::Bucket"] = {
+        **spec["ResourceTypes"]["AWS::S3::Bucket"],
+        "MarkdownDocumentation": "Custom",
+    }
+    path = tmp_path / "merged.spec"
+    write_artifact(spec, path, documentation=artifact.documentation)
+    merged = SpecArtifact(path)
+    context = AWSContext(
+        merged["ResourceTypes"], merged["PropertyTypes"], merged.documentation
+    )
+    bucket = AWSResourceName(value="AWS::S3::Bucket")
+    assert context.description(bucket) == "Custom"
+    assert context.ref_return_value(bucket) == "The name"
+    assert context.description(bucket / "Tags") == ""
+    assert context.return_values(bucket) == {"Arn": "The arn"}
+    assert context.description(AWSResourceName(value="AWS::SNS::Topic")) == "A topic"
+    assert "A bucket ✓" not in merged.documentation.values()
@@ -0,0 +1,88 @@
+"""
+Tests for cfn_lsp_extra/symbols.py
+"""
+from cfn_lsp_extra.aws_data import AWSLogicalId, AWSParameter, AWSSymbol
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.decode.position import Spanning
+from cfn_lsp_extra.symbols import symbol_table
+
+TEMPLATE = """AWSTemplateFormatVersion: "2010-09-09"
+Parameters:
+  VpcId:
+    Type: String
+    Default: vpc-1
+  Subnet:
+    Type: String
+  Untyped: {}
+Conditions:
+  IsProd: !Equals [!Ref Env, prod]
+Mappings:
+  Regions:
+    eu-west-1:
+      Ami: ami-1
+Resources:
+  Subnet:
+    Type: AWS::EC2::Subnet
+    Properties:
+      VpcId: !Ref VpcId
+  Bucket:
+    Type: AWS::S3::Bucket
+Outputs:
+  SubnetId:
+    Value: !Ref Subnet
+"""
+
+VPC_ID = AWSParameter(logical_name="VpcId", type_="String", default="vpc-1")
+SUBNET = AWSLogicalId(logical_name="Subnet", type_="AWS::EC2::Subnet")
+BUCKET = AWSLogicalId(logical_name="Bucket", type_="AWS::S3::Bucket")
+
+
+def test_symbol_table_sections():
+    symbols = symbol_table(decode(TEMPLATE, "f.yaml"))
+    assert list(symbols.section("Parameters")) == ["VpcId", "Subnet", "Untyped"]
+    assert symbols.get("Conditions", "IsProd") == Spanning(
+        value=AWSSymbol(section="Conditions", logical_name="IsProd"),
+        line=9,
+        char=2,
+        span=6,
+    )
+    assert symbols.get("Mappings", "Regions").line == 11
+    assert symbols.get("Outputs", "SubnetId").line == 22
+    assert symbols.get("Resources", "VpcId") is None
+    assert symbols.section("Transform") == {}
+
+
+def test_symbol_table_ref_source():
+    symbols = symbol_table(decode(TEMPLATE, "f.yaml"))
+    assert symbols.ref_source("VpcId") == Spanning(
+        value=VPC_ID, line=2, char=2, span=5
+    )
+    # Resources take precedence over parameters
+    assert symbols.ref_source("Subnet") == Spanning(
+        value=SUBNET, line=15, char=2, span=6
+    )
+    assert symbols.ref_source("Subnet", ("Parameters",)).line == 5
+    assert symbols.ref_source("Untyped") is None
+    assert symbols.ref_source("IsProd") is None
+
+
+def test_symbol_table_ref_sources():
+    symbols = symbol_table(decode(TEMPLATE, "f.yaml"))
+    subnet_parameter = AWSParameter(logical_name="Subnet", type_="String")
+    assert symbols.ref_sources() == [SUBNET, BUCKET, VPC_ID, subnet_parameter]
+    assert symbols.ref_sources(("Resources",)) == [SUBNET, BUCKET]
+
+
+def test_symbol_table_is_built_once_per_template():
+    template = decode(TEMPLATE, "f.yaml")
+    assert symbol_table(template) is symbol_table(template)
+    assert symbol_table(decode(TEMPLATE, "f.yaml")) is not symbol_table(template)
+
+
+def test_symbol_table_for_mapping():
+    mapping = {"Resources": {"Bucket": {}}, "__position__Resources": [0, 0]}
+    assert symbol_table(mapping).ref_sources() == []
+    mapping["Resources"]["__position__Bucket"] = [1, 2]
+    assert symbol_table(mapping).ref_sources() == [
+        AWSLogicalId(logical_name="Bucket", type_=None)
+    ]
@@ -0,0 +1,214 @@
+"""
+Tests for cfn_lsp_extra/workspace_index.py
+"""
+import json
+import os
+
+import pytest
+from lsprotocol.types import Position
+from pygls.uris import from_fs_path
+
+from cfn_lsp_extra import workspace_index
+from cfn_lsp_extra.aws_data import AWSExport, AWSLogicalId
+from cfn_lsp_extra.decode import decode
+from cfn_lsp_extra.index_store import IndexStore
+from cfn_lsp_extra.workspace_index import (
+    TemplateSummary,
+    WorkspaceIndex,
+    import_at,
+    summarize,
+    template_paths,
+)
+
+NETWORK = """AWSTemplateFormatVersion: "2010-09-09"
+Resources:
+  Vpc:
+    Type: AWS::EC2::VPC
+  Subnet:
+    Type: AWS::EC2::Subnet
+Outputs:
+  VpcId:
+    Description: The vpc
+    Value: !Ref Vpc
+    Export:
+      Name: network-VpcId
+  SubnetId:
+    Value: !GetAtt Subnet.SubnetId
+    Export:
+      Name: !Sub "${AWS::StackName}-SubnetId"
+  NotExported:
+    Value: !Ref Vpc
+"""
+
+APP = """AWSTemplateFormatVersion: "2010-09-09"
+Resources:
+  Sg:
+    Type: AWS::EC2::SecurityGroup
+    Properties:
+      VpcId: !ImportValue network-VpcId
+"""
+
+NETWORK_URI = "file:///network.yaml"
+VPC = AWSLogicalId(logical_name="Vpc", type_="AWS::EC2::VPC")
+
+
+def test_summarize():
+    summary = summarize(NETWORK, "network.yaml", NETWORK_URI)
+    assert summary.resources == (
+        VPC,
+        AWSLogicalId(logical_name="Subnet", type_="AWS::EC2::Subnet"),
+    )
+    vpc_id, subnet_id = summary.exports
+    assert vpc_id.value == AWSExport(
+        name="network-VpcId",
+        output="VpcId",
+        uri=NETWORK_URI,
+        description="The vpc",
+        resource=VPC,
+    )
+    assert (vpc_id.line, vpc_id.char, vpc_id.span) == (11, 12, 13)
+    assert subnet_id.value.is_sub
+    assert subnet_id.value.resource.logical_name == "Subnet"
+
+
+def test_summarize_not_a_template():
+    assert summarize("name: value\n", "f.yaml", "file:///f.yaml") is None
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    [
+        ("network-SubnetId", True),
+        ("other-SubnetId", True),
+        ("-SubnetId", False),
+        ("network-VpcId", False),
+    ],
+)
+def test_export_matches_sub(name, expected):
+    export = AWSExport(
+        name="${AWS::StackName}-SubnetId", output="O", uri="", is_sub=True
+    )
+    assert export.matches(name) is expected
+
+
+def test_index_exports():
+    index = WorkspaceIndex()
+    index.update(summarize(NETWORK, "network.yaml", NETWORK_URI))
+    assert index.export("network-VpcId").value.output == "VpcId"
+    assert index.export("network-SubnetId").value.output == "SubnetId"
+    assert index.export("network-VpcId", excluding=NETWORK_URI) is None
+    assert index.export("missing") is None
+    assert [e.name for e in index.exports()] == ["network-VpcId"]
+    assert index.resource_types() == {"AWS::EC2::VPC", "AWS::EC2::Subnet"}
+
+
+def test_index_update_replaces_template():
+    index = WorkspaceIndex()
+    index.update(summarize(NETWORK, "network.yaml", NETWORK_URI))
+    changed = NETWORK.replace("network-VpcId", "network-Vpc")
+    index.index_source(NETWORK_URI, changed, "network.yaml")
+    assert index.export("network-VpcId") is None
+    assert index.export("network-Vpc") is not None
+    # Templates which can't be decoded keep what was known of them
+    index.index_source(NETWORK_URI, changed + "  - [", "network.yaml")
+    assert index.export("network-Vpc") is not None
+    index.remove(NETWORK_URI)
+    assert index.export("network-Vpc") is None
+    assert index.summary(NETWORK_URI) is None
+
+
+def test_scan(tmp_path):
+    (tmp_path / "network.yaml").write_text(NETWORK)
+    (tmp_path / "stacks").mkdir()
+    (tmp_path / "stacks" / "app.yml").write_text(APP)
+    (tmp_path / "config.yaml").write_text("key: value\n")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "dep.yaml").write_text(NETWORK)
+    (tmp_path / "broken.json").write_text('{"Resources": {"AWS::')
+    assert sorted(p.name for p in template_paths(str(tmp_path))) == [
+        "app.yml",
+        "broken.json",
+        "config.yaml",
+        "network.yaml",
+    ]
+    index = WorkspaceIndex()
+    try:
+        for future in index.scan([str(tmp_path)]):
+            future.result(timeout=10)
+    finally:
+        index.shutdown()
+    network_uri = from_fs_path(str(tmp_path / "network.yaml"))
+    assert index.export("network-VpcId").value.uri == network_uri
+    assert index.summary(from_fs_path(str(tmp_path / "stacks" / "app.yml")))
+    assert index.summary(from_fs_path(str(tmp_path / "config.yaml"))) is None
+
+
+def test_import_at():
+    template = decode(APP, "app.yaml")
+    span = import_at(template, Position(line=5, character=30))
+    assert span.value.value == "network-VpcId"
+    assert (span.line, span.char) == (5, 26)
+    assert import_at(template, Position(line=3, character=10)) is None
+
+
+def test_summary_data_round_trip():
+    summary = summarize(NETWORK, "network.yaml", NETWORK_URI)
+    data = json.loads(json.dumps(summary.to_data()))
+    assert TemplateSummary.from_data(data, NETWORK_URI) == summary
+
+
+def test_scan_with_store(tmp_path, mocker):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    network, app = workspace / "network.yaml", workspace / "app.yaml"
+    network.write_text(NETWORK)
+    app.write_text(APP)
+    (workspace / "config.yaml").write_text("key: value\n")
+
+    def scan():
+        index = WorkspaceIndex(store=IndexStore(tmp_path / "index.sqlite", "v1"))
+        try:
+            for future in index.scan([str(workspace)]):
+                future.result(timeout=10)
+        finally:
+            index.shutdown()
+        return index
+
+    summarize_spy = mocker.spy(workspace_index, "summarize")
+    scan()
+    assert summarize_spy.call_count == 2
+    # Unchanged files aren't decoded again
+    index = scan()
+    assert summarize_spy.call_count == 2
+    assert index.export("network-VpcId").value.resource == VPC
+    # Nor are files only touched
+    os.utime(app, ns=(1, 1))
+    scan()
+    assert summarize_spy.call_count == 2
+    network.write_text(NETWORK.replace("network-VpcId", "network-Vpc"))
+    index = scan()
+    assert summarize_spy.call_count == 3
+    assert index.export("network-VpcId") is None
+    assert index.export("network-Vpc") is not None
+
+
+def test_scan_forgets_file_grown_too_large(tmp_path, monkeypatch):
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    network = workspace / "network.yaml"
+    network.write_text(NETWORK)
+    store = IndexStore(tmp_path / "index.sqlite", "v1")
+    index = WorkspaceIndex(store=store)
+    try:
+        for future in index.scan([str(workspace)]):
+            future.result(timeout=10)
+        assert index.export("network-VpcId") is not None
+        assert store.get(str(network)) is not None
+        monkeypatch.setattr(workspace_index, "MAX_TEMPLATE_BYTES", len(NETWORK) - 1)
+        for future in index.scan([str(workspace)]):
+            future.result(timeout=10)
+    finally:
+        index.shutdown()
+    assert index.export("network-VpcId") is None
+    assert index.summary(from_fs_path(str(network))) is None
+    assert store.get(str(network)) is None